@@ -0,0 +1,44 @@
+"""
+Classification of messages against the separate patterns of the on_message listeners.
+
+run from the repository root with `python -m benchmarks.classifier`
+"""
+import re
+import timeit
+
+from cogs.utils.classifier import MESSAGE_ID, MESSAGE_LINK, REDDIT_LINK, TWITTER_LINK, YT_LINK, classify
+
+
+def benchmark(number: int = 20000):
+    """
+    compare the cost of classifying a message once against compiling and scanning
+    each pattern separately like the single on_message listeners did before
+    """
+    messages = [
+        "just a normal message without any links in it, talking about the last episode",
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ&si=abcdefgh look at this",
+        "https://discord.com/channels/187423852224053248/187423852224053248/1018855465239339018",
+        "https://twitter.com/user/status/1234567890 and https://redd.it/abc123",
+    ]
+
+    def separate():
+        for content in messages:
+            re.compile(YT_LINK).findall(content)
+            re.compile("https://(media\\.)?(tenor|giphy)?.com/").match(content)
+            re.compile(r"https?://nhentai\.net/g/(\d+)").findall(content)
+            re.compile(MESSAGE_ID).match(content) or re.compile(MESSAGE_LINK).match(content)
+            list(re.compile(TWITTER_LINK).finditer(content))
+            re.compile(REDDIT_LINK, re.MULTILINE).search(content)
+
+    def combined():
+        for content in messages:
+            classify(content).events
+
+    for name, func in (("separate", separate), ("combined", combined)):
+        total = timeit.timeit(func, number=number)
+        print(f"{name}: {total / (number * len(messages)) * 1e6:.2f} µs per message")
+
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,53 @@
+"""
+Vote counting of polls on every refresh.
+
+run from the repository root with `python -m benchmarks.poll_counts`
+"""
+import random
+import timeit
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from cogs.poll import PollData, PollOption, PollVote
+
+
+def benchmark(voters: int = 10000, option_count: int = 10, number: int = 100):
+    """
+    compare counting the votes of every option by scanning all voters
+    (like get_vote_count did before) against the counters kept by PollData
+    """
+    options = [PollOption(uuid4(), f"option {i}") for i in range(option_count)]
+    poll = PollData(
+        uuid4(),
+        title="benchmark",
+        type="multi",
+        channel=0,
+        guild=0,
+        creator=None,
+        end_date=datetime.now(timezone.utc),
+        anonymous=True,
+        options=options,
+    )
+    for user_id in range(voters):
+        for option in random.sample(options, 2):
+            poll.add_vote(PollVote(uuid4(), user_id, option))
+
+    def scan():
+        for option in poll.options:
+            count = 0
+            for votes in poll.votes.values():
+                for _ in filter(lambda v: v.option.id == option.id, votes):
+                    count = count + 1
+
+    def counters():
+        for option in poll.options:
+            poll.get_vote_count(option)
+
+    for name, func in (("scan", scan), ("counters", counters), ("embed", lambda: poll.embed)):
+        total = timeit.timeit(func, number=number)
+        print(f"{name}: {total / number * 1e3:.3f} ms per refresh ({voters} voters, {option_count} options)")
+
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,112 @@
+"""
+Load test of firing many due reminders at once.
+
+RemindMe.fire_reminders runs against a fake pool that counts the statements sent to the database,
+the number of statements has to stay the same however many reminders are due together.
+
+run from the repository root with `python -m benchmarks.reminders_load`
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+from cogs.misc import RemindMe
+
+
+class FakeStatement:
+
+    def __init__(self, pool, query):
+        self.pool = pool
+        self.query = query
+
+    async def fetch(self, *args):
+        self.pool.executed += 1
+        if self.query.lstrip().startswith("SELECT"):
+            now = datetime.now(timezone.utc)
+            return [
+                {"r_id": r_id, "user_id": r_id % 100, "reminder": f"reminder {r_id}",
+                 "channel_id": None, "message_id": None, "reminder_ts": now}
+                for r_id in args[0]
+            ]
+        return []
+
+
+class FakeConnection:
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def prepare(self, query):
+        self.pool.prepared += 1
+        return FakeStatement(self.pool, query)
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+class FakePool:
+
+    def __init__(self):
+        self.prepared = 0
+        self.executed = 0
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield FakeConnection(self)
+
+
+class FakeUser:
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, content):
+        self.sent += 1
+
+
+class FakeTimers:
+
+    def schedule(self, kind, key, when):
+        pass
+
+    def cancel(self, kind, key):
+        pass
+
+
+class FakeBot:
+
+    def __init__(self):
+        self.db = FakePool()
+        self.timers = FakeTimers()
+        self.user = FakeUser()
+
+    def get_user(self, user_id):
+        return self.user
+
+    def get_channel(self, channel_id):
+        return None
+
+
+async def fire(count: int):
+    bot = FakeBot()
+    cog = RemindMe(bot)
+    start = time.perf_counter()
+    await cog.fire_reminders(list(range(count)))
+    elapsed = time.perf_counter() - start
+    assert bot.user.sent == count, f"only {bot.user.sent} of {count} reminders were sent"
+    return bot.db.executed, bot.db.prepared, elapsed
+
+
+async def load_test(sizes=(1, 100, 10000)):
+    results = {}
+    for count in sizes:
+        executed, prepared, elapsed = await fire(count)
+        results[count] = executed
+        print(f"{count} reminders: {executed} statements ({prepared} prepared), {elapsed * 1e3:.1f} ms")
+    assert len(set(results.values())) == 1, f"the number of statements grows with the reminders: {results}"
+
+
+if __name__ == "__main__":
+    asyncio.run(load_test())
@@ -2,11 +2,15 @@ from discord.ext import commands
 from discord import Intents
 import discord
 from cogs.utils.dataIO import DataIO
+from cogs.utils.render import RenderService
+from cogs.utils.http import HTTPClient
+from cogs.utils.danbooru import DanbooruClient
+from cogs.utils.db import Statements
+from cogs.utils.timers import TimerService
 import logging
 from logging.handlers import RotatingFileHandler
 import asyncpg
 import asyncio
-import aiohttp
 
 description = 'Pouty Bot MKII by Saikimo'
 
@@ -30,17 +34,26 @@ async def connect_db_and_start_bot():
                                        user=db_info['user'],
                                        password=db_info["password"],
                                        host=db_info["hostaddr"])
+    bot.statements = Statements(bot.db)
+    bot.renderer = RenderService()
+    await bot.renderer.start()
+    bot.timers = TimerService(bot)
 
     try:
-        async with aiohttp.ClientSession() as session, bot:
+        async with HTTPClient() as session, bot:
             bot.loop.create_task(bot.load_extension("cogs.default"))
             bot.loop.create_task(bot.load_extension("cogs.owner"))
             bot.session = session
+            bot.danbooru = DanbooruClient(session)
+            bot.timers.start()
             await bot.start(token)
     except KeyboardInterrupt:
         print("closing connection")
         await bot.db.close()
         await bot.logout()
+    finally:
+        bot.renderer.close()
+        bot.timers.close()
 
 if __name__ == '__main__':
     credentials = load_credentials()
@@ -1,7 +1,7 @@
 import discord
 from discord import app_commands
 from discord.enums import ButtonStyle
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord.ext.commands.errors import CommandError
 from discord.interactions import Interaction
 from discord.message import Attachment
@@ -10,12 +10,14 @@ import os.path
 import json
 from .utils import checks, paginator
 from .utils.dataIO import DataIO
+from .utils.db import Repository
 from random import choice
 import logging
 import textwrap
 import typing
 from io import BytesIO
 import asyncio
+import asyncpg
 import re
 from fuzzywuzzy import fuzz
 from datetime import datetime, timedelta
@@ -150,9 +152,7 @@ class ConfirmModal(discord.ui.Modal):
 
     async def on_submit(self, interaction: discord.Interaction) -> None:
         await interaction.response.defer(ephemeral=True)
-        mute_role = interaction.guild.get_role(await interaction.client.db.fetchval("""
-            SELECT role_id FROM mute_roles WHERE guild_id = $1 AND hide_channels = $2
-        """, interaction.guild.id, self.hide_channels))
+        mute_role = await self.cog.get_mute_role(interaction.guild, self.hide_channels)
         if self.confirm_text.value.lower() == "mute me":
             await self.cog.add_mute_to_mute_list(member=self.member, timestamp=self.unmute_ts, is_selfmute=True)
             if self.hide_channels:
@@ -192,9 +192,7 @@ class MuteMenu(discord.ui.View):
     @discord.ui.button(label="Yes", style=ButtonStyle.green)
     async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
         unmute_ts = discord.utils.utcnow() + self.duration
-        mute_role = interaction.guild.get_role(await interaction.client.db.fetchval("""
-            SELECT role_id FROM mute_roles WHERE guild_id = $1 AND hide_channels = $2
-        """, interaction.guild.id, self.hide_channels))
+        mute_role = await self._admin.get_mute_role(interaction.guild, self.hide_channels)
         if self.duration.days > 6:
             await interaction.response.send_modal(ConfirmModal(self._admin, self.member, unmute_ts))
         else:
@@ -241,18 +239,41 @@ class MuteMenu(discord.ui.View):
         return True
 
 
+class MuteRepository(Repository):
+    namespace = "mutes"
+    statements = {
+        "get": "SELECT * FROM mutes WHERE user_id = $1",
+        "add": ("INSERT INTO mutes VALUES ($1, $2, $3, $4) "
+                "ON CONFLICT (user_id) DO UPDATE SET unmute_ts = $2, selfmute = $3"),
+        "remove": "DELETE FROM mutes WHERE user_id = $1 RETURNING user_id",
+        "remove_many": "DELETE FROM mutes WHERE user_id = ANY($1)",
+    }
+
+    async def get_mute(self, user_id: int) -> typing.Optional[asyncpg.Record]:
+        return await self.fetchrow("get", user_id)
+
+    async def add_mute(self, user_id: int, unmute_ts: datetime, is_selfmute: bool, guild_id: int):
+        await self.execute("add", user_id, unmute_ts, is_selfmute, guild_id)
+
+    async def remove_mute(self, user_id: int) -> typing.Optional[int]:
+        return await self.fetchval("remove", user_id)
+
+    async def remove_mutes(self, user_ids: typing.List[int]):
+        await self.execute("remove_many", user_ids)
+
+
 class Admin(commands.Cog):
     """Administration commands and anonymous reporting to the moderators"""
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.mutes = MuteRepository(bot)
         if os.path.exists('data/report_channel.json'):
             with open('data/report_channel.json') as f:
                 json_data = json.load(f)
                 self.report_channel = self.bot.get_channel(json_data['channel'])
         else:
             self.report_channel = None
-        self.unmute_loop.start()
         if os.path.exists("data/reddit_settings.json"):
             with open("data/reddit_settings.json") as f:
                 json_data = json.load(f)
@@ -277,11 +298,16 @@ class Admin(commands.Cog):
             '\N{NEGATIVE SQUARED CROSS MARK}'
         ]
         self.to_unmute = []
+        # guild_id -> {hide_channels: role_id}
+        self.mute_roles: typing.Dict[int, typing.Dict[bool, int]] = {}
+        # bounds the concurrent role edits when many mutes expire at once
+        self.role_edit_semaphore = asyncio.Semaphore(4)
 
     async def cog_load(self):
         await self.create_mute_database()
         await self.create_voice_unmute_table()
         await self.create_personal_ban_image_db()
+        await self.bot.timers.register("mute", self.unmute_expired, self.mute_timers)
 
     async def get_voice_unmutes(self):
         query =("SELECT * FROM vmutes")
@@ -352,7 +378,22 @@ class Admin(commands.Cog):
             return await con.fetch(query)
 
     def cog_unload(self):
-        self.unmute_loop.cancel()
+        self.bot.timers.unregister("mute")
+
+    async def get_mute_role_ids(self, guild_id: int) -> typing.Dict[bool, int]:
+        if guild_id not in self.mute_roles:
+            rows = await self.bot.db.fetch("""
+            SELECT role_id, hide_channels FROM mute_roles WHERE guild_id = $1
+            """, guild_id)
+            self.mute_roles[guild_id] = {r["hide_channels"]: r["role_id"] for r in rows}
+        return self.mute_roles[guild_id]
+
+    async def get_mute_role(self, guild: discord.Guild, hide_channels: bool) -> typing.Optional[discord.Role]:
+        role_id = (await self.get_mute_role_ids(guild.id)).get(hide_channels)
+        return guild.get_role(role_id) if role_id else None
+
+    async def mute_timers(self):
+        return [(m["user_id"], m["unmute_ts"]) for m in await self.mutes]
 
     async def create_mute_database(self):
         query = ("CREATE TABLE IF NOT EXISTS mutes ("
@@ -776,55 +817,75 @@ class Admin(commands.Cog):
         ban_images = data_io.load_json("ban_images")
         return choice(ban_images)
 
-    @tasks.loop(seconds=5.0)
-    async def unmute_loop(self):
-        to_remove = []
-        
-        try:
-            for mute in await self.mutes:
-                if mute["unmute_ts"] <= discord.utils.utcnow():
-                    try:
-                        guild = self.bot.get_guild(mute["guild_id"])
-                        member = guild.get_member(mute["user_id"])
-                        mute_roles = (discord.Object(r['role_id']) for r in await self.bot.db.fetch("""
-                        SELECT role_id FROM mute_roles WHERE guild_id = $1
-                        """, guild.id))
-                        if member and mute_roles:
-                            await member.remove_roles(*mute_roles)
-                            stored_roles = await self._get_stored_roles(member)                            
-                            stored_roles = [discord.Object(id=s["role_id"]) for s in stored_roles]
-                            if stored_roles:
-                                await member.add_roles(*stored_roles)
-                    except (discord.errors.Forbidden, discord.errors.NotFound) as e:
-                        to_remove.append(mute)
-                    else:
-                        to_remove.append(mute)
-            for mute in to_remove:
-                await self.remove_user_from_mute_list(mute['user_id'])
-        except Exception as e: 
-            self.error_log.exception('exception while handling unmutes:')
+    async def unmute_expired(self, user_ids):
+        mutes = await self.bot.db.fetch("""
+        SELECT * FROM mutes WHERE user_id = ANY($1)
+        """, user_ids)
+        if not mutes:
+            return
+        stored_roles = await self._pop_stored_roles([m["user_id"] for m in mutes])
+        for guild_id in {m["guild_id"] for m in mutes}:
+            await self.get_mute_role_ids(guild_id)
+        results = await asyncio.gather(
+                *(self._unmute_member(m, stored_roles.get(m["user_id"], [])) for m in mutes),
+                return_exceptions=True
+        )
+        unmuted, failed = [], []
+        for mute, result in zip(mutes, results):
+            if isinstance(result, Exception):
+                self.error_log.error(f"exception while unmuting {mute['user_id']}:", exc_info=result)
+                failed.append(mute["user_id"])
+            else:
+                unmuted.append(mute["user_id"])
+        if failed:
+            await self._restore_stored_roles({user_id: stored_roles.get(user_id, []) for user_id in failed})
+            retry_ts = discord.utils.utcnow() + timedelta(minutes=1)
+            for user_id in failed:
+                self.bot.timers.schedule("mute", user_id, retry_ts)
+        await self.remove_users_from_mute_list(unmuted)
+
+    async def _unmute_member(self, mute, stored_role_ids):
+        guild = self.bot.get_guild(mute["guild_id"])
+        member = guild.get_member(mute["user_id"]) if guild else None
+        if not member:
+            return
+        mute_roles = [discord.Object(id=r) for r in (await self.get_mute_role_ids(guild.id)).values()]
+        async with self.role_edit_semaphore:
+            try:
+                if mute_roles:
+                    await member.remove_roles(*mute_roles)
+                if stored_role_ids:
+                    await member.add_roles(*(discord.Object(id=r) for r in stored_role_ids))
+            except (discord.errors.Forbidden, discord.errors.NotFound):
+                pass
 
     async def remove_user_from_mute_list(self, member_id):
-        query = ("DELETE FROM mutes "
-                 "WHERE user_id = $1"
-                 "RETURNING user_id")
-        async with self.bot.db.acquire() as con:
-            stmt = await con.prepare(query)
-            async with con.transaction():
-                unmuted_user_id = await stmt.fetchval(member_id)
+        unmuted_user_id = await self.mutes.remove_mute(member_id)
+        self.bot.timers.cancel("mute", member_id)
         return unmuted_user_id
 
-    async def _get_stored_roles(self, member: discord.Member):
+    async def remove_users_from_mute_list(self, user_ids):
+        if not user_ids:
+            return
+        await self.mutes.remove_mutes(user_ids)
+        for user_id in user_ids:
+            self.bot.timers.cancel("mute", user_id)
+
+    async def _pop_stored_roles(self, user_ids) -> typing.Dict[int, typing.List[int]]:
+        rows = await self.bot.db.fetch("""
+        DELETE FROM role_store WHERE user_id = ANY($1)
+        RETURNING user_id, role_id
+        """, user_ids)
+        stored_roles = {}
+        for row in rows:
+            stored_roles.setdefault(row["user_id"], []).append(row["role_id"])
+        return stored_roles
+
+    async def _restore_stored_roles(self, stored_roles: typing.Dict[int, typing.List[int]]):
         async with self.bot.db.acquire() as con, con.transaction():
-
-            roles = await con.fetch("""
-                SELECT role_id FROM role_store 
-                WHERE user_id = $1
-            """, member.id)
-            await con.execute("""
-            DELETE FROM role_store WHERE user_id = $1
-            """, member.id)
-            return roles
+            await con.executemany("""
+            INSERT INTO role_store (user_id, role_id) VALUES ($1, $2)
+            """, [(user_id, role_id) for user_id, role_ids in stored_roles.items() for role_id in role_ids])
 
     async def _store_current_roles(self, member: discord.Member):
         async with self.bot.db.acquire() as con, con.transaction():
@@ -833,19 +894,11 @@ class Admin(commands.Cog):
             """, [(member.id, r.id) for r in member.roles[1:]])
         
     async def add_mute_to_mute_list(self, member: discord.Member, timestamp, is_selfmute: bool=False):
-        query = ("INSERT INTO mutes "
-                 "VALUES ($1,$2, $3, $4) ON CONFLICT(user_id) DO UPDATE SET unmute_ts = $2, selfmute = $3")
-        async with self.bot.db.acquire() as con:
-            stmt = await con.prepare(query)
-            async with con.transaction():
-                await stmt.fetch(member.id, timestamp, is_selfmute, member.guild.id)
+        await self.mutes.add_mute(member.id, timestamp, is_selfmute, member.guild.id)
+        self.bot.timers.schedule("mute", member.id, timestamp)
 
     async def get_mute_from_list(self, member_id):
-        query = ("SELECT * FROM mutes where user_id = $1")
-        async with self.bot.db.acquire() as con:
-            stmt = await con.prepare(query)
-            async with con.transaction():
-                return await stmt.fetchrow(member_id)
+        return await self.mutes.get_mute(member_id)
 
     def convert_mute_length(self, amount, time_unit):
         if amount == 1 and not time_unit.endswith("s"):
@@ -866,9 +919,7 @@ class Admin(commands.Cog):
         """
 
         mute = await self.get_mute_from_list(ctx.author.id)
-        mute_role = ctx.guild.get_role(await self.bot.db.fetchval("""
-            SELECT role_id FROM mute_roles WHERE guild_id = $1
-        """, ctx.guild.id))
+        mute_role = await self.get_mute_role(ctx.guild, hide_channels=False)
         member = mute_role.guild.get_member(ctx.author.id)
         if mute:
             return await ctx.send("You are already muted")
@@ -960,9 +1011,7 @@ class Admin(commands.Cog):
         mutes the user for a certain amount of time
         """
         length, error_msg = self.convert_mute_length(amount, time_unit)
-        mute_role = interaction.guild.get_role(await self.bot.db.fetchval("""
-            SELECT role_id FROM mute_roles WHERE guild_id = $1 AND hide_channels = $2
-        """, interaction.guild.id, False))
+        mute_role = await self.get_mute_role(interaction.guild, hide_channels=False)
 
         if not length:
             await interaction.response.send_message(error_msg)
@@ -992,9 +1041,7 @@ class Admin(commands.Cog):
         """
         member = interaction.user
         mute = await self.get_mute_from_list(member.id)
-        mute_role = interaction.guild.get_role(await self.bot.db.fetchval("""
-            SELECT role_id FROM mute_roles WHERE guild_id = $1 AND hide_channels = $2
-        """, interaction.guild.id, False))
+        mute_role = await self.get_mute_role(interaction.guild, hide_channels=False)
         if mute and mute_role:
             await self.remove_user_from_mute_list(member.id)
             guild_member = mute_role.guild.get_member(member.id)
@@ -1059,6 +1106,7 @@ class Admin(commands.Cog):
             INSERT INTO mute_roles (role_id, guild_id, hide_channels) VALUES ($1, $3, $4),
             ($2, $3, $5)
             """, mute_role.id, hide_role.id, ctx.guild.id, False, True)
+            self.mute_roles.pop(ctx.guild.id, None)
             await ctx.send(f"The roles {mute_role.mention} and {hide_role.mention} have been created")
 
 
@@ -1105,9 +1153,7 @@ class Admin(commands.Cog):
     @commands.Cog.listener()
     async def on_member_join(self, member):
         muted_user_ids = [m['user_id'] for m in await self.mutes]
-        mute_role = member.guild.get_role(await self.bot.db.fetchval("""
-            SELECT role_id FROM mute_roles WHERE guild_id = $1 AND hide_channels = $2
-        """, member.guild.id, False))
+        mute_role = await self.get_mute_role(member.guild, hide_channels=False)
         if member.id in muted_user_ids:
             await member.add_roles(mute_role)
             await self.check_channel.send(f"{member.mention} tried to circumvent a mute by leaving")
@@ -1,6 +1,4 @@
 import discord
-import aiohttp
-import asyncio
 import re
 from datetime import date, datetime
 from functools import partial
@@ -28,11 +26,8 @@ class Bill(commands.Cog):
     '''
     def __init__(self, bot): 
         self.bot = bot
-        self.session = aiohttp.ClientSession()
+        self.session = bot.session
         self.date_parse_regex = re.compile(r"(\d{1,2})\.(\d{1,2})\.(\d{1,2})\s+(\d{1,2}):(\d{1,2})\s(am|pm)");
-    def cog_unload(self):
-        loop = self.bot.loop or asyncio.get_event_loop()
-        loop.create_task(self.session.close())
 
     def build_random_url(self):
         today = date.today()
@@ -98,4 +93,4 @@ class Bill(commands.Cog):
 
 
 async def setup(bot):
-    awit bot.add_cog(Bill(bot))
+    await bot.add_cog(Bill(bot))
@@ -1,6 +1,6 @@
 import discord
 from discord.utils import get, find
-from discord.ext import commands,tasks
+from discord.ext import commands
 from typing import Optional
 from .utils.dataIO import DataIO
 import datetime
@@ -23,12 +23,15 @@ class Birthday(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.data_io = DataIO()
-        self.remove_birthday.start()
 
     async def cog_load(self):
         await self.setup_database()
+        await self.bot.timers.register("birthday", self.remove_birthday, self.birthday_timers)
     async def cog_unload(self):
-        self.remove_birthday.stop()
+        self.bot.timers.unregister("birthday")
+
+    async def birthday_timers(self):
+        return [(b["user_id"], b["role_removal_date"]) for b in await self.fetch_all_birthdays()]
 
     async def insert_new_birthday(self, user_id, guild_id, role_removal_date, changed_color):
         """
@@ -40,6 +43,7 @@ class Birthday(commands.Cog):
             ''')
             async with connection.transaction():
                 await statement.fetch(user_id, guild_id, role_removal_date, changed_color)
+        self.bot.timers.schedule("birthday", user_id, role_removal_date)
 
     async def fetch_user_bday_status(self, user_id):
         async with self.bot.db.acquire() as connection:
@@ -62,13 +66,25 @@ class Birthday(commands.Cog):
             async with connection.transaction():
                 return await statement.fetch()
 
+    async def fetch_birthdays(self, user_ids):
+        async with self.bot.db.acquire() as connection:
+            statement = await connection.prepare('''
+                SELECT user_id, guild_id, role_removal_date
+                FROM birthday
+                WHERE user_id = ANY($1)
+            ''')
+            async with connection.transaction():
+                return await statement.fetch(user_ids)
+
     async def remove_birthday_entry(self, user_id):
         async with self.bot.db.acquire() as connection:
             statement = await connection.prepare('''
                 DELETE FROM birthday WHERE user_id = $1
             ''')
             async with connection.transaction():
-                return await statement.fetch(user_id)
+                result = await statement.fetch(user_id)
+        self.bot.timers.cancel("birthday", user_id)
+        return result
     async def update_birthday_entry_color_change(self, user_id, change_color):
         async with self.bot.db.acquire() as connection:
             statement = await connection.prepare('''
@@ -126,27 +142,27 @@ class Birthday(commands.Cog):
         await ctx.send("birthday role assigned successfully")
 
 
-    @tasks.loop(seconds=5)
-    async def remove_birthday(self):
+    async def remove_birthday(self, user_ids):
         to_remove = []
-        bday_entries = await self.fetch_all_birthdays()
+        bday_entries = await self.fetch_birthdays(user_ids)
         for entry in bday_entries:
-            if entry["role_removal_date"] <= datetime.datetime.utcnow():
-                try:
-                    guild = get(self.bot.guilds, id=entry["guild_id"])
-                    member = get(guild.members, id=entry["user_id"])
-                    bday_roles = [role for role in member.roles if role.name == "HUPPIE BIRTHDAY"]
-                    if member and guild and bday_roles:
-                        await member.remove_roles(*bday_roles)
-                except (discord.errors.Forbidden, discord.errors.NotFound):
-                    logger = logging.getLogger("PoutyBot")
-                    logger.error(e)
-                    to_remove.append(entry)
-                except discord.errors.HTTPException as e:
-                    logger = logging.getLogger("PoutyBot")
-                    logger.error(e)
-                else:
-                    to_remove.append(entry)
+            try:
+                guild = self.bot.get_guild(entry["guild_id"])
+                member = guild.get_member(entry["user_id"]) if guild else None
+                bday_roles = [role for role in member.roles if role.name == "HUPPIE BIRTHDAY"] if member else []
+                if bday_roles:
+                    await member.remove_roles(*bday_roles)
+            except (discord.errors.Forbidden, discord.errors.NotFound) as e:
+                logger = logging.getLogger("PoutyBot")
+                logger.error(e)
+                to_remove.append(entry)
+            except discord.errors.HTTPException as e:
+                logger = logging.getLogger("PoutyBot")
+                logger.error(e)
+                self.bot.timers.schedule("birthday", entry["user_id"],
+                                         datetime.datetime.utcnow() + datetime.timedelta(minutes=1))
+            else:
+                to_remove.append(entry)
         for removal in to_remove:
             await self.remove_birthday_entry(removal["user_id"])
 
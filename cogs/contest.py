@@ -26,8 +26,92 @@ import asyncio
 import logging
 import mimetypes as mime
 import typing
+from typing import List, Optional
 from discord.ext import commands
 from .utils.checks import is_owner_or_moderator
+from .utils.db import Repository
+
+
+class ContestRepository(Repository):
+    namespace = "contest"
+    statements = {
+        "settings": "SELECT * FROM contest_settings LIMIT 1",
+        "save_settings": "INSERT INTO contest_settings VALUES ($1, $2, $3)",
+        "empty_tables": ("DELETE FROM contest;"
+                         "DELETE FROM contest_settings;"
+                         "DELETE FROM contest_votes;"
+                         "DELETE FROM contest_disqualified;"),
+        "add_entry": "INSERT INTO contest VALUES ($1, $2)",
+        "add_vote": "INSERT INTO contest_votes VALUES ($1, $2)",
+        "remove_vote": "DELETE FROM contest_votes WHERE user_id = $1 AND message_id = $2 RETURNING message_id",
+        "count_entries": "SELECT count(message_id) AS number_of_entries FROM contest WHERE user_id = $1 GROUP BY user_id",
+        "entries_of_user": "SELECT message_id FROM contest WHERE user_id = $1",
+        "entry_by_message": "SELECT user_id, message_id FROM contest WHERE message_id = $1",
+        "remove_entry": "DELETE FROM contest WHERE message_id = $1",
+        "count_votes": "SELECT count(message_id) AS votes FROM contest_votes WHERE message_id = $1",
+        "remove_entries_of_user": "DELETE FROM contest WHERE user_id = $1",
+        "disqualify": "INSERT INTO contest_disqualified VALUES ($1)",
+        "qualify": "DELETE FROM contest_disqualified WHERE user_id = $1",
+        "votes_of_user": "SELECT user_id, message_id FROM contest_votes WHERE user_id = $1",
+        "disqualified": "SELECT user_id FROM contest_disqualified WHERE user_id = $1",
+        "top_entries": ("SELECT DISTINCT contest.user_id, contest.message_id, count(cv.message_id) AS vote_count FROM contest "
+                        "LEFT OUTER JOIN contest_votes cv ON contest.message_id = cv.message_id "
+                        "GROUP BY contest.user_id, contest.message_id "
+                        "ORDER BY vote_count DESC"),
+    }
+
+    async def load_settings(self) -> Optional[asyncpg.Record]:
+        return await self.fetchrow("settings")
+
+    async def save_settings(self, contest_role_id: int, contest_channel_id: int, guild_id: int):
+        await self.execute("save_settings", contest_role_id, contest_channel_id, guild_id)
+
+    async def empty_table(self):
+        async with self.transaction() as con:
+            await self.execute("empty_tables", con=con)
+
+    async def add_contest_entry(self, contestant_id: int, message: discord.Message):
+        await self.execute("add_entry", contestant_id, message.id)
+
+    async def add_vote_to_entry(self, user_id: int, entry_id: int):
+        await self.execute("add_vote", user_id, entry_id)
+
+    async def remove_vote_from_entry(self, user_id: int, entry_id: int) -> Optional[int]:
+        return await self.fetchval("remove_vote", user_id, entry_id)
+
+    async def check_contestant_entries(self, user_id: int) -> Optional[int]:
+        return await self.fetchval("count_entries", user_id)
+
+    async def list_contest_entries(self, user_id: int) -> List[asyncpg.Record]:
+        return await self.fetch("entries_of_user", user_id)
+
+    async def get_entry_by_message(self, message_id: int) -> Optional[asyncpg.Record]:
+        return await self.fetchrow("entry_by_message", message_id)
+
+    async def remove_entry_from_database(self, message_id: int):
+        await self.execute("remove_entry", message_id)
+
+    async def get_number_of_votes(self, message_id: int) -> int:
+        return await self.fetchval("count_votes", message_id)
+
+    async def contestant_disqualified(self, user_id: int):
+        async with self.transaction() as con:
+            await self.execute("disqualify", user_id, con=con)
+            await self.execute("remove_entries_of_user", user_id, con=con)
+
+    async def contestant_qualify(self, user_id: int):
+        await self.execute("qualify", user_id)
+
+    async def get_votes_of_user(self, user_id: int) -> List[asyncpg.Record]:
+        return await self.fetch("votes_of_user", user_id)
+
+    async def fetch_disqualified(self, user_id: int) -> Optional[int]:
+        return await self.fetchval("disqualified", user_id)
+
+    async def get_top_entries(self) -> List[asyncpg.Record]:
+        return await self.fetch("top_entries")
+
+
 class Contest(commands.Cog):
 
     def contestant_check(self, ctx):
@@ -39,22 +123,18 @@ class Contest(commands.Cog):
         self.bot = bot
         self.contestant_role = None
         self.contest_channel = None
-        self.session = aiohttp.ClientSession()
+        self.session = bot.session
+        self.repo = ContestRepository(bot)
         self.bot.loop.create_task(self.setup_database())
         self.bot.loop.create_task(self.load_settings())
 
-    def cog_unload(self):
-        self.bot.loop.create_task(self.session.close())
-
     async def load_settings(self):
         await asyncio.sleep(1)
-        async with self.bot.db.acquire() as connection:
-            async with connection.transaction():
-                settings = await connection.fetchrow("SELECT * FROM contest_settings LIMIT 1")
-                if settings:
-                    guild = self.bot.get_guild(settings["contest_guild_id"])
-                    self.contest_channel = guild.get_channel(settings["contest_channel_id"])
-                    self.contestant_role = guild.get_role(settings["contest_role_id"])
+        settings = await self.repo.load_settings()
+        if settings:
+            guild = self.bot.get_guild(settings["contest_guild_id"])
+            self.contest_channel = guild.get_channel(settings["contest_channel_id"])
+            self.contestant_role = guild.get_role(settings["contest_role_id"])
 
     async def setup_database(self):
         async with self.bot.db.acquire() as connection:
@@ -74,120 +154,11 @@ class Contest(commands.Cog):
             async with connection.transaction():
                 await connection.execute(query)
 
-    async def save_settings(self, contest_role_id, contest_channel_id, guild_id):
-        async with self.bot.db.acquire() as connection:
-            query = ("INSERT INTO contest_settings values ($1, $2, $3)")
-            statement = await connection.prepare(query)
-            async with connection.transaction():
-                await statement.fetch(contest_role_id, contest_channel_id, guild_id)
-
-    async def empty_table(self):
-        async with self.bot.db.acquire() as connection:
-            query = ("DELETE FROM contest;"
-                     "DELETE FROM contest_settings;"
-                     "DELETE FROM contest_votes;"
-                     "DELETE FROM contest_disqualified;")
-            async with connection.transaction():
-                await connection.execute(query)
-
-    async def add_contest_entry(self, contestant_id, message,):
-        async with self.bot.db.acquire() as connection:
-            statement = await connection.prepare("INSERT INTO contest VALUES ($1,$2)")
-            async with connection.transaction():
-                await statement.fetch(contestant_id, message.id)
-
-    async def add_vote_to_entry(self, user_id, entry_id):
-        async with self.bot.db.acquire() as connection:
-            statement = await connection.prepare("INSERT INTO contest_votes values ($1, $2)")
-            async with connection.transaction():
-                return await statement.fetchval(user_id, entry_id)
-
-    async def remove_vote_from_entry(self, user_id, entry_id):
-        async with self.bot.db.acquire() as connection:
-            statement = await connection.prepare("DELETE FROM contest_votes WHERE user_id = $1 AND message_id = $2"
-                                                 " RETURNING message_id")
-            async with connection.transaction():
-                return await statement.fetchval(user_id, entry_id)
-
-    async def check_contestant_entries(self, user_id):
-        async with self.bot.db.acquire() as connection:
-            statement = await connection.prepare("SELECT count(message_id) as number_of_entries from contest "
-                                                 "WHERE user_id = $1 GROUP BY user_id")
-            async with connection.transaction():
-                return await statement.fetchval(user_id)
-
-    async def list_contest_entries(self, user_id):
-        async with self.bot.db.acquire() as connection:
-            statement = await connection.prepare("SELECT message_id from contest "
-                                                 "WHERE user_id = $1")
-            async with connection.transaction():
-                return await statement.fetch(user_id)
-
-    async def get_entry_by_message(self, message_id):
-        async with self.bot.db.acquire() as connection:
-            statement = await connection.prepare("SELECT user_id, message_id from contest "
-                                                 "WHERE message_id = $1")
-            async with connection.transaction():
-                return await statement.fetchrow(message_id)
-
-    async def remove_entry_from_database(self, message_id):
-        async with self.bot.db.acquire() as connection:
-            statement = await connection.prepare("DELETE FROM contest "
-                                                 "WHERE message_id = $1")
-            async with connection.transaction():
-                return await statement.fetchrow(message_id)
-
-    async def get_number_of_votes(self, message_id):
-        async with self.bot.db.acquire() as connection:
-            statement = await connection.prepare("SELECT count(message_id) as votes FROM contest_votes "
-                                                 "WHERE message_id = $1")
-            async with connection.transaction():
-                return await statement.fetchval(message_id)
-
-    async def contestant_disqualified(self, user_id):
-        async with self.bot.db.acquire() as connection:
-            statement = await connection.prepare("DELETE FROM contest "
-                                                 "WHERE user_id = $1")
-            statement_dq = await connection.prepare("INSERT INTO contest_disqualified values ($1)")
-            async with connection.transaction():
-                await statement_dq.fetchval(user_id)
-                return await statement.fetchval(user_id)
-    async def contestant_qualify(self, user_id):
-        async with self.bot.db.acquire() as connection:
-            statement = await connection.prepare("DELETE FROM contest_disqualified "
-                                                 "WHERE user_id = $1")
-            async with connection.transaction():
-                return await statement.fetchrow(user_id)
-    async def get_votes_of_user(self, user_id):
-        async with self.bot.db.acquire() as connection:
-            statement = await connection.prepare("SELECT user_id, message_id FROM contest_votes "
-                                                 "WHERE user_id = $1")
-            async with connection.transaction():
-                return await statement.fetch(user_id)
-
-
-    async def fetch_disqualified(self, user_id):
-        async with self.bot.db.acquire() as connection:
-            statement = await connection.prepare("SELECT user_id FROM contest_disqualified "
-                                                 "WHERE user_id = $1")
-            async with connection.transaction():
-                return await statement.fetchval(user_id)
-    async def get_top_entries(self):
-        async with self.bot.db.acquire() as connection:
-            statement = await connection.prepare("SELECT DISTINCT contest.user_id, contest.message_id ,count(cv.message_id) as vote_count FROM contest "
-                                                 "LEFT OUTER JOIN contest_votes cv on contest.message_id = cv.message_id "
-                                                 "GROUP BY contest.user_id, contest.message_id "
-                                                 "ORDER BY vote_count DESC "
-                                                 )
-            async with connection.transaction():
-                return await statement.fetch()
-
-
     @commands.command(name="lentries", aliases=["list_entries", "myentries"], hidden=True)
     @commands.dm_only()
     async def list_entries(self, ctx):
         """show all entries of mine"""
-        entries = await self.list_contest_entries(ctx.author.id)
+        entries = await self.repo.list_contest_entries(ctx.author.id)
         entry_list = ""
         for entry in entries:
             message = await self.contest_channel.fetch_message(entry["message_id"])
@@ -202,8 +173,8 @@ class Contest(commands.Cog):
     @is_owner_or_moderator()
     async def get_entry(self, ctx, message: discord.Message):
         """get the entry specified by jump_url or message id"""
-        entry = await self.get_entry_by_message(message.id)
-        votes = await self.get_number_of_votes(message.id)
+        entry = await self.repo.get_entry_by_message(message.id)
+        votes = await self.repo.get_number_of_votes(message.id)
         submission_image = message.attachments[0].url
         member = ctx.guild.get_member(entry["user_id"])
         embed = discord.Embed(color=member.color, title=member.display_name, url=message.jump_url,
@@ -217,7 +188,7 @@ class Contest(commands.Cog):
     @is_owner_or_moderator()
     async def get_winner(self, ctx):
         """list the top 10 contestants by vote"""
-        all_entries = await self.get_top_entries()
+        all_entries = await self.repo.get_top_entries()
         embed = discord.Embed(title="Contest Winner:")
         winners = []
         counter = 1
@@ -239,33 +210,33 @@ class Contest(commands.Cog):
     async def remove_entry(self, ctx, message: discord.Message):
         """remove an entry"""
         await message.delete()
-        await self.remove_entry_from_database(message.id)
+        await self.repo.remove_entry_from_database(message.id)
         await ctx.send("Entry was deleted")
 
     @commands.command(name="disqualify")
     @is_owner_or_moderator()
     async def disqualify(self, ctx, member: discord.Member):
         """removes all entries of a user and makes them unable to join the contest again"""
-        entries = await self.list_contest_entries(member.id)
+        entries = await self.repo.list_contest_entries(member.id)
 
         def check(m):
             return m.id in [entry["message_id"] for entry in entries]
 
         await member.remove_roles(self.contestant_role)
         await self.contest_channel.purge(check=check)
-        await self.contestant_disqualified(member.id)
+        await self.repo.contestant_disqualified(member.id)
         await ctx.send(f"{member.display_name} has been disqualified.")
     @commands.command(name="qualify")
     @is_owner_or_moderator()
     async def qualify(self, ctx: commands.Context, member: discord.Member):
         """removes user from disqualification list"""
-        await self.contestant_qualify(member.id)
+        await self.repo.contestant_qualify(member.id)
         await ctx.send(f"{member.display_name} has been qualified again")
 
     @commands.command(name="my_votes")
     async def my_votes(self, ctx: commands.Context):
         """gives you a list of all images you have voted on"""
-        votes = await self.get_votes_of_user(ctx.author.id)
+        votes = await self.repo.get_votes_of_user(ctx.author.id)
         if not votes:
             await ctx.send("You haven't voted yet")
         paginator = commands.Paginator(prefix=None, suffix=None)
@@ -288,7 +259,7 @@ class Contest(commands.Cog):
         if not self.contestant_check(ctx):
             await ctx.send("you are not a contestant")
             return
-        number_of_entries = await self.check_contestant_entries(ctx.author.id)
+        number_of_entries = await self.repo.check_contestant_entries(ctx.author.id)
         if number_of_entries and number_of_entries >= 3:
             await ctx.send("you already have 3 entries")
             return
@@ -316,7 +287,7 @@ class Contest(commands.Cog):
                     return
             await contest_entry.add_reaction("\N{THUMBS UP SIGN}")
             await contest_entry.add_reaction("\N{CROSS MARK}")
-            await self.add_contest_entry(ctx.author.id, contest_entry)
+            await self.repo.add_contest_entry(ctx.author.id, contest_entry)
             await ctx.send("your entry has been submitted")
 
     @commands.command(name="enter", hidden=True)
@@ -325,7 +296,7 @@ class Contest(commands.Cog):
         """
         allows you to enter the contest
         """
-        disqualified = await self.fetch_disqualified(ctx.author.id)
+        disqualified = await self.repo.fetch_disqualified(ctx.author.id)
         if disqualified:
             await ctx.send("you have been disqualified you are not allowed to enter the contest")
         else:
@@ -344,13 +315,13 @@ class Contest(commands.Cog):
         member = guild.get_member(payload.user_id)
         try:
             if self.contestant_role in member.roles:
-                entries = await self.list_contest_entries(user_id=member.id)
+                entries = await self.repo.list_contest_entries(user_id=member.id)
                 if message_entry.id in [entry["message_id"] for entry in entries]:
                     await message_entry.remove_reaction("\N{THUMBS UP SIGN}", member)
                     await member.send("don't vote on your own entries dummy :T")
                     return
             await message_entry.remove_reaction("\N{THUMBS UP SIGN}", member)
-            await self.add_vote_to_entry(payload.user_id, payload.message_id)
+            await self.repo.add_vote_to_entry(payload.user_id, payload.message_id)
             await member.send(f"you have successfully voted on the following entry: {message_entry.jump_url}")
         except asyncpg.PostgresError as e:
             logger = logging.getLogger('PoutyBot')
@@ -366,7 +337,7 @@ class Contest(commands.Cog):
         try:
             message_entry = await self.contest_channel.fetch_message(payload.message_id)
             member = self.contest_channel.guild.get_member(payload.user_id)
-            deleted = await self.remove_vote_from_entry(payload.user_id, payload.message_id)
+            deleted = await self.repo.remove_vote_from_entry(payload.user_id, payload.message_id)
             await message_entry.remove_reaction("\N{CROSS MARK}", member)
             if deleted:
                 await member.send(f"vote removed for the following entry: {message_entry.jump_url}")
@@ -404,7 +375,7 @@ class Contest(commands.Cog):
         await self.contest_channel.set_permissions(target=self.contestant_role, overwrite=overwrite_contestant)
         await self.contest_channel.set_permissions(target=memester, overwrite=overwrite_memester)
         await self.contest_channel.set_permissions(target=everyone, overwrite=overwrite_everyone)
-        await self.save_settings(self.contestant_role.id, self.contest_channel.id, ctx.guild.id)
+        await self.repo.save_settings(self.contestant_role.id, self.contest_channel.id, ctx.guild.id)
         await ctx.send("contest has been started")
 
 
@@ -414,7 +385,7 @@ class Contest(commands.Cog):
         """small help command for resetting before contest"""
         await self.contestant_role.delete()
         await self.contest_channel.delete()
-        await self.empty_table()
+        await self.repo.empty_table()
         self.contestant_role = None
         self.contest_channel = None
         await ctx.send("contest reset")
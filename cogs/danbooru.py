@@ -1,4 +1,4 @@
-from discord.ext import commands, tasks
+from discord.ext import commands
 import discord
 import aiohttp
 import json
@@ -12,9 +12,18 @@ from .utils import checks
 from .utils.paginator import TextPages,FieldPages
 from textwrap import shorten
 import logging
+from collections import Counter, defaultdict
 from os import path
 import typing
 
+# subscriptions are looked up once per interval, the danbooru request quota
+# is enforced by the token bucket of the shared http client (bot.session)
+SUB_POLL_INTERVAL = 60
+SUB_POLL_CONCURRENCY = 4
+# number of recent posts fetched per cycle to match the subscriptions against
+FEED_LIMIT = 200
+# delay between two subscription messages sent to discord
+SEND_DELAY = 2
 
 
 class DanbooruTypeConverter(commands.Converter):
@@ -27,87 +36,10 @@ class DanbooruTypeConverter(commands.Converter):
         else:
             raise commands.BadArgument(f"type must be one of the following {','.join(types.keys())}")
 
-class Helper:
-    def __init__(self, session, bot, auth_file):
-        self.bot = bot
-        self.session = session
-        self.auth_file = auth_file
-
-
-    async def lookup_pool(self, pool_id):
-        with open(self.auth_file) as file:
-            data = json.load(file)
-            user = data['user']
-            api_key = data['api_key']
-        auth = aiohttp.BasicAuth(user, api_key)
-        url = 'https://danbooru.donmai.us/pools/{}.json'.format(pool_id)
-        async with self.session.get(url, auth=auth) as response:
-            if response.status == 200:
-                json_dump = await response.json()
-                return json_dump['name']
-
-    async def lookup_posts(self, limit=200):
-        params = {'limit': limit}
-        url = 'https://danbooru.donmai.us'
-        with open(self.auth_file) as file:
-            data = json.load(file)
-            user = data['user']
-            api_key = data['api_key']
-        auth = aiohttp.BasicAuth(user, api_key)
-        async with self.session.get('{}/posts.json'.format(url), params=params, auth=auth) as response:
-            if response.status == 200:
-                json_dump = await response.json()
-                for image in json_dump:
-                    if not image.get('id'):
-                        continue
-                    if image['has_large'] and image['file_ext'] == 'zip' and not image.get('is_deleted'):
-                        image['file_url'] = self.build_url(url, image['large_file_url']) if image.get('large_file_url') else image.get('source')
-                    else:
-                        image['file_url'] = self.build_url(url, image['file_url'])
-                return json_dump
-            else:
-                return None
-
-    async def lookup_tags(self, tags, **kwargs):
-        params = {'tags' : tags}
-        for key, value in kwargs.items():
-            params[key] = value
-        with open(self.auth_file) as file:
-            data = json.load(file)
-            user = data['user']
-            api_key = data['api_key']
-        auth = aiohttp.BasicAuth(user, api_key)
-        url = 'https://danbooru.donmai.us'
-        async with self.session.get('{}/posts.json'.format(url), params=params, auth=auth) as response:
-            if response.status == 200:
-                json_dump = await response.json()
-                for image in json_dump:
-                    if not image.get('id'):
-                        continue
-                    if image.get('has_large', None) and image.get('file_ext', None) == 'zip' and not image.get('is_deleted'):
-                        image['file_url'] = self.build_url(url, image['large_file_url']) if image.get('large_file_url') else image.get('source')
-                    elif image.get('file_url', None):
-                        image['file_url'] = self.build_url(url, image['file_url'])
-                    elif image.get('source', None):
-                        image['file_url'] = image.get('source')
-                    elif image.get('is_deleted', False) or image.get('is_banned', False):
-                        image['file_url'] = None
-                    else:
-                        image['file_url'] = f"https://danbooru/donmai.us/posts/{image['id']}"
-                return json_dump
-            else:
-                return None
-
-    def build_url(self, base_url: str, file_url: str):
-        if file_url.startswith("http"):
-            return file_url
-        if file_url[0] != "/":
-            file_url = "/" + file_url
-        return base_url + file_url
-
 class Dansub:
 
-    def __init__(self, users, tags, pools, server: discord.guild, channel: discord.TextChannel, is_private: bool, paused_users=None):
+    def __init__(self, users, tags, pools, server: discord.guild, channel: discord.TextChannel, is_private: bool, paused_users=None, sub_id=None):
+        self.sub_id = sub_id
         self.users = list()
         if type(users) == list:
             self.users += users
@@ -122,13 +54,18 @@ class Dansub:
         self.new_timestamp = datetime.datetime.now()
         self.already_posted = list()
         self.is_private = is_private
-        self.feed_file = 'data/danbooru/subs/{}.json'.format(self.tags_to_filename())
+        self.next_due = None
+        # seconds the last lookup started after it was due
+        self.poll_lag = 0.0
+        # seconds between the creation of a post and its delivery to discord
+        self.delivery_lag = 0.0
         if paused_users:
             self.paused_users = paused_users
         else:
             self.paused_users = []
 
-    # use this one to create private subs
+    def is_paused(self):
+        return self.is_private and len(self.paused_users) > 0 or len(self.paused_users) == len(self.users)
 
     def users_to_mention(self):
         mention_string = ','.join(user.mention for user in self.users if user.id not in self.paused_users)
@@ -142,18 +79,15 @@ class Dansub:
         tags.sort()
         return tags == self.tags
 
-    def tags_to_filename(self):
-        # delete any character that isn't a word char - _ or . from the filename
-        if self.is_private:
-            return re.sub('[^\w\-_\.]','_', self.tags_to_string()) + str(self.users[0].id)
-        else:
-            return re.sub('[^\w\-_\.]','_', self.tags_to_string())
-
     def tags_to_message(self):
-        tags_list = self.tags.copy()
-        for tag in self.tags:
+        return self.format_tags(self.tags, self.pools)
+
+    @staticmethod
+    def format_tags(tags, pools):
+        tags_list = list(tags)
+        for tag in tags:
             if 'pool:' in tag:
-                for pool in self.pools:
+                for pool in pools:
                     if pool['tag'] == tag:
                         tags_list.remove(tag)
                         tag = '{0[name]}({0[tag]})'.format(pool)
@@ -162,200 +96,454 @@ class Dansub:
 
 
 
+class SubscriptionMatcher:
+    """
+    matches posts of the recent posts feed against the subscriptions locally,
+    using an inverted index tag -> subscriptions containing that tag
 
-
-
-    def sub_to_json(self):
-        ret_val = dict()
-        ret_val['users'] = {}
-        for counter, user in enumerate(self.users):
-            ret_val['users'][counter] = {}
-            ret_val['users'][counter]['id'] = user.id
-            ret_val['users'][counter]['name'] = user.name
-            ret_val['users'][counter]['mention'] = user.mention
-        ret_val['tags'] = self.tags
-        ret_val['is_private'] = self.is_private
-        if not self.is_private:
-            ret_val['server'] = self.guild.id
-            ret_val['channel'] = self.channel.id
-        ret_val['old_timestamp'] = str(self.old_timestamp)
-        ret_val['new_timestamp'] = str(self.new_timestamp)
-        ret_val['already_posted'] = self.already_posted
-        ret_val['pools'] = self.pools
-        ret_val['paused_users'] = []
-        for paused_user in self.paused_users:
-            ret_val['paused_users'].append(paused_user)
-        return json.dumps(ret_val, indent=2)
-
-    def write_sub_to_file(self):
-        content = self.sub_to_json()
-        with open(self.feed_file,'w') as file:
-            file.write(content)
-
+    subscriptions with tags that can't be checked against a post's tag_string
+    (metatags, negated/or/wildcard tags) aren't indexed and are looked up on their own
+    """
+    def __init__(self):
+        self.index = defaultdict(set)
+        self.required = dict()
+
+    @staticmethod
+    def can_match(sub):
+        for tag in sub.tags:
+            tag = tag.lower()
+            if not tag or tag[0] in '-~(' or tag in ('or', ')') or '*' in tag:
+                return False
+            if ':' in tag and not (tag.startswith('rating:') and tag[len('rating:'):] in ('g', 's', 'q', 'e')):
+                return False
+        return True
+
+    def __contains__(self, sub):
+        return sub in self.required
+
+    def __len__(self):
+        return len(self.required)
+
+    def add(self, sub):
+        tags = frozenset(tag.lower() for tag in sub.tags)
+        self.required[sub] = tags
+        for tag in tags:
+            self.index[tag].add(sub)
+
+    def remove(self, sub):
+        for tag in self.required.pop(sub, ()):
+            self.index[tag].discard(sub)
+            if not self.index[tag]:
+                del self.index[tag]
+
+    def match(self, post):
+        tags = post.get('tag_string', '').split(' ')
+        tags.append('rating:{}'.format(post.get('rating')))
+        hits = Counter()
+        for tag in tags:
+            for sub in self.index.get(tag, ()):
+                hits[sub] += 1
+        return [sub for sub, count in hits.items() if count == len(self.required[sub])]
+
+
+class SubscriptionStore:
+    """
+    the subscriptions, their users and the creation time of the last delivered post (old_timestamp)
+    """
+    def __init__(self, db):
+        self.db = db
+
+    async def create_tables(self):
+        await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS dan_subs (
+                sub_id SERIAL PRIMARY KEY,
+                tags TEXT NOT NULL,
+                is_private BOOLEAN NOT NULL DEFAULT FALSE,
+                guild_id BIGINT,
+                channel_id BIGINT,
+                pools JSONB NOT NULL DEFAULT '[]',
+                old_timestamp TIMESTAMP WITH TIME ZONE
+            );
+            CREATE INDEX IF NOT EXISTS dan_subs_tags_idx ON dan_subs (tags);
+            CREATE TABLE IF NOT EXISTS dan_sub_users (
+                sub_id INTEGER NOT NULL REFERENCES dan_subs (sub_id) ON DELETE CASCADE,
+                user_id BIGINT NOT NULL,
+                paused BOOLEAN NOT NULL DEFAULT FALSE,
+                PRIMARY KEY (sub_id, user_id)
+            );
+            CREATE INDEX IF NOT EXISTS dan_sub_users_user_id_idx ON dan_sub_users (user_id);
+        """)
+
+    async def fetch_subs(self):
+        return await self.db.fetch("""
+            SELECT s.sub_id, s.tags, s.is_private, s.guild_id, s.channel_id, s.pools, s.old_timestamp,
+                   array_agg(u.user_id) AS users,
+                   array_agg(u.user_id) FILTER (WHERE u.paused) AS paused_users
+            FROM dan_subs s
+            JOIN dan_sub_users u ON u.sub_id = s.sub_id
+            GROUP BY s.sub_id
+        """)
+
+    async def fetch_user_subs(self, user_id):
+        return await self.db.fetch("""
+            SELECT s.sub_id, s.tags, s.is_private, s.pools, u.paused
+            FROM dan_sub_users u
+            JOIN dan_subs s ON s.sub_id = u.sub_id
+            WHERE u.user_id = $1
+            ORDER BY s.tags
+        """, user_id)
+
+    async def insert_sub(self, tags, is_private, guild_id, channel_id, pools, old_timestamp, user_ids, paused_ids=(),
+                         con=None):
+        """
+        pass con to insert the sub as part of a larger transaction
+        """
+        if con is None:
+            async with self.db.acquire() as con:
+                return await self.insert_sub(tags, is_private, guild_id, channel_id, pools, old_timestamp,
+                                             user_ids, paused_ids, con=con)
+        async with con.transaction():
+            sub_id = await con.fetchval("""
+                INSERT INTO dan_subs (tags, is_private, guild_id, channel_id, pools, old_timestamp)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                RETURNING sub_id
+            """, tags, is_private, guild_id, channel_id, json.dumps(pools), old_timestamp)
+            await con.executemany("""
+                INSERT INTO dan_sub_users (sub_id, user_id, paused) VALUES ($1, $2, $3)
+                ON CONFLICT DO NOTHING
+            """, [(sub_id, user_id, user_id in paused_ids) for user_id in user_ids])
+        return sub_id
+
+    async def insert_subs(self, subs):
+        """
+        inserts all subs (tuples of the insert_sub arguments) or none of them
+        """
+        async with self.db.acquire() as con:
+            async with con.transaction():
+                for sub in subs:
+                    await self.insert_sub(*sub, con=con)
+
+    async def add_user(self, sub_id, user_id):
+        await self.db.execute("""
+            INSERT INTO dan_sub_users (sub_id, user_id) VALUES ($1, $2)
+            ON CONFLICT DO NOTHING
+        """, sub_id, user_id)
+
+    async def remove_user(self, sub_id, user_id):
+        """
+        removes the user from the sub and deletes the sub once nobody is subscribed anymore,
+        returns True if the sub was deleted
+        """
+        async with self.db.acquire() as con:
+            async with con.transaction():
+                await con.execute("DELETE FROM dan_sub_users WHERE sub_id = $1 AND user_id = $2", sub_id, user_id)
+                deleted = await con.fetchval("""
+                    DELETE FROM dan_subs
+                    WHERE sub_id = $1 AND NOT EXISTS (SELECT 1 FROM dan_sub_users WHERE sub_id = $1)
+                    RETURNING sub_id
+                """, sub_id)
+        return deleted is not None
+
+    async def delete_sub(self, sub_id):
+        await self.db.execute("DELETE FROM dan_subs WHERE sub_id = $1", sub_id)
+
+    async def set_paused(self, user_id, paused):
+        await self.db.execute("UPDATE dan_sub_users SET paused = $2 WHERE user_id = $1", user_id, paused)
+
+    async def update_watermark(self, sub_id, old_timestamp):
+        await self.db.execute("UPDATE dan_subs SET old_timestamp = $2 WHERE sub_id = $1", sub_id, old_timestamp)
+
+    async def update_watermarks(self, watermarks):
+        """
+        :param watermarks: (sub_id, old_timestamp) tuples
+        """
+        await self.db.executemany("UPDATE dan_subs SET old_timestamp = $2 WHERE sub_id = $1", watermarks)
 
 
 class Scheduler:
-    def __init__(self, bot, session):
+    """
+    looks up every subscription when it is due (using bot.timers) and queues new posts for delivery,
+    a single sender task delivers the queued messages to discord
+    """
+    def __init__(self, bot):
         self.bot = bot
-        self.session = session
         self.subscriptions = list()
-        self.auth_file = 'data/danbooru/danbooru.json'
         self.subs_file = 'data/danbooru/subs.db'
-        self.retrieve_subs()
-        self.helper = Helper(self.session, self.bot, self.auth_file)
+        self.store = SubscriptionStore(bot.db)
+        self.api = bot.danbooru
         self.logger = logging.getLogger('discord')
+        self.semaphore = asyncio.Semaphore(SUB_POLL_CONCURRENCY)
+        self.matcher = SubscriptionMatcher()
+        # creation time of the newest post of the previous feed lookup
+        self.feed_newest = None
+        self.feed_due = None
+        self.feed_lag = 0.0
+        self.send_queue = asyncio.Queue()
+        self.sender = None
+        self.loader = None
+
+    async def start(self):
+        await self.store.create_tables()
+        if os.path.exists(self.subs_file):
+            imported = await self.import_json_subs()
+            self.logger.info("imported %s danbooru subscriptions from json files", imported)
+        # the cog is loaded before the bot connects, the subs can only be loaded once the guilds and users are cached
+        self.loader = asyncio.create_task(self.load_and_schedule())
+
+    async def load_and_schedule(self):
+        await self.bot.wait_until_ready()
+        try:
+            await self.load_subs()
+        except Exception:
+            self.logger.exception("could not load the danbooru subscriptions")
+            return
+        await self.bot.timers.register("dansub", self.poll_subs)
+        await self.bot.timers.register("dansub_feed", self.poll_feed)
+        # every sub is looked up once to catch up on the posts since the last run,
+        # spread over one interval, afterwards only the subs the feed can't cover keep their own lookups
+        count = max(len(self.subscriptions), 1)
+        for index, sub in enumerate(self.subscriptions):
+            if self.matcher.can_match(sub):
+                self.matcher.add(sub)
+            self.schedule_sub(sub, SUB_POLL_INTERVAL * index / count)
+        self.schedule_feed()
+        self.sender = asyncio.create_task(self.deliver_posts())
+
+    def close(self):
+        if self.loader:
+            self.loader.cancel()
+        self.bot.timers.unregister("dansub")
+        self.bot.timers.unregister("dansub_feed")
+        if self.sender:
+            self.sender.cancel()
+
+    def add_sub(self, sub):
+        self.subscriptions.append(sub)
+        if self.matcher.can_match(sub):
+            self.matcher.add(sub)
+        else:
+            self.schedule_sub(sub)
 
-    @tasks.loop(minutes=1)
-    async def schedule_task(self):
-        #iterate through all subscriptions and update information
-        subs_copy = self.subscriptions.copy()
-        for sub in subs_copy:
-            # skip the subscription if the sub was already removed
-            if sub not in self.subscriptions:
-                continue
-            if sub.is_private and len(sub.paused_users) > 0 or len(sub.paused_users) == len(sub.users):
-                continue
-            try:
-                images = await self.helper.lookup_tags(sub.tags_to_string())
-                if not images:
-                    continue
-                new_posts, timestamp_posted = await self._find_all_new_posts(images, sub)
-                if new_posts:
-                    await self.send_new_posts(sub, new_posts)
-                    sub.old_timestamp = max(timestamp_posted)
-                    sub.write_sub_to_file()
-                await asyncio.sleep(30)
-
-            except asyncio.CancelledError as e:
-                self._write_subs_information_to_file()
-                raise
-            except aiohttp.ClientOSError as cle:
-                self._write_subs_information_to_file()
-                await asyncio.sleep(10)
-                continue
-            except Exception as e:
-                owner = self.bot.get_user(134310073014026242)
-                self._write_subs_information_to_file()
-                message = ('Error during update Task: `{}`\n'
-                           'during Sub: `{}`\n'
-                           '```\n{}\n```'
-                           .format(repr(e),sub.tags_to_string(),traceback.format_exc()))
-                await owner.send(message)
-                await asyncio.sleep(10)
-                continue
-        self.write_to_file()
+    def remove_sub(self, sub):
+        self.subscriptions.remove(sub)
+        self.matcher.remove(sub)
 
-    def cancel_task(self):
-        self.schedule_task.cancel()
+    def schedule_sub(self, sub, delay=SUB_POLL_INTERVAL):
+        sub.next_due = discord.utils.utcnow() + datetime.timedelta(seconds=delay)
+        self.bot.timers.schedule("dansub", sub, sub.next_due)
 
-    def _write_subs_information_to_file(self):
-        self.write_to_file()
-        for subscription in self.subscriptions:
-            subscription.write_sub_to_file()
+    def schedule_feed(self, delay=SUB_POLL_INTERVAL):
+        self.feed_due = discord.utils.utcnow() + datetime.timedelta(seconds=delay)
+        self.bot.timers.schedule("dansub_feed", "feed", self.feed_due)
 
-    async def _find_all_new_posts(self, images, sub):
+    async def poll_feed(self, _):
+        self.feed_lag = (discord.utils.utcnow() - self.feed_due).total_seconds()
+        try:
+            async with self.semaphore:
+                posts = await self.api.lookup_posts(limit=FEED_LIMIT)
+            if not posts:
+                return
+            found = self._match_feed(posts)
+            # every watermark is moved before the first await so a concurrent poll_sub can't queue the posts again
+            for sub, (new_posts, timestamp_posted) in found.items():
+                self._queue_and_advance(sub, new_posts, timestamp_posted)
+            if found:
+                await self.store.update_watermarks([(sub.sub_id, sub.old_timestamp) for sub in found])
+        except aiohttp.ClientError:
+            self.logger.warning("lookup of the recent posts failed", exc_info=True)
+        except Exception:
+            self.logger.exception("error while matching the recent posts against the subscriptions")
+        finally:
+            self.schedule_feed()
+
+    def _match_feed(self, posts):
+        posts = [post for post in posts if post.get('id') and post.get('created_at')]
+        if not posts:
+            return {}
+        created = [parser.parse(post['created_at']) for post in posts]
+        previous_newest, self.feed_newest = self.feed_newest, max(created)
+        if previous_newest is not None and min(created) > previous_newest:
+            # more posts were uploaded since the last cycle than the feed returns,
+            # look the indexed subs up on their own this time so no post is missed
+            self.logger.warning("recent posts feed has a gap, looking up %s subs one by one", len(self.matcher))
+            for sub in self.matcher.required:
+                self.schedule_sub(sub, 0)
+            return {}
+        found = dict()
+        for post, created_at in zip(posts, created):
+            if not post.get('file_url'):
+                continue
+            for sub in self.matcher.match(post):
+                if sub.is_paused():
+                    continue
+                new_posts, timestamp_posted = found.setdefault(sub, ([], []))
+                if not sub.old_timestamp:
+                    # new subscriptions only get the newest post
+                    if not new_posts:
+                        new_posts.append(post['file_url'])
+                        timestamp_posted.append(created_at)
+                elif created_at > sub.old_timestamp:
+                    new_posts.append(post['file_url'])
+                    timestamp_posted.append(created_at)
+        return {sub: found_posts for sub, found_posts in found.items() if found_posts[0]}
+
+    def _queue_and_advance(self, sub, new_posts, timestamp_posted):
+        self.queue_new_posts(sub, new_posts, min(timestamp_posted))
+        sub.old_timestamp = max(timestamp_posted)
+
+    async def _queue_and_store(self, sub, new_posts, timestamp_posted):
+        # the watermark is moved before awaiting so concurrent lookups don't queue the posts twice
+        self._queue_and_advance(sub, new_posts, timestamp_posted)
+        await self.store.update_watermark(sub.sub_id, sub.old_timestamp)
+
+    async def poll_subs(self, subs):
+        await asyncio.gather(*(self.poll_sub(sub) for sub in subs))
+
+    async def poll_sub(self, sub):
+        # skip the subscription if the sub was already removed
+        if sub not in self.subscriptions:
+            return
+        sub.poll_lag = (discord.utils.utcnow() - sub.next_due).total_seconds()
+        try:
+            if sub.is_paused():
+                return
+            async with self.semaphore:
+                images = await self.api.lookup_tags(sub.tags_to_string())
+            if not images:
+                return
+            new_posts, timestamp_posted = self._find_all_new_posts(images, sub)
+            if new_posts:
+                await self._queue_and_store(sub, new_posts, timestamp_posted)
+        except aiohttp.ClientError:
+            self.logger.warning("lookup failed for sub: %s", sub.tags_to_string(), exc_info=True)
+        except Exception as e:
+            owner = self.bot.get_user(134310073014026242)
+            message = ('Error during update Task: `{}`\n'
+                       'during Sub: `{}`\n'
+                       '```\n{}\n```'
+                       .format(repr(e),sub.tags_to_string(),traceback.format_exc()))
+            await owner.send(message[:2000])
+        finally:
+            # subs covered by the feed were only looked up once to catch up
+            if sub in self.subscriptions and sub not in self.matcher:
+                self.schedule_sub(sub)
+
+    def _find_all_new_posts(self, images, sub):
         new_posts = list()
         timestamp_posted = list()
-        if not images:
-            return
         for image in images:
             if not image.get('file_url'):
                 continue
             created = parser.parse(image['created_at'])
             if not sub.old_timestamp:
-                sub.old_timestamp = created
-                await self.send_new_posts(sub,[image['file_url']])
-                sub.write_sub_to_file()
+                # new subscriptions only get the newest post
+                return [image['file_url']], [created]
             if created > sub.old_timestamp:
                 new_posts.append(image['file_url'])
                 timestamp_posted.append(created)
         return new_posts,timestamp_posted
 
-    def retrieve_subs(self):
-        if not os.path.exists(self.subs_file):
-            open(self.subs_file,'w').close()
-        with open(self.subs_file) as f:
-            lines = f.readlines()
-        for line in lines:
-            line = line.replace('\n','')
-            line = line.replace('\'','')
-            sub = self.create_sub_from_file(line)
-            if sub == None:
-                continue
-            print(sub.tags_to_string())
-            self.subscriptions.append(sub)
-
-    def create_sub_from_file(self,json_path):
-        with open(json_path) as sub_file:
-            data = json.load(sub_file)
-
-        user_list = []
-
-        if 'is_private' in data and bool(data['is_private']):
-            is_private = True
-            id = data['users']['0']['id']
-            name = data['users']['0']['name']
-            user = self.bot.get_user(id)
+    async def load_subs(self):
+        self.subscriptions = list()
+        for row in await self.store.fetch_subs():
+            sub = self.sub_from_row(row)
+            if sub is not None:
+                self.subscriptions.append(sub)
+
+    def sub_from_row(self, row):
+        if row['is_private']:
+            user = self.bot.get_user(row['users'][0])
             if user is None:
                 return None
-            user_list.append(user)
+            users = [user]
+            server = channel = None
         else:
-            is_private = False
-            if os.path.exists('data/danbooru/sub_channel.json'):
-                with open('data/danbooru/sub_channel.json','r') as f:
-                    sub_channel_file = json.load(f)
-                server = self.bot.get_guild(int(sub_channel_file['server']))
-                channel = self.bot.get_channel(int(sub_channel_file['channel']))
-            else:
-                server = self.bot.get_guild(int(data['server']))
-                channel = self.bot.get_channel(int(data['channel']))
-            for user in data['users']:
-                # try to get the member through Discord and their ID
-                member = server.get_member(int(data['users'][user]['id']))
-                # if that fails create own user with the necessary information
-                if member == None:
-                    continue
-                user_list.append(member)
+            server = self.bot.get_guild(row['guild_id'])
+            channel = self.bot.get_channel(row['channel_id'])
+            if server is None:
+                return None
+            users = [member for member in map(server.get_member, row['users']) if member is not None]
+        sub = Dansub(users, row['tags'].split(' '), json.loads(row['pools']), server, channel, row['is_private'],
+                     row['paused_users'] or [], sub_id=row['sub_id'])
+        sub.old_timestamp = row['old_timestamp']
+        return sub
 
-        tags = data['tags']
-        timestamp = data['old_timestamp']
-        if 'paused_users' in data:
-            paused_users = data['paused_users']
-        else:
-            paused_users = []
-        if 'pools' in data:
-            pools = data['pools']
-        else:
-            pools = []
+    async def import_json_subs(self):
+        """
+        one-shot import of the subscriptions that were stored as json files (subs.db lists the files),
+        all subs are inserted in one transaction so a failed import can be repeated without duplicates
+        """
+        sub_channel = None
+        if os.path.exists('data/danbooru/sub_channel.json'):
+            try:
+                with open('data/danbooru/sub_channel.json') as f:
+                    sub_channel = json.load(f)
+            except (OSError, ValueError):
+                self.logger.warning("could not read the danbooru sub channel, using the channel of every sub", exc_info=True)
+        with open(self.subs_file) as f:
+            paths = [line.strip().replace('\'', '') for line in f if line.strip()]
+        subs = []
+        for json_path in paths:
+            try:
+                sub = self.parse_json_sub(json_path, sub_channel)
+            except (OSError, KeyError, TypeError, ValueError):
+                self.logger.warning("could not import danbooru sub %s", json_path, exc_info=True)
+                continue
+            if sub is not None:
+                subs.append(sub)
+        await self.store.insert_subs(subs)
+        os.rename(self.subs_file, self.subs_file + '.imported')
+        return len(subs)
+
+    @staticmethod
+    def parse_json_sub(json_path, sub_channel):
+        """
+        returns the arguments of SubscriptionStore.insert_sub for the sub stored in the file, None if nobody is subscribed
+        """
+        with open(json_path) as sub_file:
+            data = json.load(sub_file)
+        user_ids = [int(user['id']) for user in data['users'].values()]
+        if not user_ids:
+            return None
+        is_private = bool(data.get('is_private'))
         if is_private:
-            retrieved_sub = Dansub(user_list, tags, pools, None, None, is_private, paused_users)
+            user_ids = user_ids[:1]
+            guild_id = channel_id = None
+        elif sub_channel:
+            guild_id, channel_id = int(sub_channel['server']), int(sub_channel['channel'])
         else:
-            retrieved_sub = Dansub(user_list, tags, pools, server, channel, is_private, paused_users)
-        if timestamp != 'None':
-            retrieved_sub.old_timestamp = parser.parse(timestamp)
-        return retrieved_sub
-
-    async def send_new_posts(self, sub, new_posts):
-        message_list = self._split_message_in_groups_of_four(sub, new_posts)
-        for partial_message in message_list:
-            if sub.is_private:
-                try:
+            guild_id, channel_id = int(data['server']), int(data['channel'])
+        timestamp = data.get('old_timestamp')
+        old_timestamp = parser.parse(timestamp) if timestamp and timestamp != 'None' else None
+        tags = ' '.join(sorted(data['tags']))
+        paused_ids = {int(user_id) for user_id in data.get('paused_users', [])}
+        return tags, is_private, guild_id, channel_id, data.get('pools', []), old_timestamp, user_ids, paused_ids
+
+    def queue_new_posts(self, sub, new_posts, oldest_post):
+        for partial_message in self._split_message_in_groups_of_four(sub, new_posts):
+            self.send_queue.put_nowait((sub, partial_message, oldest_post))
+
+    async def deliver_posts(self):
+        while True:
+            sub, partial_message, oldest_post = await self.send_queue.get()
+            if sub not in self.subscriptions:
+                continue
+            try:
+                if sub.is_private:
                     await sub.users[0].send(partial_message)
-                except discord.Forbidden:
-                    self.subscriptions.remove(sub)
-                    self.write_to_file()
-                    os.remove(sub.feed_file)
+                else:
+                    await sub.channel.send(partial_message)
+                sub.delivery_lag = (discord.utils.utcnow() - oldest_post).total_seconds()
+            except discord.Forbidden:
+                if sub.is_private:
+                    self.remove_sub(sub)
+                    await self.store.delete_sub(sub.sub_id)
                     self.logger.warning("Could not DM user, deleting private sub: %s", sub.tags_to_string(),exc_info=True)
-            else:
-                await sub.channel.send(partial_message)
-            await asyncio.sleep(10)
-
-    def find_matching_subs(self, tags, subs, image):
-        matched_subs = list()
-        for sub in subs:
-            if sub.tags_to_string() in image['tag_string']:
-                matched_subs.append(sub.users)
-        return matched_subs
+                else:
+                    self.logger.warning("Could not send posts of sub: %s", sub.tags_to_string(), exc_info=True)
+            except Exception:
+                self.logger.exception("error while delivering posts of sub: %s", sub.tags_to_string())
+            await asyncio.sleep(SEND_DELAY)
 
     def _split_message_in_groups_of_four(self, sub, new_posts):
         message_list = []
@@ -395,15 +583,6 @@ class Scheduler:
         sorted_tags = ' '.join(tags)
         image['tag_string'] = sorted_tags
 
-    def write_to_file(self):
-        try:
-            subscriptions = '\n'.join(sub.feed_file for sub in self.subscriptions)
-            with open(self.subs_file, 'w') as f:
-                f.write(subscriptions)
-        except Exception as e:
-            print(e)
-            raise e
-
 
 
 class Danbooru(commands.Cog):
@@ -412,11 +591,9 @@ class Danbooru(commands.Cog):
     """
     def __init__(self, bot):
         self.bot = bot
-        self.auth_file = 'data/danbooru/danbooru.json'
-        self.session = aiohttp.ClientSession()
-        self.scheduler = Scheduler(self.bot,self.session)
-        self.running_task = self.scheduler.schedule_task.start()
-        self.helper = Helper(self.session,self.bot,self.auth_file)
+        self.session = bot.session
+        self.api = bot.danbooru
+        self.scheduler = Scheduler(self.bot)
         self.init_directories()
         self.blacklist_tags_file = 'data/danbooru_cog_blacklist.json'
         self.danbooru_channel_file = 'data/danbooru_channel_file.json'
@@ -429,28 +606,15 @@ class Danbooru(commands.Cog):
         else:
             self.danbooru_channels = []
 
+    async def cog_load(self):
+        await self.scheduler.start()
+
     async def cog_unload(self):
-        try:
-            self.running_task.cancel()
-            if not self.scheduler.subscriptions:
-                return
-            self.scheduler.write_to_file()
-            for sub in self.scheduler.subscriptions:
-                sub.write_sub_to_file()
-                del sub
-            self.bot.loop.create_task(self.session.close())
-            del self.scheduler
-        except Exception as e:
-            print(e)
-            raise e
+        self.scheduler.close()
 
     def init_directories(self):
         if not os.path.exists('data/danbooru'):
             os.mkdir('data/danbooru')
-        if not os.path.exists('data/danbooru/subs/'):
-            os.mkdir('data/danbooru/subs')
-        if not os.path.exists(self.auth_file):
-            print('authentication file is missing')
 
     def _add_blacklist_to_tags(self, tags):
         if self.tags_blacklist:
@@ -539,9 +703,9 @@ class Danbooru(commands.Cog):
             channel = ctx.message.channel
         tags = self._add_blacklist_to_tags(tags)
         if random:
-            image = await self.helper.lookup_tags(tags, limit='1', random=random)
+            image = await self.api.lookup_tags(tags, limit='1', random=random)
         else:
-            image = await self.helper.lookup_tags(tags, limit='1')
+            image = await self.api.lookup_tags(tags, limit='1')
         if not image or len(image) == 0:
             await ctx.send("no image found please refer to the pin:\n"
                            "https://discordapp.com/channels/187423852224053248/402151326915493888/582629178285883394\n"
@@ -683,7 +847,7 @@ class Danbooru(commands.Cog):
         subscribe to provided tags
         tags: tags that will be looked up
         """
-        resp = await self.helper.lookup_tags(tags, limit='1')
+        resp = await self.api.lookup_tags(tags, limit='1')
 
         if not resp:
             await ctx.send("Error while looking up tag. Try again or correct your tags.")
@@ -694,7 +858,7 @@ class Danbooru(commands.Cog):
         for tag in tags_list:
             if "pool:" in tag:
                 pool_id = tag[len('pool:'):]
-                pool_name = await self.helper.lookup_pool(pool_id)
+                pool_name = await self.api.lookup_pool(pool_id)
                 pool_tag = tag
                 pool = {'tag': pool_tag, 'name': pool_name, 'id': pool_id}
                 pool_list.append(pool)
@@ -709,8 +873,8 @@ class Danbooru(commands.Cog):
                             return
                     if sub.is_private or is_private:
                         break
+                    await self.scheduler.store.add_user(sub.sub_id, message.author.id)
                     sub.users.append(message.author)
-                    sub.write_sub_to_file()
                     await ctx.send('{}\nSuccessfully added to existing sub `{}`'.format(ctx.message.author.mention,sub.tags_to_message()))
                     return
             if os.path.exists('data/danbooru/sub_channel.json'):
@@ -723,8 +887,11 @@ class Danbooru(commands.Cog):
                 new_sub = Dansub(message.author, tags_list, pool_list, message.guild, message.channel,is_private)
 
             new_sub.old_timestamp = timestamp
-            self.scheduler.subscriptions.append(new_sub)
-            new_sub.write_sub_to_file()
+            new_sub.sub_id = await self.scheduler.store.insert_sub(
+                    new_sub.tags_to_string(), is_private,
+                    None if is_private else new_sub.guild.id, None if is_private else new_sub.channel.id,
+                    pool_list, timestamp, [message.author.id])
+            self.scheduler.add_sub(new_sub)
         except Exception as e:
             await ctx.send('Error while adding sub `{}`'.format(repr(e)))
             raise e
@@ -739,30 +906,23 @@ class Danbooru(commands.Cog):
         tags:
         """
         tags_list = tags.split(' ')
-        message = ctx.message
-        user_unsubscribed = False
-        for sub in self.scheduler.subscriptions:
-            if sub.compare_tags(tags_list):
-                for user in sub.users:
-                        if user.id == message.author.id:
-                           try:
-                                user_unsubscribed = True
-                                sub.users.remove(user)
-                                self.scheduler.write_to_file()
-                                sub.write_sub_to_file()
-                                await ctx.send("successfully unsubscribed")
-                           except Exception as e:
-                               await ctx.send('Error while unsubscribing: `{}`'.format(repr(e)))
-                               raise e
-                if not user_unsubscribed:
-                    await ctx.send('You aren\'t subscribed to that tag')
-                if not sub.users:
-                    try:
-                        self.scheduler.subscriptions.remove(sub)
-                        os.remove(sub.feed_file)
-                        await ctx.send('subscription fully removed')
-                    except Exception as e:
-                        await ctx.send('Error while removing feed file. `{}`'.format(repr(e)))
+        author = ctx.message.author
+        subs = [sub for sub in self.scheduler.subscriptions
+                if sub.compare_tags(tags_list) and any(user.id == author.id for user in sub.users)]
+        if not subs:
+            await ctx.send('You aren\'t subscribed to that tag')
+            return
+        for sub in subs:
+            try:
+                deleted = await self.scheduler.store.remove_user(sub.sub_id, author.id)
+            except Exception as e:
+                await ctx.send('Error while unsubscribing: `{}`'.format(repr(e)))
+                raise e
+            sub.users = [user for user in sub.users if user.id != author.id]
+            await ctx.send("successfully unsubscribed")
+            if deleted:
+                self.scheduler.remove_sub(sub)
+                await ctx.send('subscription fully removed')
 
     @dans.command(pass_context=True)
     async def pause(self, ctx):
@@ -770,10 +930,10 @@ class Danbooru(commands.Cog):
         pauses all subscriptions that are currently running
         """
         subscriber = ctx.message.author
-        subscriptions_of_user = [sub for sub in self.scheduler.subscriptions if subscriber in sub.users]
-        for subscription in subscriptions_of_user:
-            subscription.paused_users.append(subscriber.id)
-            subscription.write_sub_to_file()
+        await self.scheduler.store.set_paused(subscriber.id, True)
+        for subscription in self.scheduler.subscriptions:
+            if subscriber in subscription.users and subscriber.id not in subscription.paused_users:
+                subscription.paused_users.append(subscriber.id)
         await ctx.send("paused all of your subscriptions")
 
     @dans.command(pass_context=True)
@@ -782,11 +942,10 @@ class Danbooru(commands.Cog):
         un-pauses all paused subscription
         """
         subscriber = ctx.message.author
-        subscriptions_of_user = [sub for sub in self.scheduler.subscriptions if subscriber in sub.users]
-        for subscription in subscriptions_of_user:
-            if int(subscriber.id) in subscription.paused_users:
-                subscription.paused_users.remove(int(subscriber.id))
-            subscription.write_sub_to_file()
+        await self.scheduler.store.set_paused(subscriber.id, False)
+        for subscription in self.scheduler.subscriptions:
+            if subscriber.id in subscription.paused_users:
+                subscription.paused_users.remove(subscriber.id)
         await ctx.send("unpaused all of your subscriptions")
 
     @dans.command(pass_context=True)
@@ -797,12 +956,13 @@ class Danbooru(commands.Cog):
         message = ctx.message
         found_subs = ''
         one_sub_found = False
-        for sub in self.scheduler.subscriptions:
-            if message.author in sub.users and (not sub.is_private or isinstance(message.channel, discord.DMChannel)):
-                if sub.is_private:
-                    found_subs += '[private] {}\n'.format(sub.tags_to_string())
+        for row in await self.scheduler.store.fetch_user_subs(message.author.id):
+            if not row['is_private'] or isinstance(message.channel, discord.DMChannel):
+                paused = ' (paused)' if row['paused'] else ''
+                if row['is_private']:
+                    found_subs += '[private] {}{}\n'.format(row['tags'], paused)
                 else:
-                    found_subs += '{}\n'.format(sub.tags_to_message())
+                    found_subs += '{}{}\n'.format(Dansub.format_tags(row['tags'].split(' '), json.loads(row['pools'])), paused)
                 one_sub_found = True
         if one_sub_found:
             pages = TextPages(ctx, found_subs)
@@ -812,32 +972,42 @@ class Danbooru(commands.Cog):
 
     @dans.command(hidden=True)
     @checks.is_owner()
-    async def convert(self, ctx):
-        with open('data/danbooru/subs_old.db') as file:
-            lines = file.readlines()
-            if lines:
-                for line in lines:
-                    sub = line.split('|')
-                    await ctx.send('converting the following sub:`{}`'.format(sub[0]))
-                    server = self.bot.get_guild(sub[3])
-                    channel = self.bot.get_channel(sub[2])
-                    users = sub[1].split(';')
-                    userlist = []
-                    for user in users:
-                        if server:
-                            member = server.get_member(user)
-                        if not member:
-                            member = self.bot.get_user(user)
-                        userlist.append(member)
-
-                    tags = sub[0]
-                    tags = tags.split(' ')
-                    dansub = Dansub(userlist,tags,server,channel)
-                    dansub.old_timestamp = parser.parse(sub[4])
-                    self.scheduler.subscriptions.append(dansub)
-                    dansub.write_sub_to_file()
-                self.scheduler.write_to_file()
+    async def stats(self, ctx):
+        """
+        show how late the lookups and deliveries of the subscriptions are
+        """
+        subs = sorted(self.scheduler.subscriptions, key=lambda s: s.delivery_lag, reverse=True)
+        lines = [f"{sub.tags_to_string()}: lookup lag {sub.poll_lag:.1f}s, delivery lag {sub.delivery_lag:.0f}s"
+                 for sub in subs]
+        header = (f"queued messages: {self.scheduler.send_queue.qsize()}\n"
+                  f"feed: {len(self.scheduler.matcher)} subs matched locally, "
+                  f"{len(self.scheduler.subscriptions) - len(self.scheduler.matcher)} looked up on their own, "
+                  f"lookup lag {self.scheduler.feed_lag:.1f}s\n")
+        pages = TextPages(ctx, header + "\n".join(lines))
+        await pages.paginate()
+
+    @dans.command(name="import", hidden=True)
+    @checks.is_owner()
+    async def import_subs(self, ctx):
+        """
+        imports the subscriptions of the old json files, use `dans restart` afterwards
+        """
+        if not os.path.exists(self.scheduler.subs_file):
+            await ctx.send("no json subscriptions left to import")
+            return
+        imported = await self.scheduler.import_json_subs()
+        await ctx.send(f"imported {imported} subscriptions")
 
+    @dans.command(name="reloadauth", hidden=True)
+    @checks.is_owner()
+    async def reload_auth(self, ctx):
+        """
+        reads the danbooru credentials again after they were changed
+        """
+        if self.api.reload():
+            await ctx.send("danbooru credentials reloaded")
+        else:
+            await ctx.send("could not load the danbooru credentials, check the log")
 
     @dans.command(hidden=True, pass_context=True)
     @checks.is_owner()
@@ -4,6 +4,8 @@ from .utils import paginator
 from .utils import views
 from .utils.dataIO import DataIO
 from .utils.exceptions import *
+from .utils.render import RenderError
+from .utils.classifier import classify
 from discord.ext.commands import DefaultHelpCommand, Paginator
 from logging.handlers import RotatingFileHandler
 from datetime import datetime, timedelta
@@ -256,6 +258,8 @@ class Default(commands.Cog):
         if not message.guild and not message.flags.ephemeral:
             user = message.author
             self.dm_logger.info(f"{user}({user.id}) message: {message.content}")
+        for event, payload in classify(message.content).events.items():
+            self.bot.dispatch(event, message, payload)
 
     async def on_command_error(self, ctx, error):
         if ctx.command and ctx.command.has_error_handler():
@@ -278,6 +282,9 @@ class Default(commands.Cog):
         elif isinstance(error, commands.CheckFailure):
             await ctx.send(error, ephemeral=True)
             return
+        elif isinstance(error, commands.CommandInvokeError) and isinstance(error.original, RenderError):
+            await ctx.send(error.original)
+            return
         elif isinstance(error, commands.CommandInvokeError):
             await self.create_and_send_traceback(ctx, error.original)
         else:
@@ -314,27 +321,20 @@ class Default(commands.Cog):
     async def check_disabled_command(self, ctx):
         owner_cog = self.bot.get_cog("Owner")
         if owner_cog:
-            if checks.user_is_in_whitelist_server(self.bot, ctx.author):
+            permissions = owner_cog.permissions
+            if permissions.is_whitelisted(self.bot, ctx.author.id):
                 return True
             current_guild = ctx.guild
-            guilds_with_disabled_command = [g["server"] for g in owner_cog.disabled_commands]
             if current_guild:
-                disabled_commands = [dc["command"] for dc in owner_cog.disabled_commands
-                                     if dc["server"] == current_guild.id]
-                if ctx.command.name in disabled_commands:
+                if permissions.is_disabled(current_guild.id, ctx.command.name):
                     raise DisabledCommandException(
                         f"{ctx.author} used disabled command")
             else:
-                for guild_id in guilds_with_disabled_command:
-                    guild = self.bot.get_guild(guild_id)
-                    if not guild:
+                for guild_id in permissions.disabled_commands:
+                    if not permissions.is_disabled(guild_id, ctx.command.name):
                         continue
-                    member = guild.get_member(ctx.author.id)
-                    if not member:
-                        continue
-                    disabled_commands = [dc["command"] for dc in owner_cog.disabled_commands
-                                         if dc["server"] == guild.id]
-                    if ctx.command.name in disabled_commands:
+                    guild = self.bot.get_guild(guild_id)
+                    if guild and guild.get_member(ctx.author.id):
                         raise DisabledCommandException(
                             f"{ctx.author} used disabled command")
         return True
@@ -342,7 +342,7 @@ class Default(commands.Cog):
     async def check_for_black_list_user(self, ctx):
         owner_cog = self.bot.get_cog("Owner")
         if owner_cog:
-            if ctx.author.id in owner_cog.global_ignores:
+            if ctx.author.id in owner_cog.permissions.blacklist:
                 bl_user = ctx.author
                 raise BlackListedException(f"blacklisted user: {bl_user} ({bl_user.id}) "
                                            f"tried to use command")
@@ -16,16 +16,13 @@ from discord.user import ClientUser
 class Distort(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.session = aiohttp.ClientSession()
+        self.session = bot.session
         self.allowed_file_extensions = ['png', 'jpg', 'jpeg', 'gif']
         if 'win32' in sys.platform:
             self.image_magick_command = "magick"
         else:
             self.image_magick_command = "convert"
 
-    async def cog_unload(self):
-        self.bot.loop.create_task(self.session.close())
-
     async def spawn_magick(self, file: io.BytesIO) -> io.BytesIO:
         proc = await asyncio.create_subprocess_exec(
             self.image_magick_command, '-', '-layers', 'coalesce', '-liquid-rescale', '50%x50%',
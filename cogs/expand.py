@@ -1,6 +1,5 @@
 from discord.ext.commands.help import Paginator
 from discord.mentions import AllowedMentions
-import httpx
 import aiohttp
 import asyncio
 import discord
@@ -17,7 +16,7 @@ from itertools import filterfalse
 from pathlib import Path
 from textwrap import shorten
 from yt_dlp import YoutubeDL, DownloadError
-from typing import Optional
+from typing import List, Optional
 from cogs.utils.views import UserDeleteButton
 
 spoiler_regex = re.compile(r"\|\|\s?(?P<link>.+?)\s?\|\|")
@@ -41,13 +40,11 @@ class LinkExpander(commands.Cog):
         if not os.path.exists('export'):
             os.mkdir('export')
         self.bot = bot
-        self.httpx = httpx.AsyncClient()
-        self.session = aiohttp.ClientSession()
+        self.session = bot.session
         self.pixiv_headers = {
                 "Referer" : "https://pixiv.net"
                 }
         self.pixiv_url_regex = re.compile(r".*pixiv.net.*/artworks/(\d+)")
-        self.twitter_url_regex = re.compile(r"https://(?:\w*\.)?(?P<domain>x|twitter)\.com/(?P<user>\w+)/status/(?P<post_id>\d+)")
         self.reddit_url_regex = re.compile(r"https?://(?:www)?(?:(?:v|old|new)?\.)?(?:redd\.?it)?(?:.com)?/(?:(?P<video_id>(?!r/)\w{10,15})|r|(?P<short_id>\w{4,8}))(?:/(?P<subreddit>\w+)/(?P<pre_id>s|comments)/(?P<post_id>\w+))?")
         path = Path('config/twitter.json')
         path_streamable = Path('config/streamable.json')
@@ -66,13 +63,9 @@ class LinkExpander(commands.Cog):
             with path_streamable.open('r') as f:
                 self.streamable_auth = json.load(f)
 
-    async def cog_unload(self):
-        self.bot.loop.create_task(self.httpx.aclose())
-        self.bot.loop.create_task(self.session.close())
 
-
-    @commands.Cog.listener("on_message")
-    async def twitter_expand(self, message: discord.Message):
+    @commands.Cog.listener("on_message_twitter_links")
+    async def twitter_expand(self, message: discord.Message, links: List[str]):
         """
         expand a twitter link to its images
         """
@@ -80,12 +73,9 @@ class LinkExpander(commands.Cog):
             return
         if any(bool(embed.video) for embed in message.embeds):
             return
-        matches = list(self.twitter_url_regex.finditer(message.content))
-        if not matches:
-            return
         urls = []
-        for match in matches:
-            url = re.sub(r"(x|twitter).com", "fxtwitter.com", match.group(0))
+        for link in links:
+            url = re.sub(r"(x|twitter).com", "fxtwitter.com", link)
             if re.search(r"(\|\|\s*)(.*)(\|\|\s*)", message.content):
                 url = f"|| {url} ||"
             urls.append(url)
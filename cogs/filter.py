@@ -4,17 +4,81 @@ import json
 import asyncio
 import re
 import os
-from aiohttp import ClientSession
+import time
+from aiohttp import ClientError
+from collections import OrderedDict
 
 from cogs.utils.views import UserDeleteButton
 from .utils.checks import is_owner_or_moderator
 from .utils.paginator import FieldPages
-from typing import Union, Optional
+from typing import Dict, FrozenSet, List, Union, Optional
 
-# https://regex101.com/r/OevXng/2
-YT_LINK = re.compile(r"(https://(youtu.be/[\w_-]+|youtube\.com/shorts/[\w_-]+|\w+\.youtube.\w+/watch)\?(\w{1,}=[\w_-]+)(&\w{1,}=[\w_-]+){0,})")
 YT_SOURCE_IDENTIFIER_FILTER = re.compile(r"(?P<SI>si=([\w_-])+)")
 SPOILER_MATCH = re.compile(r"\|\|\s?[\w\W_]+\s?\|\|")
+GALLERY_ID = re.compile(r'\b\d{1,6}\b')
+
+
+class GalleryTagCache:
+    """
+    LRU cache with expiry for the tags of nhentai galleries,
+    galleries that don't exist are cached as None.
+    Concurrent lookups of the same gallery share one request and
+    at most max_concurrency requests are sent at the same time.
+    """
+
+    def __init__(self, fetch, max_size=1024, ttl=3600, max_concurrency=4):
+        self.fetch = fetch
+        self.max_size = max_size
+        self.ttl = ttl
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.entries: OrderedDict = OrderedDict()
+        self.in_flight: Dict[str, asyncio.Future] = {}
+
+    def _cached(self, gallery_id):
+        entry = self.entries.get(gallery_id)
+        if entry is None:
+            return False, None
+        expires, tags = entry
+        if expires < time.monotonic():
+            del self.entries[gallery_id]
+            return False, None
+        self.entries.move_to_end(gallery_id)
+        return True, tags
+
+    async def get(self, gallery_id: str) -> Optional[FrozenSet[str]]:
+        hit, tags = self._cached(gallery_id)
+        if hit:
+            return tags
+        if gallery_id in self.in_flight:
+            shared = self.in_flight[gallery_id]
+            try:
+                return await asyncio.shield(shared)
+            except asyncio.CancelledError:
+                # the task doing the lookup was cancelled, not this one, look the gallery up again
+                if shared.cancelled():
+                    return await self.get(gallery_id)
+                raise
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[gallery_id] = future
+        try:
+            async with self.semaphore:
+                tags = await self.fetch(gallery_id)
+        except Exception as e:
+            future.set_exception(e)
+            # mark the exception as retrieved in case nobody else waited for it
+            future.exception()
+            raise
+        else:
+            future.set_result(tags)
+            self.entries[gallery_id] = (time.monotonic() + self.ttl, tags)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+            return tags
+        finally:
+            # the lookup was cancelled, release the waiters instead of leaving them hanging
+            if not future.done():
+                future.cancel()
+            del self.in_flight[gallery_id]
 
 class Filter(commands.Cog):
     """
@@ -24,8 +88,9 @@ class Filter(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.filter_file_path = "config/tenor_giphy_filter.json"
-        self.session = ClientSession()
+        self.session = bot.session
         self.banned_tags = ['lolicon', 'shotacon']
+        self.gallery_tags = GalleryTagCache(self.call_nhentai_api)
 
         if os.path.exists(self.filter_file_path):
             with open(self.filter_file_path, "r") as filter_file:
@@ -53,18 +118,15 @@ class Filter(commands.Cog):
             self.sticker_blacklist_channels = []
             self.sticker_blacklist_categories = []
 
-    async def cog_unload(self):
-        self.bot.loop.create_task(self.session.close())
-
-    @commands.Cog.listener("on_message")
-    async def filter_youtube_source_identifier(self, message: discord.Message):
-        if not message.content or message.author.bot:
+    @commands.Cog.listener("on_message_youtube_links")
+    async def filter_youtube_source_identifier(self, message: discord.Message, links: List[str]):
+        if message.author.bot:
             return
         youtube_links = []
         contains_spoilers = SPOILER_MATCH.search(message.content)
-        for link in YT_LINK.findall(message.content):
-            cleared_link = YT_SOURCE_IDENTIFIER_FILTER.sub('', link[0])
-            youtube_links.append((cleared_link, cleared_link != link[0]))
+        for link in links:
+            cleared_link = YT_SOURCE_IDENTIFIER_FILTER.sub('', link)
+            youtube_links.append((cleared_link, cleared_link != link))
         link_button_view = discord.ui.View()
         link_button_view.add_item(discord.ui.Button(label="Why?", url='https://i.imgur.com/D696lVp.png'))
         link_button_view.add_item(UserDeleteButton(message.author.id))
@@ -100,26 +162,22 @@ class Filter(commands.Cog):
             if parent in self.sticker_blacklist_channels or parent.category in self.sticker_blacklist_categories:
                 await message.delete()
 
-    @commands.Cog.listener("on_message")
-    async def tenor_message_filter(self, message: discord.Message):
-        contains_giphy_or_tenor_link_regex = re.compile("https://(media\.)?(tenor|giphy)?.com/")
-        match = contains_giphy_or_tenor_link_regex.match(message.content)
-        if not match:
-            return
+    @commands.Cog.listener("on_message_gif_link")
+    async def tenor_message_filter(self, message: discord.Message, _):
         if message.channel in self.blacklisted_channels or message.channel.category in self.blacklisted_categories:
             await message.delete()
         if isinstance(message.channel, discord.Thread) and (message.channel.parent in self.blacklisted_channels
                 or message.channel.parent.category in self.blacklisted_categories):
             await message.delete()
-    @commands.Cog.listener("on_message")
-    async def on_message(self, message):
-        contains_nhentai_link = re.compile(r"https?://nhentai\.net/g/(\d+)")
-        matches = contains_nhentai_link.findall(message.content)
-        for match in matches:
-            data = await self.call_nhentai_api(match)
-            if not data:
+    @commands.Cog.listener("on_message_nhentai_links")
+    async def nhentai_link_filter(self, message: discord.Message, gallery_ids: List[str]):
+        for match in gallery_ids:
+            try:
+                tags = await self.gallery_tags.get(match)
+            except ClientError:
+                continue
+            if not tags:
                 continue
-            tags = [t['name'] for t in data['tags']]
             for tag in tags:
                 if tag not in self.banned_tags:
                     continue
@@ -229,22 +287,26 @@ class Filter(commands.Cog):
         await paginator.paginate()
 
     async def check_for_tags(self, message):
-        matches = re.findall(r'\b\d{1,6}\b', message)
-        for match in matches:
-            data = await self.call_nhentai_api(match)
-            if not data:
+        matches = list(dict.fromkeys(GALLERY_ID.findall(message)))
+        results = await asyncio.gather(*(self.gallery_tags.get(match) for match in matches), return_exceptions=True)
+        for tags in results:
+            if not tags or isinstance(tags, Exception):
                 continue
-            for tag in data['tags']:
-                if tag['name'] in self.banned_tags:
-                    return True, tag['name']
+            for tag in self.banned_tags:
+                if tag in tags:
+                    return True, tag
         return False, None
 
-    async def call_nhentai_api(self, id: int):
+    async def call_nhentai_api(self, id: int) -> Optional[FrozenSet[str]]:
         
         url = f"https://nhentai.net/api/gallery/{id}"
         async with self.session.get(url) as response:
-            if response.status == 200:
-                return await response.json()
+            if response.status == 404:
+                return None
+            # errors like rate limits raise so they don't get cached as missing galleries
+            response.raise_for_status()
+            data = await response.json()
+            return frozenset(t['name'] for t in data['tags'])
 
     @commands.Cog.listener()
     async def on_reaction_add(self, reaction, user):
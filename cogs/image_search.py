@@ -8,7 +8,6 @@ from urllib import parse
 from lxml import html
 from .utils.converters import SimpleUrlArg
 
-import aiohttp
 import asyncio
 import base64
 import discord
@@ -115,10 +114,7 @@ class Search(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.logger = logging.getLogger('PoutyBot')
-        self.iqdb_session = aiohttp.ClientSession()
-        self.dans_session = aiohttp.ClientSession()
-        self.sauce_session = aiohttp.ClientSession()
-        self.tineye_session = aiohttp.ClientSession()
+        self.session = bot.session
         self.sauce_nao_settings = Path('config/sauce_nao_settings.json')
         if not self.sauce_nao_settings.exists():
             self.sauce_nao_settings.touch()
@@ -135,43 +131,25 @@ class Search(commands.Cog):
         :return: characters, artist, copyright (franchise)
         """
 
-        # json file with api key and user name for danbooru
-        # Structure:
-        # {
-        #  "user": "username",
-        #  "api_key": "ValidApiKey123"
-        # }
-        auth_file_path = 'data/danbooru/danbooru.json'
-        with open(auth_file_path, 'r') as file:
-            data = json.load(file)
-            user = data['user']
-            api_key = data['api_key']
-        auth = aiohttp.BasicAuth(user, api_key)
         characters, artist, franchise, source = None, None, None, None
-        async with self.dans_session.get('{}.json'.format(link), auth=auth) as response:
-            if response.status == 200:
-                json_dump = await response.json()
-                if json_dump['tag_count_character'] > 0:
-                    characters = self._tag_to_title(json_dump['tag_string_character'])
-                if json_dump['tag_count_artist'] > 0:
-                    artist = self._tag_to_title(json_dump['tag_string_artist'])
-                if json_dump['tag_count_copyright'] > 0:
-                    franchise = self._tag_to_title(json_dump['tag_string_copyright'])
-                if json_dump['pixiv_id']:
-                    source = "https://www.pixiv.net/member_illust.php?mode=medium&illust_id=" + str(
-                        json_dump['pixiv_id'])
-                elif json_dump['source']:
-                    source = json_dump['source']
-                return characters, artist, franchise, source
-            else:
-                await ctx.send("\n HTTP Error occured with following Status Code:{}".format(response.status))
+        json_dump = await self.bot.danbooru.lookup_post(link)
+        if not json_dump:
+            await ctx.send("\n Could not look up the post on danbooru")
+            return characters, artist, franchise, source
+        if json_dump['tag_count_character'] > 0:
+            characters = self._tag_to_title(json_dump['tag_string_character'])
+        if json_dump['tag_count_artist'] > 0:
+            artist = self._tag_to_title(json_dump['tag_string_artist'])
+        if json_dump['tag_count_copyright'] > 0:
+            franchise = self._tag_to_title(json_dump['tag_string_copyright'])
+        if json_dump['pixiv_id']:
+            source = "https://www.pixiv.net/member_illust.php?mode=medium&illust_id=" + str(
+                json_dump['pixiv_id'])
+        elif json_dump['source']:
+            source = json_dump['source']
+        return characters, artist, franchise, source
 
     def cog_unload(self):
-        loop = self.bot.loop or asyncio.get_event_loop()
-        loop.create_task(self.iqdb_session.close())
-        loop.create_task(self.dans_session.close())
-        loop.create_task(self.sauce_session.close())
-        loop.create_task(self.tineye_session.close())
         for task in self.reset_time_tasks:
             task.cancel()
 
@@ -199,7 +177,7 @@ class Search(commands.Cog):
             else:
                 url = file[0].url
             url = url.strip("<>|")
-            async with self.iqdb_session.post(url='https://iqdb.org', data={'url': url}) as response:
+            async with self.session.post(url='https://iqdb.org', data={'url': url}) as response:
                 if response.status == 200:
                     soup = BeautifulSoup(await response.text(), 'html.parser')
                     # This is for the no relevant matches case
@@ -284,7 +262,7 @@ class Search(commands.Cog):
                     'api_key': self.sauce_nao_settings.get('api_key'),
                     'hide': 2
                     }
-            async with self.sauce_session.get(url=saucenao_url, params=params) as response:
+            async with self.session.get(url=saucenao_url, params=params) as response:
                 source = None
                 if response.status == 200:
                     resp = await response.json()
@@ -369,10 +347,10 @@ class Search(commands.Cog):
             return
         image_link = link if link is not None else ctx.message.attachments[0].url
         image_link = image_link.strip("<>|")
-        image = await TraceMoe.get_frame(image_link, self.sauce_session)
+        image = await TraceMoe.get_frame(image_link, self.session)
         if image:
             request_data = {"image": image}
-            async with self.sauce_session.post(data=request_data, url="https://api.trace.moe/search", raise_for_status=True) as resp:
+            async with self.session.post(data=request_data, url="https://api.trace.moe/search", raise_for_status=True) as resp:
                 if resp.status == 200:
                     resp_json = await resp.json()
                     sorted_found = sorted(resp_json["result"], key=lambda d: d['similarity'], reverse=True)
@@ -408,7 +386,7 @@ class Search(commands.Cog):
         data = None
         if first_result.get('anilist'):
             anilist_url = f"https://anilist.co/anime/{first_result.get('anilist')}"
-            async with self.sauce_session.post(url="https://graphql.anilist.co", json={"query": TraceMoe.anilist_query, "variables": {'id': first_result.get('anilist')}}) as resp:
+            async with self.session.post(url="https://graphql.anilist.co", json={"query": TraceMoe.anilist_query, "variables": {'id': first_result.get('anilist')}}) as resp:
                 if resp.status < 400:
                     anilist_data = await resp.json()
                     data = anilist_data.get("data")
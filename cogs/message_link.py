@@ -4,6 +4,7 @@ import re
 from textwrap import shorten
 from discord.ext import commands
 from .utils.views import Confirm
+from .utils.classifier import MessageLinkMatch
 
 
 class JumpView(discord.ui.View):
@@ -17,9 +18,8 @@ class JumpView(discord.ui.View):
     @discord.ui.button(label="Opt Out/In", style=discord.ButtonStyle.danger, row=1, custom_id="message_link:optout_in:button")
     async def opt_out(self, interaction: discord.Interaction, button: discord.ui.Button):
         confirm = Confirm(interaction.user)
-        opted_out = await interaction.client.db.fetchval("""
-        SELECT opt_out FROM message_link_optout WHERE user_id = $1
-        """, interaction.user.id)
+        cog = interaction.client.get_cog("MessageLink")
+        opted_out = interaction.user.id in cog.opted_out
         if opted_out:
             await interaction.response.send_message("You're already opted out, do you want to opt-in again?", view=confirm, ephemeral=True)
         else:
@@ -30,11 +30,14 @@ class JumpView(discord.ui.View):
                 await interaction.client.db.execute("""
                 DELETE FROM message_link_optout WHERE user_id = $1
                 """, interaction.user.id)
+                cog.opted_out.discard(interaction.user.id)
                 await interaction.followup.send("I will embed message links for you from now on" ,ephemeral=True)
             else:
                 await interaction.client.db.execute("""
                 INSERT INTO message_link_optout VALUES ($1, $2)
+                ON CONFLICT (user_id) DO UPDATE SET opt_out = EXCLUDED.opt_out
                 """, interaction.user.id, True)
+                cog.opted_out.add(interaction.user.id)
                 await interaction.followup.send("I will not embed your message links from now on." ,ephemeral=True)
         else:
             if opted_out:
@@ -97,42 +100,44 @@ class JumpView(discord.ui.View):
 class MessageLink(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.opted_out = set()
 
     async def cog_load(self) -> None:
-        await self.bot.db.execute("""
-        CREATE TABLE IF NOT EXISTS message_link_optout(
-            user_id BIGINT,
-            opt_out BOOLEAN
-        )
-        """)
+        async with self.bot.db.acquire() as con, con.transaction():
+            await con.execute("""
+            CREATE TABLE IF NOT EXISTS message_link_optout(
+                user_id BIGINT PRIMARY KEY,
+                opt_out BOOLEAN
+            )
+            """)
+            # tables created before the primary key existed can contain duplicate users
+            await con.execute("""
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_constraint
+                    WHERE conrelid = 'message_link_optout'::regclass AND contype = 'p'
+                ) THEN
+                    DELETE FROM message_link_optout a USING message_link_optout b
+                    WHERE a.user_id = b.user_id AND a.ctid < b.ctid;
+                    DELETE FROM message_link_optout WHERE user_id IS NULL;
+                    ALTER TABLE message_link_optout ADD PRIMARY KEY (user_id);
+                END IF;
+            END $$;
+            """)
+            rows = await con.fetch("SELECT user_id FROM message_link_optout WHERE opt_out")
+        self.opted_out = {r.get("user_id") for r in rows}
         self.bot.add_view(JumpView(None))
 
-    @commands.Cog.listener('on_message')
-    async def link_message(self, message: discord.Message):
+    @commands.Cog.listener('on_message_link')
+    async def link_message(self, message: discord.Message, match: MessageLinkMatch):
         """Command for embedding a linked message."""
         if message.author == self.bot.user:
             return
-        opted_out = await self.bot.db.fetchval("""
-            SELECT opt_out FROM message_link_optout WHERE user_id = $1
-        """, message.author.id)
-        if opted_out:
-            return
-        # Checking if the message sent is a link to a discord message.
-        id_regex = re.compile(
-            r'(?:(?P<channel_id>[0-9]{15,20})-)?(?P<message_id>[0-9]{15,20})$')
-        link_regex = re.compile(
-            r'https?://(?:(ptb|canary|www)\.)?discord(?:app)?\.com/channels/'
-            r'(?P<guild_id>[0-9]{15,20}|@me)'
-            r'/(?P<channel_id>[0-9]{15,20})/(?P<message_id>[0-9]{15,20})/?$'
-        )
-        match = link_regex.match(
-            message.content) or id_regex.match(message.content)
-        # If it's not a message link, we simply return.
-        if not match:
+        if message.author.id in self.opted_out:
             return
-        # Parsing out the channel ID and message ID from the regular expression.
-        data = match.groupdict()
-        channel_id, message_id = int(data['channel_id']), int(data['message_id'])
+        # Message ids without a channel id refer to the current channel
+        channel_id, message_id = match.channel_id or message.channel.id, match.message_id
         linked_channel = self.bot.get_channel(channel_id)
         partial_linked_message = linked_channel.get_partial_message(message_id)
         # Fetching the full message.
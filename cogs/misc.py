@@ -1,5 +1,5 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import os
 import time
 import logging
@@ -19,6 +19,9 @@ from .utils.converters import ReferenceOrMessage
 from textwrap import shorten
 
 
+# only reminders due within this window are kept in the timer heap, the rest is loaded later
+REMINDER_WINDOW = timedelta(days=1)
+
 timing_regex = re.compile(r"^(?P<days>\d+\s?d(?:ay)?s?)?\s?(?P<hours>\d+\s?h(?:our)?s?)?\s?(?P<minutes>\d+\s?m(?:in(?:ute)?s?)?)?\s?(?P<seconds>\d+\s?s(?:econd)?s?)?")
 
 class Misc(commands.Cog):
@@ -41,11 +44,14 @@ class RemindMe(commands.Cog):
     def __init__(self, bot : commands.Bot):
         self.bot = bot
         self.units = {"minute": 60, "hour": 3600, "day": 86400, "week": 604800, "month": 2592000}
+        self.window_end = datetime.now(timezone.utc)
 
     async def cog_load(self):
-        self.table_create = self.bot.loop.create_task(self.create_remindme_table())
+        await self.create_remindme_table()
         self.bot.loop.create_task(self.load_and_delete_old_json_file( ))
-        self.check_reminders.start()
+        await self.bot.timers.register("reminder", self.fire_reminders)
+        await self.bot.timers.register("reminder_window", self.load_due_reminders)
+        await self.load_due_reminders()
 
     async def load_and_delete_old_json_file(self):
         if not os.path.exists('data/remindme/reminders.json'):
@@ -58,7 +64,7 @@ class RemindMe(commands.Cog):
             user_id = entry["ID"]
             channel_id = entry.get("CHANNEL", None)
             text = entry.get("TEXT")
-            await self.insert_reminder(user_id, text, channel_id, date)
+            await self.insert_reminder(user_id, text, channel_id, None, date)
         os.rename("data/remindme/reminders.json", "data/remindme/reminders.json.2")
 
     async def create_remindme_table(self):
@@ -75,27 +81,53 @@ class RemindMe(commands.Cog):
             ALTER TABLE reminders 
             ADD COLUMN IF NOT EXISTS message_id BIGINT
             """)
+        index_query = ("""
+            CREATE INDEX IF NOT EXISTS reminders_reminder_ts_idx ON reminders (reminder_ts);
+            CREATE INDEX IF NOT EXISTS reminders_user_id_reminder_ts_idx ON reminders (user_id, reminder_ts);
+            """)
         await self.bot.db.execute(query)
         await self.bot.db.execute(migration_query)
+        await self.bot.db.execute(index_query)
 
-    async def all_reminders(self):
+    async def fetch_due_reminders(self, before: datetime):
         async with self.bot.db.acquire() as con:
             query = '''
-                SELECT r_id, user_id, reminder, channel_id, message_id, reminder_ts 
+                SELECT r_id, reminder_ts
                 FROM reminders
+                WHERE reminder_ts < $1
                 ORDER BY reminder_ts
             '''
             statement = await con.prepare(query)
-            return await statement.fetch()
+            return await statement.fetch(before.replace(tzinfo=None))
+
+    async def load_due_reminders(self, *_):
+        """
+        put the reminders that are due before the end of the next window into the timer heap
+        and load the following window when this one ends
+        """
+        self.window_end = datetime.now(timezone.utc) + REMINDER_WINDOW
+        for reminder in await self.fetch_due_reminders(self.window_end):
+            self.bot.timers.schedule("reminder", reminder["r_id"], reminder["reminder_ts"])
+        self.bot.timers.schedule("reminder_window", None, self.window_end)
+
+    def schedule_reminder(self, r_id, date: datetime):
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        if date < self.window_end:
+            self.bot.timers.schedule("reminder", r_id, date)
+
     async def forget_user(self, user_id):
         async with self.bot.db.acquire() as con:
             query = '''
                 DELETE from reminders
                 WHERE user_id = $1
+                RETURNING r_id
             '''
             statement = await con.prepare(query)
             async with con.transaction():
-                await statement.fetch(user_id)
+                removed = await statement.fetch(user_id)
+        for reminder in removed:
+            self.bot.timers.cancel("reminder", reminder["r_id"])
 
     async def fetch_reminders(self, user_id):
         async with self.bot.db.acquire() as con:
@@ -108,16 +140,15 @@ class RemindMe(commands.Cog):
             statement = await con.prepare(query)
             return await statement.fetch(user_id)
 
-    async def fetch_reminder(self, r_id):
+    async def fetch_reminder(self, user_id, r_id):
         async with self.bot.db.acquire() as con:
             query = '''
                 SELECT r_id, user_id, reminder, channel_id, reminder_ts 
                 FROM reminders
-                WHERE r_id = $1
-                ORDER BY reminder_ts
+                WHERE user_id = $1 AND r_id = $2
             '''
             statement = await con.prepare(query)
-            return await statement.fetchrow(r_id)
+            return await statement.fetchrow(user_id, r_id)
     async def remove_reminder(self, r_id):
         async with self.bot.db.acquire() as con:
             query = '''
@@ -127,6 +158,19 @@ class RemindMe(commands.Cog):
             statement = await con.prepare(query)
             async with con.transaction():
                 await statement.fetch(r_id)
+        self.bot.timers.cancel("reminder", r_id)
+
+    async def remove_reminders(self, r_ids):
+        async with self.bot.db.acquire() as con:
+            query = '''
+                DELETE from reminders
+                WHERE r_id = ANY($1)
+            '''
+            statement = await con.prepare(query)
+            async with con.transaction():
+                await statement.fetch(r_ids)
+        for r_id in r_ids:
+            self.bot.timers.cancel("reminder", r_id)
 
     async def insert_remindme(self, user_id, text, date: datetime):
         async with self.bot.db.acquire() as con:
@@ -134,10 +178,12 @@ class RemindMe(commands.Cog):
                 INSERT INTO reminders(user_id, reminder, reminder_ts)
                 VALUES
                     ($1, $2, $3)
+                RETURNING r_id
             '''
             statement = await con.prepare(query)
             async with con.transaction():
-                await statement.fetch(user_id, text, date.replace(tzinfo=None))
+                r_id = await statement.fetchval(user_id, text, date.replace(tzinfo=None))
+        self.schedule_reminder(r_id, date)
 
     async def insert_reminder(self, user_id, text, channel_id, message_id, date):
         async with self.bot.db.acquire() as con:
@@ -145,13 +191,16 @@ class RemindMe(commands.Cog):
                 INSERT INTO reminders(user_id, reminder, channel_id, message_id, reminder_ts)
                 VALUES
                     ($1, $2, $3, $4 , $5)
+                RETURNING r_id
             '''
             statement = await con.prepare(query)
             async with con.transaction():
-                await statement.fetch(user_id, text, channel_id, message_id, date.replace(tzinfo=None))
+                r_id = await statement.fetchval(user_id, text, channel_id, message_id, date.replace(tzinfo=None))
+        self.schedule_reminder(r_id, date)
 
     def cog_unload(self):
-        self.check_reminders.cancel()
+        self.bot.timers.unregister("reminder")
+        self.bot.timers.unregister("reminder_window")
 
     def parse_timer(self, timer):
         match = timing_regex.match(timer)
@@ -226,7 +275,9 @@ class RemindMe(commands.Cog):
         await pager.paginate()
     @commands.command()
     async def rfetch(self, ctx, reminder_id:int):
-        reminder = await self.fetch_reminder(reminder_id)
+        reminder = await self.fetch_reminder(ctx.author.id, reminder_id)
+        if not reminder:
+            return await ctx.send("No reminder with that id found!")
         time_until = str(reminder['reminder_ts'] - datetime.utcnow()).split('.')[0]
         await ctx.send(f"reminder text: {reminder['reminder']}\n"
                        f"in {time_until}")
@@ -246,43 +297,53 @@ class RemindMe(commands.Cog):
         await self.forget_user(ctx.author.id)
         await ctx.send("all reminders deleted.")
 
-    @tasks.loop(seconds=5)
-    async def check_reminders(self):
-        await asyncio.wait_for(self.table_create, timeout=None)
+    async def fetch_reminders_by_id(self, r_ids):
+        async with self.bot.db.acquire() as con:
+            query = '''
+                SELECT r_id, user_id, reminder, channel_id, message_id, reminder_ts
+                FROM reminders
+                WHERE r_id = ANY($1)
+                ORDER BY reminder_ts
+            '''
+            statement = await con.prepare(query)
+            return await statement.fetch(r_ids)
+
+    async def fire_reminders(self, r_ids):
         to_remove = []
-        reminders = await self.all_reminders()
+        reminders = await self.fetch_reminders_by_id(r_ids)
         for reminder in reminders:
-            if reminder["reminder_ts"] <= datetime.utcnow():
-                try:
-                    user = self.bot.get_user(reminder["user_id"])
-                    if not user:
+            try:
+                user = self.bot.get_user(reminder["user_id"])
+                if not user:
+                    to_remove.append(reminder)
+                    continue
+                if reminder.get("channel_id", None):
+                    channel : discord.TextChannel = self.bot.get_channel(reminder["channel_id"])
+                    if not channel:
                         to_remove.append(reminder)
                         continue
-                    if reminder.get("channel_id", None):
-                        channel : discord.TextChannel = self.bot.get_channel(reminder["channel_id"])
-                        if not channel:
-                            to_remove.append(reminder)
-                            continue
-                        mention = ''
-                        message = None
-                        try:
-                            message = await channel.fetch_message(reminder.get("message_id"))
-                        except discord.NotFound as nf:
-                            mention = f"<@{reminder.get('user_id')}> "
-                        the_reminder = reminder["reminder"]
-                        await channel.send(f"{mention}Reminder for this channel:\n>>> {the_reminder}", reference=message)
-                    else:
-                        await user.send("You asked me to remind you of this:\n>>> {}".format(reminder["reminder"]))
-                    to_remove.append(reminder)
-                except (discord.Forbidden, discord.NotFound) as e:
-                    logger.error(f"{e}: for reminder {reminder['r_id']}, {reminder['reminder']}")
-                    to_remove.append(reminder)
-                except discord.HTTPException as e:
-                    logger.error(f"{e}: for reminder {reminder['r_id']}, {reminder['reminder']}")
+                    mention = ''
+                    message = None
+                    try:
+                        message = await channel.fetch_message(reminder.get("message_id"))
+                    except discord.NotFound as nf:
+                        mention = f"<@{reminder.get('user_id')}> "
+                    the_reminder = reminder["reminder"]
+                    await channel.send(f"{mention}Reminder for this channel:\n>>> {the_reminder}", reference=message)
                 else:
-                    to_remove.append(reminder)
-        for reminder in to_remove:
-            await self.remove_reminder(reminder['r_id'])
+                    await user.send("You asked me to remind you of this:\n>>> {}".format(reminder["reminder"]))
+                to_remove.append(reminder)
+            except (discord.Forbidden, discord.NotFound) as e:
+                logger.error(f"{e}: for reminder {reminder['r_id']}, {reminder['reminder']}")
+                to_remove.append(reminder)
+            except discord.HTTPException as e:
+                logger.error(f"{e}: for reminder {reminder['r_id']}, {reminder['reminder']}")
+                # keep the reminder and try again in a minute
+                self.bot.timers.schedule("reminder", reminder['r_id'], datetime.now(timezone.utc) + timedelta(minutes=1))
+            else:
+                to_remove.append(reminder)
+        if to_remove:
+            await self.remove_reminders([reminder['r_id'] for reminder in to_remove])
 
 def check_folders():
     if not os.path.exists("data/remindme"):
@@ -469,7 +530,7 @@ class SCP(commands.Cog):
     """
     def __init__(self, bot):
         self.bot = bot
-        self.session = aiohttp.ClientSession()
+        self.session = bot.session
 
     @commands.group(invoke_without_command=True)
     async def scp(self, ctx, number):
@@ -505,11 +566,6 @@ class SCP(commands.Cog):
 
 
 
-
-    def cog_unload(self):
-        self.bot.loop.create_task(self.session.close())
-
-
 async def setup(bot):
     global logger
     check_folders()
@@ -1,6 +1,5 @@
 import discord
 from discord.ext import commands
-import aiohttp
 from textwrap import shorten
 from datetime import timedelta
 from html.parser import HTMLParser
@@ -23,7 +22,7 @@ class AniSearch(commands.Cog):
     """Commands for searching myanimelist.net"""
     def __init__(self, bot):
         self.bot = bot
-        self.session = aiohttp.ClientSession()
+        self.session = bot.session
         self.remaining_requests = None
         self.colour_converter = commands.ColourConverter()
         self.logger = logging.getLogger("PoutyBot")
@@ -58,9 +57,6 @@ class AniSearch(commands.Cog):
             }
             '''
     
-    def cog_unload(self):
-        self.bot.loop.create_task(self.session.close())
-
     async def jikan_call(self, endpoint: str, parameters: dict):
         async with self.session.get(f"https://api.jikan.moe/v3/{endpoint}",
                                     params=parameters) as resp:
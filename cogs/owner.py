@@ -32,6 +32,11 @@ class Owner(commands.Cog):
             '\N{WHITE HEAVY CHECK MARK}', '\N{CROSS MARK}'
         ]
         self.last_module: Optional[str] = None
+        self.server_whitelist = checks.load_server_whitelist()
+        self.build_permission_index()
+
+    def build_permission_index(self):
+        self.permissions = checks.PermissionIndex(self.server_whitelist, self.global_ignores, self.disabled_commands)
 
     def reload_submodules(self, module, prefix='cogs.'):
         module_self = sys.modules.get(prefix + module)
@@ -166,6 +171,34 @@ class Owner(commands.Cog):
         await ctx.send('Shutting down...')
         await self.bot.close()
 
+    @commands.command(name='renderstats', hidden=True)
+    @checks.is_owner()
+    async def _render_stats(self, ctx):
+        """Show the queue depth and latency of the image render workers"""
+        stats = self.bot.renderer.stats
+        await ctx.send(f"queued jobs: {stats['queue_depth']}\n"
+                f"completed: {stats['completed']} failed: {stats['failed']}\n"
+                f"latency avg: {stats['avg_latency']:.2f}s max: {stats['max_latency']:.2f}s")
+
+    @commands.command(name='httpstats', hidden=True)
+    @checks.is_owner()
+    async def _http_stats(self, ctx):
+        """Show request counts and latencies of the shared http client per host"""
+        lines = [f"{host}: {m.requests} requests, {m.errors} errors, "
+                 f"latency avg: {m.avg_latency:.2f}s max: {m.max_latency:.2f}s"
+                 for host, m in sorted(self.bot.session.metrics.items())]
+        await ctx.send("\n".join(lines)[:2000] or "no requests made yet")
+
+    @commands.command(name='dbstats', hidden=True)
+    @checks.is_owner()
+    async def _db_stats(self, ctx):
+        """Show call counts and latencies of the named database statements"""
+        metrics = sorted(self.bot.statements.metrics.items(), key=lambda item: item[1].total_latency, reverse=True)
+        lines = [f"{name}: {m.calls} calls, {m.errors} errors, "
+                 f"latency avg: {m.avg_latency * 1000:.1f}ms max: {m.max_latency * 1000:.1f}ms"
+                 for name, m in metrics]
+        await ctx.send("\n".join(lines)[:2000] or "no statements run yet")
+
     @commands.group(pass_context=True, aliases=['bl'])
     @checks.is_owner_or_moderator()
     async def blacklist(self, ctx):
@@ -273,6 +306,7 @@ class Owner(commands.Cog):
             self.global_ignores.append(user.id)
             with open("data/ignores.json", "w") as f:
                 json.dump(self.global_ignores,f)
+            self.build_permission_index()
             await ctx.send('User {} has been blacklisted'.format(user.name))
         else:
             await ctx.send("User {} already is blacklisted".format(user.name))
@@ -284,6 +318,7 @@ class Owner(commands.Cog):
             self.global_ignores.remove(user.id)
             with open("data/ignores.json", "w") as f:
                 json.dump(self.global_ignores, f)
+            self.build_permission_index()
             await ctx.send("User {} has been removed from blacklist".format(user.name))
         else:
             await ctx.send("User {} is not blacklisted".format(user.name))
@@ -300,6 +335,7 @@ class Owner(commands.Cog):
         self.disabled_commands.append({"server": server.id, "command": command})
         with open(self.disabled_commands_file, 'w') as f:
             json.dump(self.disabled_commands, f)
+        self.build_permission_index()
         await ctx.send("command {} disabled".format(command))
 
     @_commands.command(name='enable', pass_context=True)
@@ -308,6 +344,7 @@ class Owner(commands.Cog):
         self.disabled_commands.remove({"server": server.id, "command": command})
         with open(self.disabled_commands_file, 'w') as f:
             json.dump(self.disabled_commands, f)
+        self.build_permission_index()
         await ctx.send("command {} enabled".format(command))
 
 async def setup(bot):
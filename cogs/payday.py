@@ -3,7 +3,8 @@ import random
 import asyncio
 from discord.ext import commands
 from .utils import checks, paginator, views
-from typing import Optional, TypedDict
+from .utils.db import Repository
+from typing import List, Optional, Tuple, TypedDict
 from datetime import datetime, timedelta, timezone
 from discord.ext import menus
 from asyncpg import Record
@@ -30,6 +31,46 @@ class LeaderBoardSource(menus.ListPageSource):
         return user
 
 
+class PaydayRepository(Repository):
+    namespace = "payday"
+    statements = {
+        "fetch_money": "SELECT money FROM payday WHERE user_id = $1",
+        "insert_user": "INSERT INTO payday VALUES ($1, $2)",
+        "add_money": "UPDATE payday SET money = money + $2 WHERE user_id = $1 RETURNING money",
+        "subtract_money": "UPDATE payday SET money = money - $2 WHERE user_id = $1 AND money >= $2 RETURNING money",
+        "leaderboards": "SELECT * FROM payday ORDER BY money DESC",
+    }
+
+    async def fetch_money(self, user_id: int) -> Optional[Record]:
+        return await self.fetchrow("fetch_money", user_id)
+
+    async def insert_user(self, user_id: int, start_amount: int):
+        await self.execute("insert_user", user_id, start_amount)
+
+    async def add_money(self, user_id: int, amount: int) -> Optional[int]:
+        return await self.fetchval("add_money", user_id, amount)
+
+    async def subtract_money(self, user_id: int, amount: int) -> Optional[int]:
+        """
+        returns None if the user doesn't have enough money
+        """
+        return await self.fetchval("subtract_money", user_id, amount)
+
+    async def transfer(self, spender_id: int, receiver_id: int, amount: int) -> Optional[Tuple[int, int]]:
+        """
+        returns the new balances of spender and receiver or None if the spender doesn't have enough money
+        """
+        async with self.transaction() as con:
+            spender_money = await self.fetchval("subtract_money", spender_id, amount, con=con)
+            if spender_money is None:
+                return None
+            receiver_money = await self.fetchval("add_money", receiver_id, amount, con=con)
+            return spender_money, receiver_money
+
+    async def leaderboards(self) -> List[Record]:
+        return await self.fetch("leaderboards")
+
+
 @dataclass
 class PaydayReward:
     description: str
@@ -58,7 +99,7 @@ class RewardView(discord.ui.View):
     @discord.ui.button(emoji="\N{WRAPPED PRESENT}")
     async def reward_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         button.disabled = True
-        entry = await self.payday.fetch_money(self.member.id)
+        entry = await self.payday.repo.fetch_money(self.member.id)
         bonus = random.choice(self.bonuses)
         embeds = [self.original_embed]
         if bonus.type == 1:
@@ -85,6 +126,7 @@ class Payday(commands.Cog):
         self.salary = 150
         self.bonus_chance = {}
         self.multiplicator = {}
+        self.repo = PaydayRepository(bot)
 
     async def cog_load(self):
         self.bot.loop.create_task(self.setup_payday_table())
@@ -95,55 +137,21 @@ class Payday(commands.Cog):
 
         await self.bot.db.execute(query)
 
+    # used by the casino cog
     async def fetch_money(self, user_id):
-        async with self.bot.db.acquire() as connection:
-            query = ("SELECT money from payday WHERE user_id = $1")
-            statement = await connection.prepare(query)
-            async with connection.transaction():
-                return await statement.fetchrow(user_id)
-
-    async def insert_new_user(self, user_id, start_amount):
-        async with self.bot.db.acquire() as connection:
-            query = ("INSERT INTO payday VALUES ($1, $2)")
-            statement = await connection.prepare(query)
-            async with connection.transaction():
-                return await statement.fetch(user_id, start_amount)
+        return await self.repo.fetch_money(user_id)
 
+    async def add_money(self, user_id, amount):
+        return await self.repo.add_money(user_id, amount)
 
     async def subtract_money(self, user_id, amount):
-        async with self.bot.db.acquire() as connection:
-            if amount < 0:
-                raise commands.CommandError("No negative amounts allowed")
-            get_money = ("SELECT money from payday WHERE user_id = $1")
-            set_money = ("UPDATE payday SET money = $2 WHERE user_id = $1 "
-                         "RETURNING money")
-            statement_get = await connection.prepare(get_money)
-            statement_set = await connection.prepare(set_money)
-            async with connection.transaction():
-                money = await statement_get.fetchval(user_id)
-                money -= amount
-                if money < 0:
-                    raise commands.CommandError("Sorry you don't have enough money for this transfer")
-                return await statement_set.fetchval(user_id, money)
+        if amount < 0:
+            raise commands.CommandError("No negative amounts allowed")
+        money = await self.repo.subtract_money(user_id, amount)
+        if money is None:
+            raise commands.CommandError("Sorry you don't have enough money for this transfer")
+        return money
 
-    async def add_money(self, user_id, amount):
-        async with self.bot.db.acquire() as connection:
-            get_money = ("SELECT money from payday WHERE user_id = $1")
-            set_money = ("UPDATE payday SET money = $2 WHERE user_id = $1 "
-                         "RETURNING money")
-            statement_get = await connection.prepare(get_money)
-            statement_set = await connection.prepare(set_money)
-            async with connection.transaction():
-                money = await statement_get.fetchval(user_id)
-                money += amount
-                new_amount = await statement_set.fetchval(user_id, money)
-                return new_amount
- 
-
-    async def get_leaderboards(self):
-        return await self.bot.db.fetch("SELECT * from payday order by money desc")
-
-    
     def get_bonus(self, user):
         chance = 10 + 10 * self.bonus_chance.get(user.id, 0) 
         result = random.randint(0, 100)
@@ -151,7 +159,7 @@ class Payday(commands.Cog):
 
     async def payout_embed(self, member: discord.Member, entry, added):
         is_boost = member in member.guild.premium_subscribers
-        new_balance = await self.add_money(member.id, added)
+        new_balance = await self.repo.add_money(member.id, added)
         line_len = max(len(f"{entry['money']:,}"), len(f'+{added,}'), len(f'{new_balance:,}'))
         new_bal_str = f"{new_balance:,}".rjust(line_len + 1)
         old_bal = f"{entry['money']:,}".rjust(line_len + 1)
@@ -174,9 +182,9 @@ class Payday(commands.Cog):
     async def payday_command(self, ctx):
         """claim your salary once every hour or open a new account with start capital"""
         member = ctx.author
-        entry = await self.fetch_money(member.id)
+        entry = await self.repo.fetch_money(member.id)
         if not entry:
-            await self.insert_new_user(member.id, self.start_amount)
+            await self.repo.insert_user(member.id, self.start_amount)
             return await ctx.send(f"New user with starting capital of {self.start_amount}")
         is_boost = member in member.guild.premium_subscribers
         salary = self.salary
@@ -214,12 +222,14 @@ class Payday(commands.Cog):
         """send money to someone"""
         if amount <= 0:
             return await ctx.send("invalid amount please only transfer more than 0.")
-        entry = await self.fetch_money(receiver.id)
+        entry = await self.repo.fetch_money(receiver.id)
         if not entry:
-            await self.insert_new_user(receiver.id, self.start_amount)
+            await self.repo.insert_user(receiver.id, self.start_amount)
         spender = ctx.author
-        spender_money = await self.subtract_money(spender.id, amount)
-        receiver_money = await self.add_money(receiver.id, amount)
+        balances = await self.repo.transfer(spender.id, receiver.id, amount)
+        if balances is None:
+            return await ctx.send("Sorry you don't have enough money for this transfer")
+        spender_money, receiver_money = balances
 
         if ctx.guild and ctx.guild.me.colour:
             colour = ctx.guild.me.colour
@@ -236,9 +246,9 @@ class Payday(commands.Cog):
         account_user = ctx.author
         if member: 
             account_user = member
-        entry = await self.fetch_money(account_user.id)
+        entry = await self.repo.fetch_money(account_user.id)
         if not entry and account_user == ctx.author:
-            await self.insert_new_user(account_user.id, self.start_amount)
+            await self.repo.insert_user(account_user.id, self.start_amount)
             return await ctx.send(f"Registered a new user with starting capital of {self.start_amount}")
         if not entry and account_user != ctx.author:
             return await ctx.send("This user has no balance value yet")
@@ -250,7 +260,7 @@ class Payday(commands.Cog):
     @commands.guild_only()
     async def leaderboards_command(self, ctx):
         """see who is the biggest earner on the server"""
-        leaderboards = await self.get_leaderboards()
+        leaderboards = await self.repo.leaderboards()
         pages = views.PaginatedView(source=LeaderBoardSource(leaderboards))
         await pages.start(ctx)
 
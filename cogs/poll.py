@@ -4,20 +4,27 @@ from discord.errors import HTTPException
 from discord.ext import commands, tasks
 from discord import app_commands
 import discord
-from typing import Any, Dict, Literal, Optional, List, Set, Union
+from typing import Any, Callable, Counter, Dict, Literal, Optional, List, Set, Union
 import re
 from uuid import UUID, uuid4
 from dataclasses import dataclass, field
+import asyncio
+import collections
 import itertools
+import json
 import asyncpg
-import matplotlib.pyplot as plt
 import io
 import logging
+import time
+from .utils.render import RenderError, RenderService, render_poll_chart
 
 timing_regex = re.compile(
     r"^(?P<days>\d+\s?d(?:ay)?s?)?\s?(?P<hours>\d+\s?h(?:our)?s?)?\s?(?P<minutes>\d+\s?m(?:in(?:ute)?s?)?)?\s?(?P<seconds>\d+\s?s(?:econd)?s?)?"
 )
 
+# votes are written to the database in this interval, a crash loses at most the votes of one interval
+VOTE_FLUSH_INTERVAL = 5
+
 channel_mention = re.compile(r"<(?P<type>#|@|@!|@&|a?:(?P<emote>\w+):)(?P<id>\d+)>")
 
 
@@ -70,16 +77,16 @@ class TimeTransformer(app_commands.Transformer):
         return transform_time(argument)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PollOption:
     id: UUID
     text: str
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PollVote:
     id: UUID
-    user: Union[int, discord.User]
+    user_id: int
     option: PollOption
 
 
@@ -96,20 +103,19 @@ class PollData:
     message: Union[discord.Message, discord.PartialMessage, None] = None
     options: List[PollOption] = field(default_factory=list)
     votes: Dict[int, Set[PollVote]] = field(default_factory=dict)
-    should_update = False
+    # option id -> number of votes, kept up to date by add_vote and remove_vote
+    counts: Counter[UUID] = field(default_factory=collections.Counter)
+    # users whose votes changed since the last flush
+    dirty_votes: Set[int] = field(default_factory=set)
     finished = False
     description: Optional[str] = None
     image: Optional[str] = None
+    # called whenever the votes change, set by the cog to schedule a message refresh
+    on_change: Optional[Callable[["PollData"], None]] = field(default=None, repr=False, compare=False)
 
-    @tasks.loop(seconds=2)
-    async def update_count(self):
-        if self.should_update:
-            if isinstance(self.message, discord.InteractionMessage) or isinstance(
-                self.message, discord.PartialMessage
-            ):
-                self.message = await self.message.fetch()
-            await self.message.edit(embed=self.embed)
-            self.should_update = False
+    def changed(self):
+        if self.on_change:
+            self.on_change(self)
 
     @property
     def embed(self):
@@ -131,15 +137,17 @@ class PollData:
             embed.set_image(url=self.image)
         return embed
 
+    def channel_message(self) -> Optional[discord.PartialMessage]:
+        """
+        the poll message edited through its channel, interaction messages are edited through
+        the interaction webhook whose token expires after 15 minutes
+        """
+        if isinstance(self.message, discord.InteractionMessage):
+            self.message = self.message.channel.get_partial_message(self.message.id)
+        return self.message
+
     def get_vote_count(self, option: PollOption):
-        if self.votes:
-            count = 0
-            for votes in self.votes.values():
-                for _ in filter(lambda v: v.option.id == option.id, votes):
-                    count = count + 1
-            return count
-        else:
-            return 0
+        return self.counts[option.id]
 
     @classmethod
     def from_database_entries(cls, bot: commands.Bot, entries: List):
@@ -196,43 +204,70 @@ class PollData:
             self.options = options
 
     def add_vote(self, vote: PollVote) -> None:
-        user_id = vote.user.id
+        user_id = vote.user_id
         if user_id not in self.votes:
             self.votes[user_id] = set()
 
+        self.dirty_votes.add(user_id)
         if self.type == "single":
+            self.counts.subtract(v.option.id for v in self.votes[user_id])
             self.votes[user_id] = set([vote])
-            return
-        if self.type == "multi":
+            self.counts[vote.option.id] += 1
+        elif self.type == "multi":
+            if any(v.option.id == vote.option.id for v in self.votes[user_id]):
+                return
             self.votes[user_id].add(vote)
-        self.should_update = True
+            self.counts[vote.option.id] += 1
+        self.changed()
 
-    def remove_vote(self, user: Union[discord.User, discord.Member]):
+    def remove_vote(self, user: Union[discord.User, discord.Member, discord.Object]):
         if user.id in self.votes:
-            del self.votes[user.id]
-            self.should_update = True
-
-    async def sync_votes(self, db: Union[asyncpg.Pool, asyncpg.Connection]):
-        for user_id, votes in self.votes.items():
-            await db.execute(
-                """
-                DELETE FROM poll.vote WHERE user_id = $1 AND poll = $2;
-            """,
-                user_id,
-                self.id,
-            )
-            await db.executemany(
-                """
-                INSERT INTO poll.vote VALUES ($1, $2, $3, $4)
-            """,
-                [(uuid4(), vote.user.id, vote.option.id, self.id) for vote in votes],
-            )
+            self.counts.subtract(v.option.id for v in self.votes.pop(user.id))
+            self.dirty_votes.add(user.id)
+            self.changed()
+
+    async def flush_votes(self, db: asyncpg.Pool):
+        """
+        replace the stored votes of all users whose votes changed since the last flush
+        """
+        if not self.dirty_votes:
+            return
+        user_ids = list(self.dirty_votes)
+        self.dirty_votes.clear()
+        records = [
+            (vote.id, vote.user_id, vote.option.id, self.id)
+            for user_id in user_ids
+            for vote in self.votes.get(user_id, ())
+        ]
+        try:
+            async with db.acquire() as con, con.transaction():
+                await con.execute(
+                    """
+                    DELETE FROM poll.vote WHERE poll = $1 AND user_id = ANY($2)
+                """,
+                    self.id,
+                    user_ids,
+                )
+                if records:
+                    await con.copy_records_to_table(
+                        "vote",
+                        schema_name="poll",
+                        columns=("vote_id", "user_id", "option", "poll"),
+                        records=records,
+                    )
+        except Exception:
+            self.dirty_votes.update(user_ids)
+            raise
 
     async def finish(
         self,
         db: Union[asyncpg.Pool, asyncpg.Connection],
         interaction: Optional[discord.Interaction],
+        renderer: RenderService,
     ):
+        if interaction:
+            # rendering the chart can take longer than the 3 seconds discord waits for a response
+            await interaction.response.defer()
         embed = self.embed
         description = f"{self.description if self.description else ''}\nResults:\n"
         embed.clear_fields()
@@ -248,38 +283,29 @@ class PollData:
             results = list(sorted(zip(counts, labels), reverse=True))
             description += "\n".join(f"`{r[1]}: {r[0]}`" for r in results)
             embed.description = description
-            fig, ax = plt.subplots()
-            counts = [r[0] for r in results]
-            winners = [0.1 if c == max(counts) else 0.0 for c in counts]
-            ax.pie(
-                list(map(lambda c: c[0] / sum(counts), results)),
-                labels=[r[1] for r in results],
-                explode=winners,
-                autopct="%1.1f%%",
-            )
-            ax.set_title(self.title)
-            buffer = io.BytesIO()
-            fig.savefig(buffer, format="png")
-            buffer.seek(0)
-            f = discord.File(buffer, filename="result.png")
+            kwargs = {}
+            try:
+                chart = await renderer.submit(render_poll_chart, self.title, results)
+                kwargs["file"] = discord.File(io.BytesIO(chart), filename="result.png")
+            except RenderError:
+                # the results still have to be posted and the poll closed, just without the chart
+                logging.getLogger("PoutyBot").exception("Could not render the chart of poll %s", self.id)
+                embed.set_image(url=None)
             if interaction:
-                await interaction.response.send_message(embed=embed, file=f)
+                await interaction.followup.send(embed=embed, **kwargs)
             else:
                 try:
-                    await self.message.reply(embed=embed, file=f)
+                    await self.message.reply(embed=embed, **kwargs)
                 except discord.HTTPException:
-                    await self.channel.send(embed=embed, file=f)
-            plt.close(fig)
+                    await self.channel.send(embed=embed, **kwargs)
         else:
             if interaction:
-                await interaction.response.send_message(
-                    "Poll finished without any votes"
-                )
+                await interaction.followup.send("Poll finished without any votes")
             elif self.message:
                 await self.message.reply(content="Poll finished without any votes")
 
         try:
-            await self.message.edit(embed=self.embed, view=None)
+            await self.channel_message().edit(embed=self.embed, view=None)
             try:
                 if self.message.guild:
                     thread = await self.message.guild.fetch_channel(self.message.id)
@@ -308,14 +334,14 @@ class PollData:
         except discord.HTTPException as e:
             logging.error("Error when finishing poll", e)
 
+        self.finished = True
+        self.dirty_votes.clear()
         await db.execute(
             """
         DELETE FROM poll.data WHERE poll_id = $1
         """,
             self.id,
         )
-        self.finished = True
-        self.update_count.stop()
 
 
 class DurationChangeModal(discord.ui.Modal):
@@ -395,7 +421,9 @@ class PollCreateMenu(discord.ui.View):
         ):
             embed.set_image(url=self.image.url)
         await inter.response.send_message(embed=embed, view=poll_view)
-        self.poll.message = await inter.original_response()
+        # keep a channel message, the interaction webhook can't edit it anymore after 15 minutes
+        response = await inter.original_response()
+        self.poll.message = inter.channel.get_partial_message(response.id)
         await self.poll.create_in_store(db=self.bot.db)
         for child in self.children:
             if isinstance(child, discord.ui.Button):
@@ -618,7 +646,7 @@ class EndPollButton(discord.ui.Button):
 
     async def callback(self, interaction: discord.Interaction):
         if interaction.user.id == self.poll.creator.id:
-            await self.poll.finish(self.bot.db, interaction=interaction)
+            await self.poll.finish(self.bot.db, interaction=interaction, renderer=self.bot.renderer)
         elif isinstance(interaction.user, discord.Member) and interaction.user.guild_permissions.manage_messages:
             delete_menu = DeletePollMenu(self.bot, self.poll)
             await interaction.response.send_message(embed=delete_menu.embed, view=delete_menu, ephemeral=True)
@@ -648,20 +676,16 @@ class PollOptionSelect(discord.ui.Select):
 
     async def callback(self, interaction: discord.Interaction):
         if self.is_multi:
-            self.poll.votes[interaction.user.id] = set()
+            self.poll.remove_vote(interaction.user)
         for selection in self.values:
             option = next(filter(lambda o: o.id == UUID(selection), self.poll.options))
             self.poll.add_vote(
-                PollVote(id=uuid4(), user=interaction.user, option=option)
+                PollVote(id=uuid4(), user_id=interaction.user.id, option=option)
             )
-        await self.poll.sync_votes(self.bot.db)
         await interaction.response.send_message(
             content=f"Voted for {','.join('`' + v.option.text + '`' for v in self.poll.votes[interaction.user.id])}",
             ephemeral=True,
         )
-        self.poll.should_update = True
-        if not self.poll.update_count.is_running():
-            self.poll.update_count.start()
 
 
 class PollView(discord.ui.View):
@@ -706,10 +730,65 @@ class PollModal(discord.ui.Modal):
         self.stop()
 
 
+class PollRefresher:
+    """
+    edits the messages of polls whose votes changed
+
+    one task for all polls that only runs while polls are waiting for a refresh,
+    every `interval` seconds at most `budget` messages are edited
+    """
+
+    def __init__(self, interval: float = 2.0, budget: int = 5):
+        self.interval = interval
+        self.budget = budget
+        self.dirty: Dict[UUID, PollData] = {}
+        # poll id -> hash of the last embed sent
+        self.rendered: Dict[UUID, int] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.edits = 0
+        self.skipped = 0
+
+    def mark(self, poll: PollData):
+        self.dirty[poll.id] = poll
+        if not self.task or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def forget(self, poll: PollData):
+        self.dirty.pop(poll.id, None)
+        self.rendered.pop(poll.id, None)
+
+    def close(self):
+        if self.task:
+            self.task.cancel()
+
+    async def run(self):
+        while self.dirty:
+            await asyncio.sleep(self.interval)
+            batch = [self.dirty.pop(poll_id) for poll_id in list(self.dirty)[: self.budget]]
+            results = await asyncio.gather(*(self.refresh(poll) for poll in batch), return_exceptions=True)
+            for poll, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    logging.getLogger("PoutyBot").error(f"could not refresh poll {poll.id}", exc_info=result)
+
+    async def refresh(self, poll: PollData):
+        if poll.finished or not poll.message:
+            return
+        embed = poll.embed
+        digest = hash(json.dumps(embed.to_dict(), sort_keys=True, default=str))
+        if self.rendered.get(poll.id) == digest:
+            self.skipped += 1
+            return
+        # edit through the channel so polls running longer than 15 minutes keep updating
+        poll.message = await poll.channel_message().edit(embed=embed)
+        self.rendered[poll.id] = digest
+        self.edits += 1
+
+
 class Poll(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.open_polls: List[PollData] = []
+        self.refresher = PollRefresher()
 
     @commands.Cog.listener("on_raw_message_delete")
     async def poll_removed(self, payload: discord.RawMessageDeleteEvent):
@@ -718,66 +797,89 @@ class Poll(commands.Cog):
         )
         if poll:
             self.open_polls.remove(poll)
+            self.refresher.forget(poll)
+            self.bot.timers.cancel("poll", poll.id)
             await self.bot.db.execute("""
             DELETE FROM poll.data WHERE poll_id = $1
             """,poll.id)
 
-    @tasks.loop(minutes=1)
-    async def check_poll_status(self):
-        finished_polls = []
-        for poll in self.open_polls:
-            if poll.finished:
-                finished_polls.append(poll)
-            elif poll.end_date < datetime.now(tz=timezone.utc):
-                self.bot.loop.create_task(poll.finish(self.bot.db, interaction=None))
-                finished_polls.append(poll)
-            elif (
-                self.check_poll_status.next_iteration
-                and poll.end_date < self.check_poll_status.next_iteration
-            ):
-                self.bot.loop.create_task(self.finish_up_poll(poll))
-                finished_polls.append(poll)
+    async def finish_polls(self, poll_ids):
+        finished_polls = [poll for poll in self.open_polls if poll.id in poll_ids]
         for poll in finished_polls:
             self.open_polls.remove(poll)
+            self.refresher.forget(poll)
+            if not poll.finished:
+                self.bot.loop.create_task(poll.finish(self.bot.db, interaction=None, renderer=self.bot.renderer))
+
+    def add_open_poll(self, poll: PollData):
+        poll.on_change = self.refresher.mark
+        self.open_polls.append(poll)
+        self.bot.timers.schedule("poll", poll.id, poll.end_date)
 
-    async def finish_up_poll(self, poll):
-        await discord.utils.sleep_until(poll.end_date)
-        await poll.finish(self.bot.db, interaction=None)
+    @tasks.loop(seconds=VOTE_FLUSH_INTERVAL)
+    async def flush_votes(self):
+        await self.flush_all_votes()
+
+    async def flush_all_votes(self):
+        for poll in self.open_polls:
+            if poll.finished or not poll.dirty_votes:
+                continue
+            try:
+                await poll.flush_votes(self.bot.db)
+            except asyncpg.ForeignKeyViolationError:
+                # the poll was deleted in the meantime
+                poll.dirty_votes.clear()
+            except Exception:
+                logging.getLogger("PoutyBot").exception(f"exception while saving the votes of poll {poll.id}:")
 
     async def cog_load(self):
         await self.create_database()
+        await self.bot.timers.register("poll", self.finish_polls)
         await self.load_views()
-        self.check_poll_status.start()
+        self.flush_votes.start()
 
     async def cog_unload(self):
-        self.check_poll_status.stop()
+        self.bot.timers.unregister("poll")
+        self.flush_votes.cancel()
+        self.refresher.close()
+        await self.flush_all_votes()
 
     async def load_views(self):
+        """
+        rehydrate all open polls with one query for the polls and one for their votes
+        """
+        start = time.perf_counter()
         polls = await self.bot.db.fetch(
-            "SELECT * FROM poll.data dt JOIN poll.option o on dt.poll_id = o.poll"
+            "SELECT * FROM poll.data dt JOIN poll.option o on dt.poll_id = o.poll ORDER BY dt.poll_id"
+        )
+        votes = await self.bot.db.fetch(
+            "SELECT vote_id, user_id, option, poll FROM poll.vote ORDER BY poll"
         )
+        votes_by_poll = {
+            poll_id: list(poll_votes)
+            for poll_id, poll_votes in itertools.groupby(votes, lambda v: v.get("poll"))
+        }
+        loaded = 0
         for poll_id, data in itertools.groupby(polls, lambda p: p.get("poll_id")):
             poll = PollData.from_database_entries(self.bot, list(data))
             if not poll:
                 continue
-            votes = await self.bot.db.fetch(
-                "SELECT * FROM poll.vote WHERE poll = $1", poll_id
-            )
-            for vote in votes:
-                try:
-                    option = next(
-                        filter(lambda opt: opt.id == vote.get("option"), poll.options)
-                    )
-                except StopIteration:
+            options = {option.id: option for option in poll.options}
+            for vote in votes_by_poll.get(poll_id, ()):
+                option = options.get(vote.get("option"))
+                if not option:
                     continue
-                vote = PollVote(
-                    vote.get("vote_id"),
-                    user=discord.Object(vote.get("user_id")),
-                    option=option,
+                poll.add_vote(
+                    PollVote(vote.get("vote_id"), user_id=vote.get("user_id"), option=option)
                 )
-                poll.add_vote(vote=vote)
+            # the loaded votes are already stored
+            poll.dirty_votes.clear()
             self.bot.add_view(PollView(bot=self.bot, poll=poll))
-            self.open_polls.append(poll)
+            self.add_open_poll(poll)
+            loaded += 1
+        logging.getLogger("PoutyBot").info(
+            f"loaded {loaded} polls with {len(votes)} votes in {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
 
     async def create_database(self):
         query = """
@@ -852,7 +954,7 @@ class Poll(commands.Cog):
         menu = PollCreateMenu(bot=self.bot, poll=poll_data, image=image)
         await menu.start(interaction=interaction)
         await menu.wait()
-        self.open_polls.append(menu.poll)
+        self.add_open_poll(menu.poll)
 
     @poll.command(name="multi")
     @app_commands.describe(title="The title of the Poll")
@@ -892,7 +994,7 @@ class Poll(commands.Cog):
         menu = PollCreateMenu(bot=self.bot, poll=poll_data, image=image)
         await menu.start(interaction=interaction)
         await menu.wait()
-        self.open_polls.append(menu.poll)
+        self.add_open_poll(menu.poll)
 
 
 async def setup(bot):
@@ -2,19 +2,103 @@
 
 from discord.ext import commands
 import discord
-from .utils.paginator import TextPages
+from .utils.paginator import LazyTextPages, TextPages
 from typing import Optional
-from random import randint, choice
+from random import choice
+from array import array
+from bisect import bisect_left, insort
 from .utils.checks import channel_only
+from .utils.db import Repository
+
+
+class QuoteService(Repository):
+    """
+    keeps the numbers of all quotes in memory, so random and numbered quotes
+    are fetched by their primary key instead of loading the whole table
+    """
+    namespace = "quotes"
+    statements = {
+        "numbers": "SELECT number FROM quotes ORDER BY number",
+        "get": "SELECT * FROM quotes WHERE number = $1",
+        "add": "INSERT INTO quotes (number, text, user_id) VALUES (DEFAULT, $1, $2) RETURNING number",
+        "remove": "DELETE FROM quotes WHERE number = $1 RETURNING *",
+        "by_user": "SELECT * FROM quotes WHERE user_id = $1 ORDER BY number",
+        "after": "SELECT number, text FROM quotes WHERE number > $1 ORDER BY number LIMIT $2",
+    }
+
+    def __init__(self, bot):
+        super().__init__(bot)
+        self.numbers = array('q')
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __contains__(self, number):
+        index = bisect_left(self.numbers, number)
+        return index < len(self.numbers) and self.numbers[index] == number
+
+    async def load(self):
+        records = await self.fetch("numbers")
+        self.numbers = array('q', (record['number'] for record in records))
+
+    async def get(self, number):
+        if number not in self:
+            return None
+        return await self.fetchrow("get", number)
+
+    async def random(self):
+        while self.numbers:
+            number = choice(self.numbers)
+            quote = await self.get(number)
+            if quote:
+                return quote
+            # deleted without going through the service (e.g. by hand in the database)
+            self.discard(number)
+        return None
+
+    async def add(self, text, user_id):
+        number = await self.fetchval("add", text, user_id)
+        insort(self.numbers, number)
+        return number
+
+    async def remove(self, number):
+        quote = await self.fetchrow("remove", number)
+        self.discard(number)
+        return quote
+
+    async def fetch_quotes_from_user(self, member_id: int):
+        return await self.fetch("by_user", member_id)
+
+    def discard(self, number):
+        index = bisect_left(self.numbers, number)
+        if index < len(self.numbers) and self.numbers[index] == number:
+            del self.numbers[index]
+
+    async def stream(self, batch_size=50):
+        """
+        yields all quotes ordered by number, a batch is only read once the previous one was consumed
+        and no connection is held in between
+        """
+        last = 0
+        while True:
+            quotes = await self.fetch("after", last, batch_size)
+            for quote in quotes:
+                yield quote
+            if len(quotes) < batch_size:
+                return
+            last = quotes[-1]['number']
+
 
 class Quotes(commands.Cog):
     """Save and get random quotes provided and added by the users"""
 
     def __init__(self, bot):
         self.bot = bot
+        self.quotes = QuoteService(bot)
 
     async def cog_load(self):
         self.bot.loop.create_task(self.initialize_quote_table())
+
     async def initialize_quote_table(self):
         query = "CREATE TABLE IF NOT EXISTS quotes (" \
                 "number SERIAL PRIMARY KEY, " \
@@ -23,57 +107,32 @@ class Quotes(commands.Cog):
         async with self.bot.db.acquire() as conn:
             async with conn.transaction():
                 await self.bot.db.execute(query)
-
-    async def fetch_quotes(self):
-        query = "SELECT * FROM quotes ORDER BY number"
-        async with self.bot.db.acquire() as connection:
-            return await connection.fetch(query)
+        await self.quotes.load()
 
     async def add_quote(self, quote, user_id):
         quote = discord.utils.escape_mentions(quote)
-        async with self.bot.db.acquire() as conn:
-            stmt = await conn.prepare("INSERT INTO quotes (number, text, user_id) VALUES (DEFAULT, $1, $2)\n"
-                                      "                                         RETURNING number;")
-            async with conn.transaction():
-                return await stmt.fetchval(quote, user_id)
-
-    async def remove_quote(self, number):
-        async with self.bot.db.acquire() as conn:
-            stmt = await conn.prepare("DELETE FROM quotes WHERE number = $1\n "
-                                      "RETURNING *")
-            async with conn.transaction():
-                return await stmt.fetchrow(number)
-
-    async def fetch_single_quote(self, number):
-        async with self.bot.db.acquire() as conn:
-            stmt = await conn.prepare("SELECT * FROM quotes WHERE number = $1")
-            async with conn.transaction():
-                return await stmt.fetchrow(number)
-
+        return await self.quotes.add(quote, user_id)
 
-    async def fetch_quotes_from_user(self, member_id: int):
-        async with self.bot.db.acquire() as conn:
-            stmt = await conn.prepare("SELECT * FROM quotes WHERE user_id = $1 ORDER BY number")
-            async with conn.transaction():
-                return await stmt.fetch(member_id)
 
     @commands.command(usage="**quoted text** - user, 20XX (for adding quote)\n.quote [number] (for specific quote)\n.quote (for random quote)")
     @channel_only(208765039727869954,191536772352573440,336912585960194048,336378555300577281)
     async def quote(self, ctx, number: Optional[int], *, quote: Optional[commands.clean_content]):
         """add a quote by writing it down or get a random or specific quote """
-        quotes = await self.fetch_quotes()
-
         if number and not quote:
-            quote = next(iter(q for q in quotes if q["number"] == number), None)
+            quote = await self.quotes.get(number)
             if quote:
                 await ctx.send(f"{quote['number']}) {quote['text']}")
             else:
-                quote = choice(quotes)
+                quote = await self.quotes.random()
                 await ctx.send("quote was deleted send random quote instead...")
-                await ctx.send(f"{quote['number']}) {quote['text']}")
+                if quote:
+                    await ctx.send(f"{quote['number']}) {quote['text']}")
             return
         elif not quote:
-            quote = choice(quotes)
+            quote = await self.quotes.random()
+            if not quote:
+                await ctx.send("no quotes saved yet")
+                return
             await ctx.send(f"{quote['number']}) {quote['text']}")
         else:
             if not ctx.guild or ctx.guild.id != 336378555300577281:
@@ -89,12 +148,13 @@ class Quotes(commands.Cog):
     async def allquotes(self, ctx):
         """will send you all quotes in a DM
         """
-        lines = []
-        for quote in await self.fetch_quotes():
-            lines.append(f"{quote['number']}) {quote['text']}")
+        async def lines():
+            async for quote in self.quotes.stream():
+                for line in f"{quote['number']}) {quote['text']}".split('\n'):
+                    yield line
 
         try:
-            pages = TextPages(ctx, '\n'.join(lines))
+            pages = LazyTextPages(ctx, lines())
             dm_channel = ctx.author.dm_channel
             if dm_channel:
                 pages.channel = ctx.author.dm_channel
@@ -109,7 +169,7 @@ class Quotes(commands.Cog):
     @commands.command(name="qdel")
     async def del_quote(self, ctx, number: int):
         """deletes the quote specified by number"""
-        response = await self.remove_quote(number)
+        response = await self.quotes.remove(number)
         if response:
             await ctx.send(f"quote #{response['number']} deleted")
         else:
@@ -122,7 +182,7 @@ class Quotes(commands.Cog):
         """shows who added what quote(s)"""
         if by_member:
             lines = []
-            for quote in await self.fetch_quotes_from_user(by_member.id):
+            for quote in await self.quotes.fetch_quotes_from_user(by_member.id):
                 lines.append(f"{quote['number']}) {quote['text']}")
             if not lines:
                 await ctx.send("No quotes added by this user")
@@ -130,7 +190,7 @@ class Quotes(commands.Cog):
             pages = TextPages(ctx, '\n'.join(lines))
             await pages.paginate()
         elif number:
-            quote = await self.fetch_single_quote(number)
+            quote = await self.quotes.get(number)
             if quote:
                 added_by_string = f"added by <@{quote['user_id']}>" if quote['user_id'] else ""
                 await ctx.send(f"{quote['number']}) {quote['text']} {added_by_string}")
@@ -149,6 +209,7 @@ class Quotes(commands.Cog):
                 )
                 await ctx.send(result)
                 await con.execute("DELETE FROM quotes WHERE text = '[Removed Quote]'")
+        await self.quotes.load()
 
 
 
@@ -49,6 +49,7 @@ class ReadRules(commands.Cog):
             time_over = datetime.datetime.utcnow() + datetime.timedelta(weeks=1)
             async with con.transaction():
                 await statement.fetch(new_user.id, time_over)
+        self.bot.timers.schedule("new_memester", new_user.id, time_over)
         await self.join_log.send(**self.build_join_message(new_user))
 
     async def fetch_new_memesters(self):
@@ -58,6 +59,9 @@ class ReadRules(commands.Cog):
         async with self.bot.db.acquire() as con:
             async with con.transaction():
                 return await con.fetch(query)
+    async def new_memester_timers(self):
+        return [(row["user_id"], row["time_over"]) for row in await self.fetch_new_memesters()]
+
     async def remove_user_from_new_list(self, user_id):
         query = '''
             DELETE FROM new_memesters WHERE user_id = $1
@@ -66,6 +70,7 @@ class ReadRules(commands.Cog):
             statement = await con.prepare(query)
             async with con.transaction():
                 await statement.fetch(user_id)
+        self.bot.timers.cancel("new_memester", user_id)
 
     def __init__(self, bot: commands.Bot):
         self.bucket = commands.CooldownMapping.from_cooldown(3, 600, commands.BucketType.member)
@@ -93,12 +98,12 @@ class ReadRules(commands.Cog):
         self.nword_filter = re.compile(r"(?<!s)(?P<main>[n\U0001F1F3]+(?:(?P<_nc>.)(?P=_nc)*)?[i1!|l\U0001f1ee]+(?:(?P<_ic>.)(?P=_ic)*)?[g9\U0001F1EC](?:(?P<_gc>.)(?P=_gc)*)?[g9\U0001F1EC]+(?:(?P<_gc_>.)(?P=_gc_)*)?(?:[e3€£ÉÈëeÊêËéE\U0001f1ea]+(?:(?P<_ec>.)(?P=_ec)*)?[r\U0001F1F7]+|(?P<soft>[a\U0001F1E6])))((?:(?P<_rc>.)(?P=_rc)*)?[s5]+)?(?!rd)", re.IGNORECASE)
 
     async def cog_load(self):
-        self.bot.loop.create_task(self.init_database())
+        await self.init_database()
         self.bot.loop.create_task(self.setup_rules_database())
-        self.check_for_new_memester.start()
+        await self.bot.timers.register("new_memester", self.promote_new_memesters, self.new_memester_timers)
 
     async def cog_unload(self):
-        self.check_for_new_memester.stop()
+        self.bot.timers.unregister("new_memester")
         self.limit_reset.cancel()
 
     @commands.command(name="stuck")
@@ -296,43 +301,36 @@ class ReadRules(commands.Cog):
             logger.warning(f"Could not fetch user with user id {user_id}")
             return None
 
-    @tasks.loop(minutes=1)
-    async def check_for_new_memester(self):
+    async def promote_new_memesters(self, user_ids):
         if not self.animemes_guild:
             return
-        rows = await self.fetch_new_memesters()
-        try:
-            for row in rows:
-                if row["time_over"] < datetime.datetime.utcnow():
-                    member = self.animemes_guild.get_member(row["user_id"])
-                    if member is None:
-                        member = await self.fetch_member_via_api(row["user_id"])
-                    if member:
-                        await member.add_roles(self.memester_role)
-                        await member.remove_roles(self.new_memester)
-                    await self.remove_user_from_new_list(row["user_id"])
-        except (discord.NotFound):
-            await self.remove_user_from_new_list(row["user_id"])
-        except (discord.Forbidden, discord.HTTPException):
-            logger = logging.getLogger("PoutyBot")
-            logger.error(traceback.format_exc())
-        except Exception as e: 
-            logger = logging.getLogger("PoutyBot")
-            logger.error("memester check was cancelled", exc_info=1)
-            owner = self.bot.get_user(self.bot.owner_id)
-            lines = traceback.format_exc().splitlines()
-            paginator = commands.Paginator()
-            paginator.add_line("check_for_new_memester failed")
-            for line in lines:
-                paginator.add_line(line)
-            for page in paginator.pages:
-                await owner.send(page)
-
-    @check_for_new_memester.after_loop
-    async def memester_check_error(self):
-        if self.check_for_new_memester.failed():
-            await asyncio.sleep(3600)
-            self.check_for_new_memester.restart()
+        for user_id in user_ids:
+            try:
+                member = self.animemes_guild.get_member(user_id)
+                if member is None:
+                    member = await self.fetch_member_via_api(user_id)
+                if member:
+                    await member.add_roles(self.memester_role)
+                    await member.remove_roles(self.new_memester)
+                await self.remove_user_from_new_list(user_id)
+            except (discord.NotFound):
+                await self.remove_user_from_new_list(user_id)
+            except (discord.Forbidden, discord.HTTPException):
+                logger = logging.getLogger("PoutyBot")
+                logger.error(traceback.format_exc())
+                self.bot.timers.schedule("new_memester", user_id,
+                                         datetime.datetime.utcnow() + datetime.timedelta(minutes=1))
+            except Exception as e:
+                logger = logging.getLogger("PoutyBot")
+                logger.error("memester check was cancelled", exc_info=1)
+                owner = self.bot.get_user(self.bot.owner_id)
+                lines = traceback.format_exc().splitlines()
+                paginator = commands.Paginator()
+                paginator.add_line("promote_new_memesters failed")
+                for line in lines:
+                    paginator.add_line(line)
+                for page in paginator.pages:
+                    await owner.send(page)
 
     @commands.Cog.listener(name="on_member_update")
     async def new_memester_assigned(self, before: discord.Member, after: discord.Member):
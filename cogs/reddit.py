@@ -1,11 +1,12 @@
 import json
-import httpx
+import aiohttp
 import re
 import datetime
 import discord
 from discord.ext import commands, tasks
 from os import path
 from .utils import checks
+from .utils.classifier import REDDIT_PATTERN
 import asyncio
 import logging
 import traceback
@@ -23,10 +24,10 @@ class Reddit(commands.Cog):
             if self.credentials:
                 self.client_id = self.credentials['client_id']
                 self.secret = self.credentials['client_secret']
-                self.auth = httpx.BasicAuth(self.client_id, self.secret)
+                self.auth = aiohttp.BasicAuth(self.client_id, self.secret)
                 self.headers = {'User-Agent': 'Discord-Bot by /u/Saikimo',
                                 'Content-Type': 'application/json'}
-            self.session = httpx.AsyncClient()
+            self.session = bot.session
             self.reddit_settings_path = "data/reddit_settings.json"
             self.checker_channel = None
             if not path.exists(self.reddit_settings_path):
@@ -42,7 +43,6 @@ class Reddit(commands.Cog):
         self.check_reddit_for_pinned_threads.start()
         self.bot.loop.create_task(self.create_last_posts_table())
     async def cog_unload(self):
-        self.bot.loop.create_task(self.session.aclose())
         self.check_reddit_for_pinned_threads.stop()
 
     async def create_last_posts_table(self):
@@ -91,10 +91,9 @@ class Reddit(commands.Cog):
     @tasks.loop(minutes=60)
     async def check_reddit_for_pinned_threads(self):
         try:
-            resp = await self.session.get(url="https://old.reddit.com/r/Animemes.json", auth=self.auth,
-                                        headers=self.headers)
-            resp.raise_for_status()
-            resp_data = resp.json()
+            async with self.session.get(url="https://old.reddit.com/r/Animemes.json", auth=self.auth,
+                                        headers=self.headers, raise_for_status=True) as resp:
+                resp_data = await resp.json()
             stickied_post = [post['data'] for post in resp_data["data"]["children"] if post['data']["stickied"]]
             last_posts = await self.fetch_last_stickied_entries()
             if not last_posts:
@@ -115,19 +114,17 @@ class Reddit(commands.Cog):
             logger.error(traceback.format_exc())
 
     async def get_stickied_comment(self, post):
-        resp = await self.session.get(url=f"https://www.reddit.com{post['permalink']}.json")
-        resp.raise_for_status()
-        json_data =  resp.json()
+        async with self.session.get(url=f"https://www.reddit.com{post['permalink']}.json", raise_for_status=True) as resp:
+            json_data = await resp.json()
         try:
             return next(comment for comment in json_data[1]["data"]["children"] if comment["data"]["stickied"])
         except StopIteration:
             return None
 
     async def build_embed_for_stickied_thread(self, post):
-        resp = await self.session.get(url="https://www.reddit.com/r/Animemes/about.json", auth=self.auth,
-                                    headers=self.headers)
-        resp.raise_for_status()
-        resp_data = resp.json()
+        async with self.session.get(url="https://www.reddit.com/r/Animemes/about.json", auth=self.auth,
+                                    headers=self.headers, raise_for_status=True) as resp:
+            resp_data = await resp.json()
         sub_data = resp_data["data"]
         if post["is_self"]:
             embed = discord.Embed(title=post["title"], timestamp=datetime.datetime.utcfromtimestamp(post["created_utc"]),
@@ -162,21 +159,19 @@ class Reddit(commands.Cog):
             return
         if "subreddit-discussion" in after.channel.name.lower() or 522729174780084225 == after.channel.id:
             return
-        contains_reddit_link_regex = re.compile("https://(\w+\.)?redd\.?it(.com/(r/\w+/)?comments)?/(\w+)",
-                                                re.MULTILINE)
-        match = contains_reddit_link_regex.search(after.content)
+        match = REDDIT_PATTERN.search(after.content)
         if not match:
             return
-        if match.group(1) and match.group(1).startswith('v'):
-            vid_url = match.string[match.span()[0]: match.span()[1]]
-            response = await self.session.get(url=vid_url, auth=self.auth, headers=self.headers)
-            response.raise_for_status()
-            url = str(response.url) + '.json'
+        if match.group("reddit_subdomain") and match.group("reddit_subdomain").startswith('v'):
+            vid_url = match.group(0)
+            async with self.session.get(url=vid_url, auth=self.auth, headers=self.headers,
+                                        raise_for_status=True) as response:
+                url = str(response.url) + '.json'
         else:
-            url = "https://www.reddit.com/comments/" + match.group(4) + ".json"
-        response = await self.session.get(url=url, auth=self.auth, headers=self.headers)
-        response.raise_for_status()
-        json_dump = response.json()
+            url = "https://www.reddit.com/comments/" + match.group("reddit_id") + ".json"
+        async with self.session.get(url=url, auth=self.auth, headers=self.headers,
+                                    raise_for_status=True) as response:
+            json_dump = await response.json()
         post_data = json_dump[0]['data']['children'][0]['data']
         creation_time = datetime.datetime.utcfromtimestamp(int(post_data['created_utc']))
         now = datetime.datetime.utcnow()
@@ -197,30 +192,25 @@ class Reddit(commands.Cog):
                 await self.checker_channel.send(
                     "Warned {0}\nposted a reddit link that was too recent".format(after.author.mention))
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
+    @commands.Cog.listener("on_message_reddit_links")
+    async def on_message(self, message, matches):
         if not message.guild:
             return
         if "subreddit-discussion" in message.channel.name.lower() or 522729174780084225 == message.channel.id:
             return
-        contains_reddit_link_regex = re.compile("https://(\w+\.)?redd\.?it(.com/(r/\w+/)?comments)?/(\w+)",
-                                                re.MULTILINE)
-        match = contains_reddit_link_regex.search(message.content)
-        url = message.content
-        if not match:
-            return
-        if match.group(1) and match.group(1).startswith('v'):
-            vid_url = match.string[match.span()[0]: match.span()[1]]
-            response = await self.session.get(url=vid_url, auth=self.auth, headers=self.headers)
-            response.raise_for_status()
-            url = str(response.url) + '.json'
-        elif match.group(1) and match.group(1).startswith('i'):
+        match = matches[0]
+        if match.group("reddit_subdomain") and match.group("reddit_subdomain").startswith('v'):
+            vid_url = match.group(0)
+            async with self.session.get(url=vid_url, auth=self.auth, headers=self.headers,
+                                        raise_for_status=True) as response:
+                url = str(response.url) + '.json'
+        elif match.group("reddit_subdomain") and match.group("reddit_subdomain").startswith('i'):
             return
         else:
-            url = "https://www.reddit.com/comments/" + match.group(4) + ".json"
-        response = await self.session.get(url=url, auth=self.auth, headers=self.headers)
-        response.raise_for_status()
-        json_dump = response.json()
+            url = "https://www.reddit.com/comments/" + match.group("reddit_id") + ".json"
+        async with self.session.get(url=url, auth=self.auth, headers=self.headers,
+                                    raise_for_status=True) as response:
+            json_dump = await response.json()
         post_data = json_dump[0]['data']['children'][0]['data']
         creation_time = datetime.datetime.utcfromtimestamp(int(post_data['created_utc']))
         now = datetime.datetime.utcnow()
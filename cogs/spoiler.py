@@ -1,5 +1,4 @@
 from .utils.converters import SimpleUrlArg
-from aiohttp import ClientSession
 from discord.ext import commands
 
 import discord
@@ -21,7 +20,7 @@ class SpoilerArg(commands.Converter):
 class SpoilerCheck(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.session = ClientSession()
+        self.session = bot.session
         self.logger = logging.getLogger("PoutyBot")
 
 
@@ -1,6 +1,8 @@
 import discord
-from discord.ext import commands
-from typing import Optional
+from discord.ext import commands, tasks
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional, Set
 from datetime import timedelta, datetime, timezone
 from .utils import checks 
 from logging import getLogger
@@ -22,11 +24,208 @@ def requires_starboard(func):
         return True
 
 
+class StarReactors:
+    """
+    the users who starred a message either on the original message or on the starboard
+    """
+    __slots__ = ("users", "counts")
+
+    def __init__(self):
+        # user id -> ids of the messages (original or starboard) the user starred
+        self.users: Dict[int, Set[int]] = {}
+        # message id -> amount of star reactions on that message
+        self.counts: Counter = Counter()
+
+    def add(self, reacted_message_id, user_id):
+        reacted_on = self.users.setdefault(user_id, set())
+        if reacted_message_id not in reacted_on:
+            reacted_on.add(reacted_message_id)
+            self.counts[reacted_message_id] += 1
+
+    def remove(self, reacted_message_id, user_id):
+        reacted_on = self.users.get(user_id)
+        if not reacted_on or reacted_message_id not in reacted_on:
+            return
+        reacted_on.discard(reacted_message_id)
+        self.counts[reacted_message_id] -= 1
+        if not reacted_on:
+            del self.users[user_id]
+
+    def replace(self, reacted_message_id, user_ids):
+        for user_id in list(self.users):
+            self.remove(reacted_message_id, user_id)
+        for user_id in user_ids:
+            self.add(reacted_message_id, user_id)
+
+    def count(self, *excluded):
+        return len(self.users) - sum(1 for user_id in set(excluded) if user_id in self.users)
+
+
+class StarReactorTracker:
+    """
+    keeps track of who starred a message, incrementally updated from the raw reaction events
+    and persisted in the starboard_reactors table.
+    The reactions of the message are only paged through via the API if the stored
+    state does not match the reaction count discord reports for the message.
+    """
+
+    def __init__(self, bot, emoji, max_size=512):
+        self.bot = bot
+        self.emoji = emoji
+        self.max_size = max_size
+        self.cache: OrderedDict[int, StarReactors] = OrderedDict()
+
+    async def initialize_db(self):
+        await self.bot.db.execute("""
+            CREATE TABLE IF NOT EXISTS starboard_reactors(
+                message_id BIGINT NOT NULL,
+                reacted_message_id BIGINT NOT NULL,
+                user_id BIGINT NOT NULL,
+                guild_id BIGINT NOT NULL,
+                PRIMARY KEY (message_id, reacted_message_id, user_id)
+            )
+        """)
+
+    def _store(self, message_id, reactors):
+        self.cache[message_id] = reactors
+        self.cache.move_to_end(message_id)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    async def _load(self, message_id):
+        reactors = self.cache.get(message_id)
+        if reactors is not None:
+            self.cache.move_to_end(message_id)
+            return reactors
+        reactors = StarReactors()
+        rows = await self.bot.db.fetch("""
+            SELECT reacted_message_id, user_id FROM starboard_reactors WHERE message_id = $1
+        """, message_id)
+        for row in rows:
+            reactors.add(row.get("reacted_message_id"), row.get("user_id"))
+        self._store(message_id, reactors)
+        return reactors
+
+    async def add(self, guild_id, message_id, reacted_message_id, user_id):
+        await self.bot.db.execute("""
+            INSERT INTO starboard_reactors (message_id, reacted_message_id, user_id, guild_id)
+            VALUES ($1, $2, $3, $4) ON CONFLICT DO NOTHING
+        """, message_id, reacted_message_id, user_id, guild_id)
+        reactors = self.cache.get(message_id)
+        if reactors is not None:
+            reactors.add(reacted_message_id, user_id)
+
+    async def remove(self, message_id, reacted_message_id, user_id):
+        await self.bot.db.execute("""
+            DELETE FROM starboard_reactors WHERE message_id = $1 AND reacted_message_id = $2 AND user_id = $3
+        """, message_id, reacted_message_id, user_id)
+        reactors = self.cache.get(message_id)
+        if reactors is not None:
+            reactors.remove(reacted_message_id, user_id)
+
+    async def forget(self, message_ids, reacted_message_ids=None):
+        """
+        remove the tracked reactors of the given original messages,
+        if reacted_message_ids is set only the reactions on those messages get removed
+        """
+        if reacted_message_ids is None:
+            await self.bot.db.execute("""
+                DELETE FROM starboard_reactors WHERE message_id = ANY($1)
+            """, message_ids)
+            for message_id in message_ids:
+                self.cache.pop(message_id, None)
+            return
+        await self.bot.db.execute("""
+            DELETE FROM starboard_reactors WHERE message_id = ANY($1) AND reacted_message_id = ANY($2)
+        """, message_ids, reacted_message_ids)
+        for message_id in message_ids:
+            reactors = self.cache.get(message_id)
+            if reactors is None:
+                continue
+            for reacted_message_id in reacted_message_ids:
+                reactors.replace(reacted_message_id, [])
+
+    async def _scan(self, message_id, reactors, reacted_message):
+        user_ids = set()
+        reaction = discord.utils.get(reacted_message.reactions, emoji=self.emoji)
+        if reaction:
+            async for user in reaction.users():
+                user_ids.add(user.id)
+        reactors.replace(reacted_message.id, user_ids)
+        async with self.bot.db.acquire() as con, con.transaction():
+            await con.execute("""
+                DELETE FROM starboard_reactors WHERE message_id = $1 AND reacted_message_id = $2
+            """, message_id, reacted_message.id)
+            await con.executemany("""
+                INSERT INTO starboard_reactors (message_id, reacted_message_id, user_id, guild_id)
+                VALUES ($1, $2, $3, $4)
+            """, [(message_id, reacted_message.id, user_id, reacted_message.guild.id) for user_id in user_ids])
+
+    async def get(self, message, starboard_message=None):
+        """
+        get the reactors of a message, messages whose tracked reaction count
+        differs from the count discord reports are scanned again
+        """
+        reactors = await self._load(message.id)
+        for reacted_message in (message, starboard_message):
+            if reacted_message is None:
+                continue
+            reaction = discord.utils.get(reacted_message.reactions, emoji=self.emoji)
+            expected = reaction.count if reaction else 0
+            if reactors.counts[reacted_message.id] != expected:
+                await self._scan(message.id, reactors, reacted_message)
+        return reactors
+
+    async def prune(self):
+        """
+        remove the reactors of messages that are too old to be starred and are not on the starboard
+        """
+        await self.bot.db.execute("""
+            DELETE FROM starboard_reactors r
+            USING starboard_config c
+            WHERE r.guild_id = c.guild_id
+            AND to_timestamp(((r.message_id >> 22) + 1420070400000) / 1000.0) < now() - c.max_age
+            AND NOT EXISTS (SELECT 1 FROM starboard_entries e WHERE e.message_id = r.message_id)
+        """)
+
+
+@dataclass
+class PendingEdit:
+    entry: Mapping
+    events: int = 0
+    removed: bool = False
+
+
 class Starboard(commands.Cog):
     
     async def get_starboard(self, guild_id):
-        async with self.bot.db.acquire() as con:
-            return await con.fetchrow("SELECT * FROM starboard_config WHERE guild_id = $1", guild_id)
+        return self.starboard_configs.get(guild_id)
+
+    async def load_starboard_configs(self):
+        self.starboard_configs = {
+                row.get("guild_id"): row for row in
+                await self.bot.db.fetch("SELECT * FROM starboard_config")
+        }
+
+    async def refresh_starboard_config(self, guild_id):
+        row = await self.bot.db.fetchrow("SELECT * FROM starboard_config WHERE guild_id = $1", guild_id)
+        if row:
+            self.starboard_configs[guild_id] = row
+        else:
+            self.starboard_configs.pop(guild_id, None)
+        return row
+
+    async def update_starboard_config(self, guild_id, query, *args):
+        """
+        run a query that returns the changed starboard_config row,
+        update the local cache and notify the other listeners about the change
+        """
+        async with self.bot.db.acquire() as con, con.transaction():
+            row = await con.fetchrow(query, *args)
+            await con.execute("""SELECT pg_notify('starboard_config', $1)""", str(guild_id))
+        if row:
+            self.starboard_configs[guild_id] = row
+        return row
 
     async def fetch_starboard_entry(self, message_id, guild_id):
         return await self.bot.db.fetchrow("""
@@ -63,9 +262,82 @@ class Starboard(commands.Cog):
         self.bot = bot
         self.star_emoji = "\N{WHITE MEDIUM STAR}"
         self.logger = getLogger("PoutyBot")
+        self.starboard_configs = {}
+        self.reactors = StarReactorTracker(bot, self.star_emoji)
+        self.pending_edits: Dict[int, PendingEdit] = {}
+        self.reaction_events = 0
+        self.edits_sent = 0
 
     async def cog_load(self):
-        self.bot.loop.create_task(self.initialize_db())
+        await self.initialize_db()
+        await self.reactors.initialize_db()
+        self.prune_reactors.start()
+        self.flush_edits.start()
+        await self.load_starboard_configs()
+        self.con = await self.bot.db.acquire()
+        await self.con.add_listener('starboard_config', self.starboard_config_listener)
+
+    async def cog_unload(self):
+        self.prune_reactors.cancel()
+        self.flush_edits.cancel()
+        await self.con.remove_listener('starboard_config', self.starboard_config_listener)
+        await self.bot.db.release(self.con)
+
+    @tasks.loop(hours=24)
+    async def prune_reactors(self):
+        await self.reactors.prune()
+
+    def schedule_edit(self, starboard_entry, removed=False):
+        """
+        mark a starboard entry for an update, all reaction events within
+        one interval of flush_edits result in a single edit
+        """
+        pending = self.pending_edits.setdefault(starboard_entry.get("message_id"), PendingEdit(entry=starboard_entry))
+        pending.events += 1
+        pending.removed = pending.removed or removed
+        self.reaction_events += 1
+
+    @tasks.loop(seconds=2)
+    async def flush_edits(self):
+        pending_edits = list(self.pending_edits.values())
+        self.pending_edits.clear()
+        for pending in pending_edits:
+            try:
+                await self.apply_edit(pending)
+            except Exception as e:
+                self.logger.error("error while updating starboard entry: %s", e, exc_info=True)
+
+    async def apply_edit(self, pending):
+        entry = pending.entry
+        starboard = await self.get_starboard(entry.get("guild_id"))
+        if not starboard:
+            return
+        guild = self.bot.get_guild(entry.get("guild_id"))
+        sb_channel = guild.get_channel(starboard.get("channel_id"))
+        original_channel = guild.get_channel_or_thread(entry.get("channel_id"))
+        message = None
+        bot_message = None
+        try:
+            message = await original_channel.fetch_message(entry.get("message_id"))
+            bot_message = await sb_channel.fetch_message(entry.get("bot_message_id"))
+        except (discord.NotFound, discord.HTTPException) as e:
+            self.logger.error("error while fetching starred message: %s", e, exc_info=True)
+            return
+        star_num = await self.get_star_emoji_number(message, bot_message)
+        if pending.removed and star_num < starboard.get("threshold"):
+            await bot_message.delete()
+            await self.bot.db.execute("""
+                DELETE FROM starboard_entries WHERE message_id = $1
+                """, message.id)
+            await self.reactors.forget([message.id], [bot_message.id])
+        else:
+            embed = await self.create_starboard_embed(message, bot_message)
+            await bot_message.edit(embed=embed)
+        self.edits_sent += 1
+        self.logger.debug("starboard entry %s updated once for %s reaction events", message.id, pending.events)
+
+    async def starboard_config_listener(self, connection, pid, channel, payload):
+        await self.refresh_starboard_config(int(payload))
 
     def convert_string_timedelta(self, string):
             try:
@@ -82,19 +354,14 @@ class Starboard(commands.Cog):
         """
         commands for configuring and managing the starboard
         """
-        starboard_config = await self.get_starboard(ctx.guild.id)
-        async with self.bot.db.acquire() as con:
-            max_age = self.convert_string_timedelta(max_age)
-            if starboard_config:
-                await con.execute("""
-                    UPDATE starboard_config SET (channel_id, threshold, max_age) = ($2, $3, $4) WHERE guild_id = $1
-                """, ctx.guild.id, channel.id, threshold, max_age)
-            else: 
-                await con.execute("""
-                    INSERT INTO starboard_config(guild_id, channel_id, threshold, is_locked, max_age) 
-                    VALUES ($1, $2, $3, $4, $5)
-                """, ctx.guild.id, channel.id, threshold, False, max_age)
-            await ctx.send(f"Set starboard to {channel.mention} with a vote threshold of {threshold} and a max message age of {max_age}")
+        max_age = self.convert_string_timedelta(max_age)
+        await self.update_starboard_config(ctx.guild.id, """
+            INSERT INTO starboard_config(guild_id, channel_id, threshold, is_locked, max_age) 
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (guild_id) DO UPDATE SET (channel_id, threshold, max_age) = (EXCLUDED.channel_id, EXCLUDED.threshold, EXCLUDED.max_age)
+            RETURNING *
+        """, ctx.guild.id, channel.id, threshold, False, max_age)
+        await ctx.send(f"Set starboard to {channel.mention} with a vote threshold of {threshold} and a max message age of {max_age}")
 
     @starboard.command(name="info")
     @checks.is_owner_or_moderator()
@@ -111,6 +378,7 @@ class Starboard(commands.Cog):
         embed.add_field(name="Threshold",value=starboard.get("threshold"))
         embed.add_field(name="Max age",value=starboard.get("max_age"))
         embed.add_field(name="Starred Messages Count", value=sb_message_count)
+        embed.add_field(name="Coalesced Edits", value=f"{self.edits_sent} edits for {self.reaction_events} reactions")
         await ctx.send(embed=embed)
     @starboard.command(name="channel")
     @checks.is_owner_or_moderator()
@@ -120,7 +388,7 @@ class Starboard(commands.Cog):
         """
         if not await self.get_starboard(ctx.guild.id):
             return await ctx.send(f"no starboard config found please set it up with `{ctx.prefix}{self.starboard.name}`")
-        await self.bot.db.execute("UPDATE starboard_config SET channel_id = $1 WHERE guild_id = $2", channel.id, ctx.guild.id)
+        await self.update_starboard_config(ctx.guild.id, "UPDATE starboard_config SET channel_id = $1 WHERE guild_id = $2 RETURNING *", channel.id, ctx.guild.id)
         await ctx.send(f"Set the starboard channel to {channel.mention}")
 
     @starboard.command(name="show")
@@ -145,7 +413,7 @@ class Starboard(commands.Cog):
         """
         if not await self.get_starboard(ctx.guild.id):
             return await ctx.send(f"no starboard config found please set it up with `{ctx.prefix}{self.starboard.name}`")
-        await self.bot.db.execute("UPDATE starboard_config SET threshold = $1 WHERE guild_id = $2", threshold, ctx.guild.id)
+        await self.update_starboard_config(ctx.guild.id, "UPDATE starboard_config SET threshold = $1 WHERE guild_id = $2 RETURNING *", threshold, ctx.guild.id)
         await ctx.send(f"Set the vote threshold to {threshold}")
     
     @starboard.command(name="age")
@@ -157,7 +425,7 @@ class Starboard(commands.Cog):
         if not await self.get_starboard(ctx.guild.id):
             return await ctx.send(f"no starboard config found please set it up with `{ctx.prefix}{self.starboard.name}`")
         max_age = self.convert_string_timedelta(max_age)
-        await self.bot.db.execute("UPDATE starboard_config SET max_age = $1 WHERE guild_id = $2", max_age, ctx.guild.id)
+        await self.update_starboard_config(ctx.guild.id, "UPDATE starboard_config SET max_age = $1 WHERE guild_id = $2 RETURNING *", max_age, ctx.guild.id)
         await ctx.send(f"Set the max message age to {max_age}")
     @starboard.command(name="lock")
     @checks.is_owner_or_moderator()
@@ -167,7 +435,7 @@ class Starboard(commands.Cog):
         """
         if not await self.get_starboard(ctx.guild.id):
             return await ctx.send(f"no starboard config found please set it up with `{ctx.prefix}{self.starboard.name}`")
-        await self.bot.db.execute("UPDATE starboard_config SET is_locked = true WHERE guild_id = $1", ctx.guild.id)
+        await self.update_starboard_config(ctx.guild.id, "UPDATE starboard_config SET is_locked = true WHERE guild_id = $1 RETURNING *", ctx.guild.id)
         await ctx.send(f"Starboard was locked")
 
     @starboard.command(name="unlock")
@@ -178,23 +446,12 @@ class Starboard(commands.Cog):
         """
         if not await self.get_starboard(ctx.guild.id):
             return await ctx.send(f"no starboard config found please set it up with `{ctx.prefix}{self.starboard.name}`")
-        await self.bot.db.execute("UPDATE starboard_config SET is_locked = false WHERE guild_id = $1", ctx.guild.id)
+        await self.update_starboard_config(ctx.guild.id, "UPDATE starboard_config SET is_locked = false WHERE guild_id = $1 RETURNING *", ctx.guild.id)
         await ctx.send(f"Starboard was unlocked")
 
     async def get_star_emoji_number(self, reacted_message, starboard_message=None):
-        star_react_orig = discord.utils.get(reacted_message.reactions, emoji=self.star_emoji)
-        users_who_reacted = set()
-        if star_react_orig:
-            async for user in star_react_orig.users():
-                users_who_reacted.add(user.id)
-        if starboard_message:
-            star_react_sb = discord.utils.get(starboard_message.reactions, emoji=self.star_emoji)
-            if star_react_sb:
-                async for user in star_react_sb.users():
-                    users_who_reacted.add(user.id)
-        users_who_reacted.discard(reacted_message.author.id)
-        users_who_reacted.discard(self.bot.user.id)
-        return len(users_who_reacted)
+        reactors = await self.reactors.get(reacted_message, starboard_message)
+        return reactors.count(reacted_message.author.id, self.bot.user.id)
 
     async def create_starboard_embed(self, message, starboard_message=None):
         message_content = message.content or "\u200b"
@@ -242,6 +499,12 @@ class Starboard(commands.Cog):
             return
         if starboard.get("is_locked"):
             return
+        starboard_entry = await self.fetch_starboard_entry(payload.message_id, payload.guild_id)
+        if starboard_entry:
+            await self.reactors.add(payload.guild_id, starboard_entry.get("message_id"), payload.message_id, payload.user_id)
+            self.schedule_edit(starboard_entry)
+            return
+        await self.reactors.add(payload.guild_id, payload.message_id, payload.message_id, payload.user_id)
         guild = self.bot.get_guild(starboard.get("guild_id"))
         sb_channel = guild.get_channel(starboard.get("channel_id"))
         reaction_channel = guild.get_channel_or_thread(payload.channel_id)
@@ -251,46 +514,24 @@ class Starboard(commands.Cog):
         except (discord.NotFound, discord.HTTPException) as e:
             self.logger.error("error while fetching starred message: %s",e, exc_info=True)
             return
-        starboard_entry = await self.fetch_starboard_entry(payload.message_id, payload.guild_id)
-        if not starboard_entry:
-            time_diff = datetime.now(timezone.utc) -  message.created_at 
-            star_num = await self.get_star_emoji_number(message)
-            if  star_num < starboard.get("threshold") or time_diff > starboard.get("max_age"):
-                return
-            embed = await self.create_starboard_embed(message)       
-            bot_message = await sb_channel.send(content=f"id: {message.id}", embed=embed)
-            await bot_message.add_reaction("\N{WHITE MEDIUM STAR}")
-            async with self.bot.db.acquire() as con:
-                await con.execute("""
-                    INSERT INTO starboard_entries (bot_message_id, guild_id, channel_id, message_id, author_id)
-                    VALUES ($1, $2, $3, $4, $5)
-                    """, 
-                    bot_message.id,
-                    payload.guild_id,
-                    payload.channel_id,
-                    message.id,
-                    message.author.id
-                )
-        else:
-            if sb_channel == reaction_channel:
-                original = None
-                try:
-                    original_channel = guild.get_channel(starboard_entry.get("channel_id"))
-                    original = await original_channel.fetch_message(starboard_entry.get("message_id"))
-                except (discord.NotFound, discord.HTTPException) as e:
-                    self.logger.error("error while fetching original starboard message: %s",e)
-                    return
-                embed = await self.create_starboard_embed(original, message)
-                await message.edit(embed=embed)
-            else:
-                sb_message = None
-                try:
-                    sb_message = await sb_channel.fetch_message(starboard_entry.get("bot_message_id"))
-                except (discord.NotFound, discord.HTTPException) as e:
-                    self.logger.error("error while fetching bot starboard message: %s",e)
-                    return
-                embed = await self.create_starboard_embed(message, sb_message)
-                await sb_message.edit(embed=embed)
+        time_diff = datetime.now(timezone.utc) -  message.created_at 
+        star_num = await self.get_star_emoji_number(message)
+        if  star_num < starboard.get("threshold") or time_diff > starboard.get("max_age"):
+            return
+        embed = await self.create_starboard_embed(message)       
+        bot_message = await sb_channel.send(content=f"id: {message.id}", embed=embed)
+        await bot_message.add_reaction("\N{WHITE MEDIUM STAR}")
+        async with self.bot.db.acquire() as con:
+            await con.execute("""
+                INSERT INTO starboard_entries (bot_message_id, guild_id, channel_id, message_id, author_id)
+                VALUES ($1, $2, $3, $4, $5)
+                """, 
+                bot_message.id,
+                payload.guild_id,
+                payload.channel_id,
+                message.id,
+                message.author.id
+            )
 
     @commands.Cog.listener('on_raw_reaction_remove')
     async def listen_to_star_emotes_remove(self, payload):
@@ -304,34 +545,12 @@ class Starboard(commands.Cog):
             return
         if starboard.get("is_locked"):
             return
-        guild = self.bot.get_guild(starboard.get("guild_id"))
-        sb_channel = guild.get_channel(starboard.get("channel_id"))
-        reaction_channel = guild.get_channel_or_thread(payload.channel_id)
         starboard_entry = await self.fetch_starboard_entry(payload.message_id, payload.guild_id)
         if not starboard_entry:
+            await self.reactors.remove(payload.message_id, payload.message_id, payload.user_id)
             return
-        message = None
-        bot_message = None
-        try:
-            original_channel = self.bot.get_channel(starboard_entry.get("channel_id"))
-            message = await original_channel.fetch_message(starboard_entry.get("message_id"))
-            bot_message = await sb_channel.fetch_message(starboard_entry.get("bot_message_id"))
-        except (discord.NotFound, discord.HTTPException) as e:
-            self.logger.error("error while fetching starred message: %s", e, exc_info=True)
-            return
-        star_num = await self.get_star_emoji_number(message, bot_message)
-        if star_num < starboard.get("threshold"):
-            await bot_message.delete()
-            await self.bot.db.execute("""
-                DELETE FROM starboard_entries WHERE message_id = $1
-                """, message.id)
-        else:
-            embed = await self.create_starboard_embed(message, bot_message)
-            await bot_message.edit(embed=embed)
-
-
-
-
+        await self.reactors.remove(starboard_entry.get("message_id"), payload.message_id, payload.user_id)
+        self.schedule_edit(starboard_entry, removed=True)
 
     @commands.Cog.listener('on_raw_message_delete')
     async def check_for_deleted_star_messages(self, payload):
@@ -351,6 +570,10 @@ class Starboard(commands.Cog):
         await self.bot.db.execute("""
             DELETE FROM starboard_entries WHERE bot_message_id = $1 or message_id = $1
             """, payload.message_id)
+        if payload.message_id == starboard_entry.get("message_id"):
+            await self.reactors.forget([payload.message_id])
+        else:
+            await self.reactors.forget([starboard_entry.get("message_id")], [payload.message_id])
 
     @commands.Cog.listener('on_raw_bulk_message_delete')
     async def check_for_deleted_bulk_star_messages(self, payload):
@@ -359,17 +582,40 @@ class Starboard(commands.Cog):
         starboard = await self.get_starboard(payload.guild_id)
         if not starboard:
             return
-        for message_id in payload.message_ids:
-            starboard_entry = await self.fetch_starboard_entry(message_id, payload.guild_id)
-            if message_id == starboard_entry.get("message_id"):
-                starboard_channel = self.bot.get_channel(starboard.get("channel_id"))
-                sb_message = starboard_channel.get_partial_message(starboard_entry.get("bot_message_id"))
-                if sb_message:
-                    await sb_message.delete()
-            if not starboard_entry:
-                continue
-            await self.bot.db.execute("""
-                DELETE FROM starboard_entries WHERE bot_message_id = $1 OR message_id = $1
-                """, message_id)
+        message_ids = list(payload.message_ids)
+        async with self.bot.db.acquire() as con, con.transaction():
+            entries = await con.fetch("""
+                DELETE FROM starboard_entries
+                WHERE (message_id = ANY($1) OR bot_message_id = ANY($1))
+                AND guild_id = $2
+                RETURNING message_id, bot_message_id
+                """, message_ids, payload.guild_id)
+        if not entries:
+            return
+        deleted_originals = [e.get("message_id") for e in entries if e.get("message_id") in payload.message_ids]
+        deleted_bot_messages = [e.get("bot_message_id") for e in entries if e.get("bot_message_id") in payload.message_ids]
+        if deleted_originals:
+            await self.reactors.forget(deleted_originals)
+        if deleted_bot_messages:
+            await self.reactors.forget([e.get("message_id") for e in entries], deleted_bot_messages)
+        mirrors = [
+                discord.Object(id=e.get("bot_message_id")) for e in entries
+                if e.get("message_id") in payload.message_ids and e.get("bot_message_id") not in payload.message_ids
+                ]
+        starboard_channel = self.bot.get_channel(starboard.get("channel_id"))
+        if not starboard_channel:
+            return
+        # bulk deletion is only possible for messages younger than 14 days
+        bulk_limit = datetime.now(timezone.utc) - timedelta(days=14, minutes=-5)
+        old_mirrors = [m for m in mirrors if m.created_at < bulk_limit]
+        recent_mirrors = [m for m in mirrors if m.created_at >= bulk_limit]
+        try:
+            for chunk in discord.utils.as_chunks(recent_mirrors, 100):
+                await starboard_channel.delete_messages(chunk)
+            for mirror in old_mirrors:
+                await starboard_channel.get_partial_message(mirror.id).delete()
+        except discord.HTTPException as e:
+            self.logger.error("error while deleting starboard messages: %s", e, exc_info=True)
+
 async def setup(bot):
     await bot.add_cog(Starboard(bot))
@@ -2,6 +2,7 @@ from typing import Optional
 from discord.ext import commands
 from .utils import checks
 from .utils.dataIO import DataIO
+from .utils.db import Repository
 from discord import Member, User, Embed, Role, utils, ActivityType
 import discord
 from datetime import datetime,timedelta, timezone
@@ -51,10 +52,51 @@ def format_dt(dt: datetime, /, style: str=None) -> str:
         style="f"
     return f"<t:{int(dt.timestamp())}:{style}>"
 
+class NameRepository(Repository):
+    namespace = "names"
+    statements = {
+        "names": '''
+            SELECT *
+            FROM (
+                SELECT DISTINCT ON (name) *
+                from names
+                where user_id = $1
+             ) p
+            ORDER BY change_date DESC
+            LIMIT 20
+        ''',
+        "nicknames": '''
+            SELECT *
+            FROM (
+                SELECT DISTINCT ON (nickname) *
+                from nicknames
+                where user_id = $1
+             ) p
+            ORDER BY change_date DESC
+            LIMIT 20
+        ''',
+        "add_name": "INSERT INTO names VALUES ($1, $2, current_timestamp)",
+        "add_nickname": "INSERT INTO nicknames VALUES ($1, $2, current_timestamp)",
+    }
+
+    async def fetch_names(self, user_id: int):
+        return await self.fetch("names", user_id)
+
+    async def fetch_nicknames(self, user_id: int):
+        return await self.fetch("nicknames", user_id)
+
+    async def add_name(self, user_id: int, name: str, con=None):
+        await self.execute("add_name", user_id, name, con=con)
+
+    async def add_nickname(self, user_id: int, nickname: str, con=None):
+        await self.execute("add_nickname", user_id, nickname, con=con)
+
+
 class Userinfo(commands.Cog):
     """show infos about the current or other users"""
     def __init__(self, bot):
         self.bot = bot
+        self.names = NameRepository(bot)
 
     async def cog_load(self):
         self.bot.loop.create_task(self.create_name_tables())
@@ -190,32 +232,10 @@ class Userinfo(commands.Cog):
 
 
     async def fetch_names(self, member):
-        async with self.bot.db.acquire() as con:
-            stmt = await con.prepare('''
-                SELECT *
-                FROM (
-                    SELECT DISTINCT ON (name) *
-                    from names
-                    where user_id = $1
-                 ) p
-                ORDER BY change_date DESC
-                LIMIT 20
-            ''')
-            return await stmt.fetch(member.id)
+        return await self.names.fetch_names(member.id)
 
     async def fetch_nicknames(self, member):
-        async with self.bot.db.acquire() as con:
-            stmt = await con.prepare('''
-                SELECT *
-                FROM (
-                    SELECT DISTINCT ON (nickname) *
-                    from nicknames
-                    where user_id = $1
-                 ) p
-                ORDER BY change_date DESC
-                LIMIT 20
-            ''')
-            return await stmt.fetch(member.id)
+        return await self.names.fetch_nicknames(member.id)
 
     async def create_name_tables(self):
         query = '''
@@ -243,21 +263,11 @@ class Userinfo(commands.Cog):
             names = entries[entry].get("names", [])
             nicknames = entries[entry].get("nicknames", [])
 
-            async with self.bot.db.acquire() as con:
+            async with self.names.transaction() as con:
                 for name in names:
-                    stmt = await con.prepare('''
-                                   INSERT INTO names VALUES ($1,$2,current_timestamp)
-                                   RETURNING *
-                               ''')
-                    async with con.transaction():
-                        await stmt.fetch(int(entry), name)
+                    await self.names.add_name(int(entry), name, con=con)
                 for nickname in nicknames:
-                    stmt = await con.prepare('''
-                                   INSERT INTO nicknames VALUES ($1,$2,current_timestamp)
-                                   RETURNING *
-                               ''')
-                    async with con.transaction():
-                        await stmt.fetch(int(entry), nickname)
+                    await self.names.add_nickname(int(entry), nickname, con=con)
 
     @commands.command()
     async def names(self, ctx, member: Union[Member, User]=None):
@@ -290,13 +300,7 @@ class Userinfo(commands.Cog):
         if forbidden_word_regex.search(before.display_name) or forbidden_word_regex.search(after.display_name):
             return
         if before.nick != after.nick and after.nick:
-            async with self.bot.db.acquire() as con:
-                stmt = await con.prepare('''
-                               INSERT INTO nicknames VALUES ($1,$2,current_timestamp)
-                               RETURNING *
-                           ''')
-                async with con.transaction():
-                    new_row = await stmt.fetch(after.id, after.nick)
+            await self.names.add_nickname(after.id, after.nick)
 
     @commands.Cog.listener("on_user_update")
     async def save_username_change(self, before, after):
@@ -304,13 +308,7 @@ class Userinfo(commands.Cog):
         if forbidden_word_regex.search(before.name) or forbidden_word_regex.search(after.name):
             return
         if before.name != after.name:
-            async with self.bot.db.acquire() as con:
-                stmt = await con.prepare('''
-                    INSERT INTO names VALUES ($1,$2,current_timestamp)
-                    RETURNING *
-                ''')
-                async with con.transaction():
-                    new_row = await stmt.fetch(after.id, after.name)
+            await self.names.add_name(after.id, after.name)
 
 
 
@@ -1,15 +1,20 @@
 from discord.ext import commands
-from discord.utils import find
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List
 import json
 import discord
 from os import path
 
 
-
-def is_owner_check(message):
+@lru_cache(maxsize=None)
+def owner_id() -> int:
     with open('data/credentials.json', 'r') as f:
         credentials = json.load(f)
-        return message.author.id == int(credentials['owner'])
+        return int(credentials['owner'])
+
+
+def is_owner_check(message):
+    return message.author.id == owner_id()
 
 
 def is_owner():
@@ -60,18 +65,44 @@ def channel_only(*channels):
         raise commands.CheckFailure("Can't use  this command in DMs")
     return commands.check(predicate)
 
-def user_is_in_whitelist_server(bot: commands.Bot, user: discord.User):
+def load_server_whitelist() -> List[int]:
     if not path.exists('data/server_whitelist.json'):
         f = open('data/server_whitelist.json', 'w')
         json.dump([], f)
         f.close()
     with open('data/server_whitelist.json') as f:
-        server_whitelist = json.load(f)
-        for server_id in server_whitelist:
-            server = bot.get_guild(server_id)
-            if server:
-                member = find(lambda m: m.id == user.id, server.members)
-                if member:
-                    return True
+        return json.load(f)
+
+
+def user_is_in_whitelist_server(bot: commands.Bot, user: discord.User):
+    for server_id in load_server_whitelist():
+        server = bot.get_guild(server_id)
+        if server and server.get_member(user.id):
+            return True
+    return False
+
+
+class PermissionIndex:
+    """
+    lookup structure for the global command checks,
+    built from the owner settings and rebuilt whenever those change
+    """
+
+    def __init__(self, whitelist_guilds: Iterable[int], blacklist: Iterable[int], disabled_commands: Iterable[dict]):
+        self.whitelist_guilds: FrozenSet[int] = frozenset(whitelist_guilds)
+        self.blacklist: FrozenSet[int] = frozenset(blacklist)
+        disabled: Dict[int, set] = {}
+        for entry in disabled_commands:
+            disabled.setdefault(entry["server"], set()).add(entry["command"])
+        self.disabled_commands: Dict[int, FrozenSet[str]] = {g: frozenset(c) for g, c in disabled.items()}
+
+    def is_whitelisted(self, bot: commands.Bot, user_id: int) -> bool:
+        for guild_id in self.whitelist_guilds:
+            guild = bot.get_guild(guild_id)
+            if guild and guild.get_member(user_id):
+                return True
         return False
 
+    def is_disabled(self, guild_id: int, command_name: str) -> bool:
+        return command_name in self.disabled_commands.get(guild_id, ())
+
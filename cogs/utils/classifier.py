@@ -0,0 +1,93 @@
+"""
+Classification of incoming messages for the link based features of the cogs.
+
+All patterns are combined into a single regular expression with named groups,
+so every message is only scanned once, cogs listen to the events
+dispatched for the features that matched instead of scanning every message themselves.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# https://regex101.com/r/OevXng/2
+YT_LINK = r"https://(?:youtu.be/[\w_-]+|youtube\.com/shorts/[\w_-]+|\w+\.youtube.\w+/watch)\?\w{1,}=[\w_-]+(?:&\w{1,}=[\w_-]+){0,}"
+GIF_LINK = r"\Ahttps://(?:media\.)?(?:tenor|giphy)?.com/"
+NHENTAI_LINK = r"https?://nhentai\.net/g/(?P<nhentai_id>\d+)"
+MESSAGE_LINK = (r"\Ahttps?://(?:(?:ptb|canary|www)\.)?discord(?:app)?\.com/channels/"
+                r"(?:[0-9]{15,20}|@me)"
+                r"/(?P<link_channel_id>[0-9]{15,20})/(?P<link_message_id>[0-9]{15,20})/?$")
+MESSAGE_ID = r"\A(?:(?P<id_channel_id>[0-9]{15,20})-)?(?P<id_message_id>[0-9]{15,20})$"
+TWITTER_LINK = r"https://(?:\w*\.)?(?:x|twitter)\.com/\w+/status/\d+"
+REDDIT_LINK = r"https://(?P<reddit_subdomain>\w+\.)?redd\.?it(?:.com/(?:r/\w+/)?comments)?/(?P<reddit_id>\w+)"
+
+MESSAGE_PATTERN = re.compile(
+        f"(?P<gif>{GIF_LINK})"
+        f"|(?P<message_link>{MESSAGE_LINK})"
+        f"|(?P<message_id>{MESSAGE_ID})"
+        f"|(?P<youtube>{YT_LINK})"
+        f"|(?P<nhentai>{NHENTAI_LINK})"
+        f"|(?P<twitter>{TWITTER_LINK})"
+        f"|(?P<reddit>{REDDIT_LINK})"
+)
+REDDIT_PATTERN = re.compile(REDDIT_LINK)
+
+
+@dataclass
+class MessageLinkMatch:
+    channel_id: Optional[int]
+    message_id: int
+
+
+@dataclass
+class Classification:
+    youtube_links: List[str] = field(default_factory=list)
+    gif_link: bool = False
+    nhentai_ids: List[str] = field(default_factory=list)
+    message_link: Optional[MessageLinkMatch] = None
+    twitter_links: List[str] = field(default_factory=list)
+    reddit_links: List[re.Match] = field(default_factory=list)
+
+    @property
+    def events(self) -> Dict[str, object]:
+        """
+        the events to dispatch for this message with their payload
+        """
+        events = {}
+        if self.youtube_links:
+            events["message_youtube_links"] = self.youtube_links
+        if self.gif_link:
+            events["message_gif_link"] = True
+        if self.nhentai_ids:
+            events["message_nhentai_links"] = self.nhentai_ids
+        if self.message_link:
+            events["message_link"] = self.message_link
+        if self.twitter_links:
+            events["message_twitter_links"] = self.twitter_links
+        if self.reddit_links:
+            events["message_reddit_links"] = self.reddit_links
+        return events
+
+
+def classify(content: str) -> Classification:
+    result = Classification()
+    # every pattern either contains a link or is a message id, skip ordinary chat messages
+    if not content or ("http" not in content and not content[0].isdigit()):
+        return result
+    for match in MESSAGE_PATTERN.finditer(content):
+        kind = match.lastgroup
+        if kind == "youtube":
+            result.youtube_links.append(match.group(0))
+        elif kind == "gif":
+            result.gif_link = True
+        elif kind == "nhentai":
+            result.nhentai_ids.append(match.group("nhentai_id"))
+        elif kind == "message_link":
+            result.message_link = MessageLinkMatch(int(match.group("link_channel_id")), int(match.group("link_message_id")))
+        elif kind == "message_id":
+            channel_id = match.group("id_channel_id")
+            result.message_link = MessageLinkMatch(int(channel_id) if channel_id else None, int(match.group("id_message_id")))
+        elif kind == "twitter":
+            result.twitter_links.append(match.group(0))
+        elif kind == "reddit":
+            result.reddit_links.append(match)
+    return result
@@ -0,0 +1,145 @@
+"""
+Client for the danbooru api shared by the danbooru and image search cogs (available as bot.danbooru).
+
+The credentials are read once and only read again when reload is called,
+so lookups don't touch the disk. Responses carrying an ETag or Last-Modified header
+are cached and revalidated with a conditional request, an unchanged response
+only costs a 304 without a body.
+"""
+import json
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from yarl import URL
+
+BASE_URL = 'https://danbooru.donmai.us'
+# json file with api key and user name for danbooru
+# Structure:
+# {
+#  "user": "username",
+#  "api_key": "ValidApiKey123"
+# }
+AUTH_FILE = 'data/danbooru/danbooru.json'
+
+
+@dataclass
+class CachedResponse:
+    data: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+class DanbooruClient:
+
+    def __init__(self, session, auth_file: str = AUTH_FILE, cache_size: int = 256):
+        self.session = session
+        self.auth_file = auth_file
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.cache_hits = 0
+        self.auth: Optional[aiohttp.BasicAuth] = None
+        self.logger = logging.getLogger("PoutyBot")
+        self.reload()
+
+    def reload(self) -> bool:
+        """
+        reads the credentials again, returns False if the file is missing or invalid
+        """
+        try:
+            with open(self.auth_file) as file:
+                data = json.load(file)
+            self.auth = aiohttp.BasicAuth(data['user'], data['api_key'])
+        except (OSError, ValueError, KeyError):
+            self.logger.warning("could not load the danbooru credentials from %s", self.auth_file, exc_info=True)
+            self.auth = None
+            return False
+        self.cache.clear()
+        return True
+
+    @staticmethod
+    def build_url(file_url: str, base_url: str = BASE_URL) -> str:
+        if file_url.startswith("http"):
+            return file_url
+        if file_url[0] != "/":
+            file_url = "/" + file_url
+        return base_url + file_url
+
+    async def get_json(self, path: str, params: Optional[Dict[str, Any]] = None, cache: bool = True):
+        """
+        returns the decoded json of the response or None if the request was not successful
+        """
+        url = URL(self.build_url(path))
+        if params:
+            url = url.update_query({key: str(value) for key, value in params.items()})
+        key = str(url)
+        cached = self.cache.get(key) if cache else None
+        headers = {}
+        if cached:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        async with self.session.get(url, auth=self.auth, headers=headers) as response:
+            if response.status == 304 and cached:
+                self.cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached.data
+            if response.status != 200:
+                self.logger.info("danbooru request %s failed with status %s", url.path, response.status)
+                return None
+            data = self._process(await response.json())
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+        if cache and (etag or last_modified):
+            self.cache[key] = CachedResponse(data, etag, last_modified)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return data
+
+    def _process(self, data):
+        if isinstance(data, list):
+            for post in data:
+                if isinstance(post, dict) and post.get('id') and 'tag_string' in post:
+                    self.process_post(post)
+        elif isinstance(data, dict) and data.get('id') and 'tag_string' in data:
+            self.process_post(data)
+        return data
+
+    def process_post(self, post: Dict[str, Any]):
+        """
+        sets file_url to an absolute url that can be posted to discord (None for deleted or banned posts)
+        """
+        if post.get('has_large') and post.get('file_ext') == 'zip' and not post.get('is_deleted'):
+            post['file_url'] = self.build_url(post['large_file_url']) if post.get('large_file_url') else post.get('source')
+        elif post.get('file_url'):
+            post['file_url'] = self.build_url(post['file_url'])
+        elif post.get('source'):
+            post['file_url'] = post.get('source')
+        elif post.get('is_deleted') or post.get('is_banned'):
+            post['file_url'] = None
+        else:
+            post['file_url'] = f"{BASE_URL}/posts/{post['id']}"
+
+    async def lookup_pool(self, pool_id) -> Optional[str]:
+        pool = await self.get_json(f'/pools/{pool_id}.json')
+        if pool:
+            return pool['name']
+
+    async def lookup_post(self, link: str) -> Optional[Dict[str, Any]]:
+        """
+        :param link: link to a post (https://danbooru.donmai.us/posts/1234)
+        """
+        return await self.get_json(f'{link}.json')
+
+    async def lookup_posts(self, limit=200) -> Optional[List[Dict[str, Any]]]:
+        return await self.get_json('/posts.json', {'limit': limit})
+
+    async def lookup_tags(self, tags: str, **kwargs) -> Optional[List[Dict[str, Any]]]:
+        params = {'tags': tags}
+        params.update(kwargs)
+        # random results change with every request, revalidating them would only fill the cache
+        return await self.get_json('/posts.json', params, cache='random' not in kwargs)
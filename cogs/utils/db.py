@@ -0,0 +1,109 @@
+"""
+Named SQL statements shared by the cogs (available as bot.statements).
+
+Cogs declare their queries once in a Repository subclass and call them through typed methods.
+The statements are run with the query methods of the pool, so asyncpg prepares every statement
+once per connection and reuses it from the connection's statement cache afterwards, instead of
+the cogs sending a PREPARE and a BEGIN/COMMIT for every single read.
+Reads run outside of explicit transactions, writes spanning several statements use transaction().
+Call counts and latencies are kept per statement.
+"""
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+
+@dataclass
+class StatementMetrics:
+    calls: int = 0
+    errors: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    @property
+    def avg_latency(self) -> float:
+        return self.total_latency / self.calls if self.calls else 0.0
+
+
+class Statements:
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+        self.queries: Dict[str, str] = {}
+        self.metrics: Dict[str, StatementMetrics] = defaultdict(StatementMetrics)
+
+    def register(self, name: str, query: str):
+        # cogs register their statements again when they are reloaded, the query may have changed
+        self.queries[name] = query
+
+    async def _run(self, method: str, name: str, args, con):
+        query = self.queries[name]
+        metrics = self.metrics[name]
+        start = time.perf_counter()
+        try:
+            return await getattr(con or self.pool, method)(query, *args)
+        except asyncpg.PostgresError:
+            metrics.errors += 1
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            metrics.calls += 1
+            metrics.total_latency += latency
+            metrics.max_latency = max(metrics.max_latency, latency)
+
+    async def fetch(self, name: str, *args, con=None) -> List[asyncpg.Record]:
+        return await self._run("fetch", name, args, con)
+
+    async def fetchrow(self, name: str, *args, con=None) -> Optional[asyncpg.Record]:
+        return await self._run("fetchrow", name, args, con)
+
+    async def fetchval(self, name: str, *args, con=None) -> Any:
+        return await self._run("fetchval", name, args, con)
+
+    async def execute(self, name: str, *args, con=None) -> str:
+        return await self._run("execute", name, args, con)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        yields a connection inside a transaction, pass it as con to run statements in it
+        """
+        async with self.pool.acquire() as con:
+            async with con.transaction():
+                yield con
+
+
+class Repository:
+    """
+    database access of a cog, subclasses map statement names to queries in `statements`
+    and wrap them in typed methods, the names are registered prefixed with `namespace`
+    """
+    namespace: str = ""
+    statements: Dict[str, str] = {}
+
+    def __init__(self, bot):
+        self.db: Statements = bot.statements
+        for name, query in self.statements.items():
+            self.db.register(self._name(name), query)
+
+    def _name(self, name: str) -> str:
+        return f"{self.namespace}.{name}"
+
+    async def fetch(self, name: str, *args, con=None) -> List[asyncpg.Record]:
+        return await self.db.fetch(self._name(name), *args, con=con)
+
+    async def fetchrow(self, name: str, *args, con=None) -> Optional[asyncpg.Record]:
+        return await self.db.fetchrow(self._name(name), *args, con=con)
+
+    async def fetchval(self, name: str, *args, con=None) -> Any:
+        return await self.db.fetchval(self._name(name), *args, con=con)
+
+    async def execute(self, name: str, *args, con=None) -> str:
+        return await self.db.execute(self._name(name), *args, con=con)
+
+    def transaction(self):
+        return self.db.transaction()
@@ -0,0 +1,158 @@
+"""
+The HTTP client shared by all cogs (available as bot.session).
+
+It wraps a single aiohttp.ClientSession so every cog uses the same connection pool
+and DNS cache, applies per host rate limits and keeps request metrics.
+The request methods mirror the ones of aiohttp.ClientSession,
+so it can be used like one (`async with bot.session.get(url) as response:`).
+"""
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+from yarl import URL
+
+# (requests, per seconds) for upstreams with a known quota
+DEFAULT_RATE_LIMITS: Dict[str, Tuple[int, float]] = {
+    "danbooru.donmai.us": (10, 1.0),
+    "api.jikan.moe": (3, 1.0),
+    "graphql.anilist.co": (90, 60.0),
+    "saucenao.com": (4, 30.0),
+}
+
+
+class RateLimiter:
+    """
+    token bucket allowing `rate` requests every `per` seconds with bursts up to `rate`
+    """
+
+    def __init__(self, rate: int, per: float):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) * self.per / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+@dataclass
+class HostMetrics:
+    requests: int = 0
+    errors: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    @property
+    def avg_latency(self) -> float:
+        return self.total_latency / self.requests if self.requests else 0.0
+
+
+class HTTPClient:
+
+    def __init__(self, *,
+                 limit: int = 100,
+                 limit_per_host: int = 10,
+                 dns_cache_ttl: int = 300,
+                 keepalive_timeout: float = 30,
+                 timeout: float = 30,
+                 rate_limits: Optional[Dict[str, Tuple[int, float]]] = None,
+                 host_overrides: Optional[Dict[str, str]] = None):
+        """
+        host_overrides maps a host name to another base url (e.g. a local test server)
+        that all requests for that host are sent to instead
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.rate_limits = DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits
+        self.host_overrides = {host: URL(base) for host, base in (host_overrides or {}).items()}
+        self.buckets: Dict[str, RateLimiter] = {}
+        self.metrics: Dict[str, HostMetrics] = defaultdict(HostMetrics)
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def start(self):
+        connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout
+        )
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+
+    def _bucket(self, host: str) -> Optional[RateLimiter]:
+        if host not in self.rate_limits:
+            return None
+        if host not in self.buckets:
+            self.buckets[host] = RateLimiter(*self.rate_limits[host])
+        return self.buckets[host]
+
+    def _resolve(self, url: URL) -> URL:
+        override = self.host_overrides.get(url.host)
+        if override:
+            url = override.join(URL(url.raw_path_qs))
+        return url
+
+    @asynccontextmanager
+    async def request(self, method: str, url, **kwargs):
+        url = URL(str(url))
+        host = url.host
+        url = self._resolve(url)
+        bucket = self._bucket(host)
+        if bucket:
+            await bucket.acquire()
+        metrics = self.metrics[host]
+        start = time.perf_counter()
+        try:
+            async with self.session.request(method, url, **kwargs) as response:
+                if response.status >= 400:
+                    metrics.errors += 1
+                yield response
+        except aiohttp.ClientError:
+            metrics.errors += 1
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            metrics.requests += 1
+            metrics.total_latency += latency
+            metrics.max_latency = max(metrics.max_latency, latency)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def options(self, url, **kwargs):
+        return self.request("OPTIONS", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
@@ -315,3 +315,70 @@ class TextPages(Pages):
         if self.maximum_pages > 1:
             return f'{entry}\nPage {page}/{self.maximum_pages}'
         return entry
+
+
+class LazyTextPages(TextPages):
+    """Like TextPages, but the pages are built from an async iterator of lines
+    while the user pages through them, only the pages shown so far are kept.
+    The number of pages is unknown until the last line was read.
+    """
+
+    def __init__(self, ctx, lines, *, prefix='```', suffix='```', max_size=2000):
+        self.lines = lines.__aiter__()
+        self.prefix = prefix
+        self.suffix = suffix
+        self.max_size = max_size - 200 - len(prefix) - len(suffix)
+        self.current_lines = []
+        self.current_size = 0
+        self.exhausted = False
+        Pages.__init__(self, ctx, entries=[], per_page=1, show_entry_count=False)
+
+    def close_page(self):
+        self.entries.append(f'{self.prefix}\n' + '\n'.join(self.current_lines) + f'\n{self.suffix}')
+        self.current_lines = []
+        self.current_size = 0
+
+    async def fill(self, page):
+        """reads lines until the page exists or there are no lines left"""
+        while len(self.entries) < page and not self.exhausted:
+            try:
+                line = (await self.lines.__anext__())[:self.max_size]
+            except StopAsyncIteration:
+                self.exhausted = True
+                if self.current_lines:
+                    self.close_page()
+                break
+            if self.current_lines and self.current_size + len(line) + 1 > self.max_size:
+                self.close_page()
+            self.current_lines.append(line)
+            self.current_size += len(line) + 1
+        # one more page than built so far can be requested as long as lines are left
+        self.maximum_pages = len(self.entries) if self.exhausted else len(self.entries) + 1
+
+    async def show_page(self, page, *, first=False):
+        await self.fill(page)
+        await super().show_page(min(page, len(self.entries)), first=first)
+
+    async def last_page(self):
+        """goes to the last page"""
+        await self.fill(float('inf'))
+        await self.show_page(self.maximum_pages)
+
+    def get_content(self, entry, page, *, first=False):
+        if self.exhausted and self.maximum_pages == 1:
+            return entry
+        return f'{entry}\nPage {page}/{self.maximum_pages if self.exhausted else "?"}'
+
+    async def paginate(self):
+        # only known once the first two pages were read
+        await self.fill(2)
+        if not self.entries:
+            return
+        self.paginating = len(self.entries) > 1
+        if self.paginating:
+            if not self.permissions.add_reactions:
+                raise CannotPaginate('Bot does not have add reactions permission.')
+
+            if not self.permissions.read_message_history:
+                raise CannotPaginate('Bot does not have Read Message History permission.')
+        await super().paginate()
@@ -0,0 +1,161 @@
+"""
+Rendering of images in worker processes, so CPU heavy image generation
+(wordclouds, poll charts) does not block the event loop and the gateway heartbeat.
+The render functions are executed in the worker processes and have to be
+module level functions that only take and return picklable data.
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+
+class RenderError(Exception):
+    pass
+
+
+class RenderQueueFull(RenderError):
+    pass
+
+
+class RenderTimeout(RenderError):
+    pass
+
+
+def _warm_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot
+    import numpy
+    import wordcloud
+    import PIL.Image
+
+
+def _noop():
+    return None
+
+
+def render_wordcloud(frequencies: Dict[str, int], width: int = 800, height: int = 800) -> bytes:
+    from wordcloud import WordCloud
+    wc = WordCloud(width=width, height=height)
+    wc.generate_from_frequencies(frequencies)
+    img_buf = io.BytesIO()
+    wc.to_image().save(img_buf, format='png')
+    return img_buf.getvalue()
+
+
+def render_wordcloud_text(text: str, width: int = 800, height: int = 800) -> bytes:
+    from wordcloud import WordCloud
+    wc = WordCloud(width=width, height=height)
+    wc.generate(text)
+    img_buf = io.BytesIO()
+    wc.to_image().save(img_buf, format='png')
+    return img_buf.getvalue()
+
+
+def render_wordcloud_avatar(avatar: bytes, frequencies: Dict[str, int], background: Tuple[int, int, int]) -> bytes:
+    import numpy as np
+    from PIL import Image
+    from wordcloud import WordCloud, ImageColorGenerator
+    im = np.array(Image.open(io.BytesIO(avatar)))
+    wc = WordCloud(background_color=background, mask=im)
+    image_colors = ImageColorGenerator(im)
+    wc.generate_from_frequencies(frequencies)
+    wc.recolor(color_func=image_colors)
+    img_buf = io.BytesIO()
+    wc.to_image().save(img_buf, format='png')
+    return img_buf.getvalue()
+
+
+def render_poll_chart(title: str, results: List[Tuple[int, str]]) -> bytes:
+    """
+    render a pie chart of the poll results, results are (count, label) tuples sorted descending
+    """
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots()
+    counts = [r[0] for r in results]
+    winners = [0.1 if c == max(counts) else 0.0 for c in counts]
+    ax.pie(
+        [c / sum(counts) for c in counts],
+        labels=[r[1] for r in results],
+        explode=winners,
+        autopct="%1.1f%%",
+    )
+    ax.set_title(title)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+class RenderService:
+    """
+    runs render jobs in a pool of warm worker processes
+
+    at most max_queue jobs can be pending at once, every job has to finish within its timeout,
+    a job that timed out keeps its slot until its worker process is done with it
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 16, timeout: float = 60.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.logger = logging.getLogger("PoutyBot")
+        self.executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker
+        )
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=100)
+
+    async def start(self):
+        """
+        start all worker processes so the first jobs don't have to wait for the imports
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _noop) for _ in range(self.max_workers)))
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, _future=None):
+        self.pending -= 1
+
+    async def submit(self, func, *args, timeout: float = None) -> bytes:
+        if self.pending >= self.max_queue:
+            raise RenderQueueFull("Too many images are being generated right now, try again later")
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        job = self.executor.submit(func, *args)
+        # the slot stays in use until the worker is done with the job, a timeout can't stop a running worker
+        self.pending += 1
+        job.add_done_callback(lambda f: loop.call_soon_threadsafe(self._release, f))
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(job), timeout=timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.failed += 1
+            raise RenderTimeout("Generating the image took too long")
+        except Exception as e:
+            self.failed += 1
+            raise RenderError("Generating the image failed") from e
+        self.completed += 1
+        self.latencies.append(time.perf_counter() - start)
+        return result
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        latencies = list(self.latencies)
+        return {
+            "queue_depth": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_latency": sum(latencies) / len(latencies) if latencies else 0.0,
+            "max_latency": max(latencies, default=0.0),
+        }
@@ -0,0 +1,124 @@
+"""
+Durable timers shared by all cogs (available as bot.timers).
+
+The expirations (mutes, reminders, polls ...) stay in the tables of the cogs,
+the service only keeps a min-heap of the due times and sleeps until the next one is due
+instead of every cog polling its table.
+A cog registers a handler and a loader for its kind of timer in cog_load, the loader returns
+(key, due time) pairs read from the database. After writing or deleting a row the cog calls
+schedule or cancel so the heap stays in sync with the table.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+TimerHandler = Callable[[List[Hashable]], Awaitable[None]]
+TimerLoader = Callable[[], Awaitable[Iterable[Tuple[Hashable, datetime]]]]
+
+# wake up at least once an hour so changes of the system clock don't delay timers
+MAX_SLEEP = 3600
+
+
+def _as_utc(when: datetime) -> datetime:
+    # most tables store naive utc timestamps
+    if when.tzinfo is None:
+        return when.replace(tzinfo=timezone.utc)
+    return when
+
+
+class TimerService:
+    """
+    fires the handler of a timer kind with the keys of all its timers that are due
+
+    cancelled and rescheduled timers are dropped lazily when they reach the top of the heap
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.logger = logging.getLogger("PoutyBot")
+        self.handlers: Dict[str, TimerHandler] = {}
+        self.deadlines: Dict[Tuple[str, Hashable], datetime] = {}
+        self.heap: List[Tuple[datetime, int, str, Hashable]] = []
+        self.counter = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.running: Set[asyncio.Task] = set()
+        self.fired = 0
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    def close(self):
+        if self.task:
+            self.task.cancel()
+
+    async def register(self, kind: str, handler: TimerHandler, loader: Optional[TimerLoader] = None):
+        self.handlers[kind] = handler
+        if loader:
+            for key, when in await loader():
+                self.schedule(kind, key, when)
+
+    def unregister(self, kind: str):
+        self.handlers.pop(kind, None)
+        for timer in [t for t in self.deadlines if t[0] == kind]:
+            del self.deadlines[timer]
+
+    def schedule(self, kind: str, key: Hashable, when: datetime):
+        """
+        (re)schedule the timer, replacing the previous due time of the same key
+        """
+        when = _as_utc(when)
+        self.deadlines[(kind, key)] = when
+        heapq.heappush(self.heap, (when, next(self.counter), kind, key))
+        if self.heap[0][0] == when:
+            self.wakeup.set()
+
+    def cancel(self, kind: str, key: Hashable):
+        self.deadlines.pop((kind, key), None)
+        if len(self.heap) > 64 and len(self.heap) > 2 * len(self.deadlines):
+            self.heap = [entry for entry in self.heap if self.deadlines.get((entry[2], entry[3])) == entry[0]]
+            heapq.heapify(self.heap)
+
+    def pending(self, kind: Optional[str] = None) -> int:
+        return sum(1 for timer in self.deadlines if kind is None or timer[0] == kind)
+
+    def _pop_due(self, now: datetime) -> Dict[str, List[Hashable]]:
+        due = defaultdict(list)
+        while self.heap and self.heap[0][0] <= now:
+            when, _, kind, key = heapq.heappop(self.heap)
+            if self.deadlines.get((kind, key)) != when:
+                continue
+            del self.deadlines[(kind, key)]
+            due[kind].append(key)
+        return due
+
+    async def _fire(self, kind: str, handler: TimerHandler, keys: List[Hashable]):
+        try:
+            await handler(keys)
+            self.fired += len(keys)
+        except Exception:
+            self.logger.exception(f"exception while handling {kind} timers:")
+
+    async def run(self):
+        await self.bot.wait_until_ready()
+        while True:
+            now = datetime.now(timezone.utc)
+            for kind, keys in self._pop_due(now).items():
+                handler = self.handlers.get(kind)
+                if not handler:
+                    continue
+                task = asyncio.create_task(self._fire(kind, handler, keys))
+                self.running.add(task)
+                task.add_done_callback(self.running.discard)
+            timeout = MAX_SLEEP
+            if self.heap:
+                timeout = min(MAX_SLEEP, max((self.heap[0][0] - now).total_seconds(), 0))
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -1,16 +1,34 @@
-from discord.ext import commands, tasks
+from discord.ext import commands
 import discord
-from typing import Union, Optional
+from typing import Dict, List, Union, Optional
 from discord.mentions import AllowedMentions
-from wordcloud import WordCloud, STOPWORDS, ImageColorGenerator
+from wordcloud import STOPWORDS
 import typing
-from io import BytesIO
-from functools import partial
 import asyncio
 import re
 import io
-from PIL import Image
-import numpy as np
+import logging
+from .utils.render import render_wordcloud, render_wordcloud_avatar, render_wordcloud_text
+from collections import Counter
+from itertools import groupby
+
+MESSAGE_WINDOW = 500
+word_regex = re.compile(r"\w[\w']+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    split a message into lower case words without stopwords and numbers,
+    unlike WordCloud.process_text this does not count collocations or merge plurals
+    """
+    tokens = []
+    for word in word_regex.findall(text):
+        word = word.lower()
+        if word.endswith("'s"):
+            word = word[:-2]
+        if word.isdigit() or word in STOPWORDS:
+            continue
+        tokens.append(word)
+    return tokens
 
 class Confirm(discord.ui.View):
 
@@ -25,6 +43,9 @@ class Confirm(discord.ui.View):
     @discord.ui.button(emoji="\N{THUMBS UP SIGN}", style=discord.ButtonStyle.green)
     async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self.bot.db.execute("INSERT INTO wc_consent VALUES ($1) ON CONFLICT DO NOTHING", self.user_id)
+        cog = self.bot.get_cog("Wordcloud")
+        if cog:
+            cog.consenting_users.add(self.user_id)
         self.clear_items()
         await interaction.response.edit_message(content="Consent given, I am now starting to collect messages you send"
                 "\nI won't collect messages you have sent before the consent.", view=self)
@@ -40,12 +61,22 @@ class Wordcloud(commands.Cog):
         self.bot= bot
         self.url_regex = re.compile(r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*(),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+")
         self.spoiler_regex = re.compile(r"\|\|.+?\|\|")
-        self.clean_db.start()
+        self.logger = logging.getLogger("PoutyBot")
+        self.consenting_users = set()
+        self.message_queue = asyncio.Queue()
+        self.flush_interval = 5
+        self.flush_size = 200
 
     async def cog_load(self):
         self.create_table = self.bot.loop.create_task(self.init_table())
+        self.flush_task = self.bot.loop.create_task(self.flush_messages())
     async def cog_unload(self):
-        self.clean_db.stop()
+        self.flush_task.cancel()
+        batch = []
+        while not self.message_queue.empty():
+            batch.append(self.message_queue.get_nowait())
+        if batch:
+            await self.insert_messages(batch)
 
     async def init_table(self):
         async with self.bot.db.acquire() as con:
@@ -64,6 +95,21 @@ class Wordcloud(commands.Cog):
                     user_id BIGINT PRIMARY KEY
                 )
                 """)
+                await con.execute("""
+                CREATE TABLE IF NOT EXISTS wc_word_counts(
+                    user_id BIGINT,
+                    word TEXT,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (user_id, word)
+                )
+                """)
+                await con.execute("ALTER TABLE wc_consent ADD COLUMN IF NOT EXISTS next_slot INTEGER NOT NULL DEFAULT 0")
+                await con.execute("ALTER TABLE wc_messages ADD COLUMN IF NOT EXISTS slot INTEGER")
+                await con.execute("ALTER TABLE wc_messages ADD COLUMN IF NOT EXISTS tokens TEXT[]")
+                await self.migrate_messages(con)
+                await con.execute("CREATE UNIQUE INDEX IF NOT EXISTS wc_messages_slot_idx ON wc_messages (user_id, slot)")
+                consent = await con.fetch("SELECT user_id FROM wc_consent")
+                self.consenting_users = {c.get("user_id") for c in consent}
     ###################
     # Listener
     ###################
@@ -71,39 +117,120 @@ class Wordcloud(commands.Cog):
     async def record_message(self, message):
         if not message.guild:
             return
-        await asyncio.wait_for(self.create_table, timeout=None)
+        if message.author.id not in self.consenting_users:
+            return
         context = await self.bot.get_context(message)
         if context and context.command:
             return
-        consent = await self.bot.db.fetchrow("SELECT user_id FROM wc_consent where user_id = $1", message.author.id)
-        if not consent:
-            return
         clean_message = self.url_regex.sub("", message.clean_content)
         clean_message = self.spoiler_regex.sub("", clean_message)
         if clean_message:
-            await self.bot.db.execute("""
-            INSERT INTO wc_messages (user_id, message_id, message_content, message_time) VALUES ($1, $2, $3, $4)
-            """, message.author.id, message.id, clean_message, message.created_at)
+            self.message_queue.put_nowait((message.author.id, message.id, clean_message, message.created_at))
 
-    @tasks.loop(hours=1)
-    async def clean_db(self):
+    async def flush_messages(self):
+        """
+        write the recorded messages to the database in batches,
+        either every few seconds or as soon as enough messages were collected
+        """
         await asyncio.wait_for(self.create_table, timeout=None)
-        async with self.bot.db.acquire() as con:
-            async with con.transaction():
-                user_ids = await con.fetch("SELECT * FROM wc_consent")
-                user_ids = [(u.get('user_id'),) for u in user_ids]
-                await con.executemany("""
-                DELETE FROM wc_messages
-                WHERE message_id not in (
-                    select message_id 
-                    from wc_messages
-                    where user_id = $1
-                    group by message_id, message_time
-                    order by message_time desc
-                    limit 500
-                )
-                AND user_id = $1
-                """, user_ids)
+        while True:
+            batch = [await self.message_queue.get()]
+            deadline = self.bot.loop.time() + self.flush_interval
+            while len(batch) < self.flush_size:
+                timeout = deadline - self.bot.loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.message_queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self.insert_messages(batch)
+            except Exception as e:
+                self.logger.error("could not store %s wordcloud messages: %s", len(batch), e, exc_info=True)
+
+    async def migrate_messages(self, con):
+        """
+        assign ring buffer slots and word counts to messages that were recorded before the word count table existed
+        """
+        rows = await con.fetch("""
+        SELECT user_id, message_id, message_content FROM (
+            SELECT *, row_number() OVER (PARTITION BY user_id ORDER BY message_time DESC) AS age
+            FROM wc_messages WHERE tokens IS NULL
+        ) m WHERE age <= $1
+        ORDER BY user_id, message_time
+        """, MESSAGE_WINDOW)
+        if not rows:
+            return
+        await con.execute("DELETE FROM wc_messages WHERE tokens IS NULL AND NOT message_id = ANY($1)", [r.get("message_id") for r in rows])
+        for user_id, messages in groupby(rows, key=lambda r: r.get("user_id")):
+            messages = list(messages)
+            tokens = [tokenize(m.get("message_content")) for m in messages]
+            await con.executemany("""
+            UPDATE wc_messages SET slot = $3, tokens = $4 WHERE user_id = $1 AND message_id = $2
+            """, [(user_id, m.get("message_id"), slot, t) for slot, (m, t) in enumerate(zip(messages, tokens))])
+            await con.execute("UPDATE wc_consent SET next_slot = $2 WHERE user_id = $1", user_id, len(messages) % MESSAGE_WINDOW)
+            await self.update_word_counts(con, user_id, Counter(word for t in tokens for word in t))
+
+    async def update_word_counts(self, con, user_id: int, delta: Counter):
+        words = [w for w, c in delta.items() if c != 0]
+        if not words:
+            return
+        await con.execute("""
+        INSERT INTO wc_word_counts (user_id, word, count)
+        SELECT $1, word, count FROM unnest($2::text[], $3::int[]) AS d(word, count)
+        ON CONFLICT (user_id, word) DO UPDATE SET count = wc_word_counts.count + EXCLUDED.count
+        """, user_id, words, [delta[w] for w in words])
+        await con.execute("""
+        DELETE FROM wc_word_counts WHERE user_id = $1 AND word = ANY($2) AND count <= 0
+        """, user_id, words)
+
+    async def insert_messages(self, batch):
+        """
+        store the messages in the per user ring buffer of the last 500 messages,
+        the words of overwritten messages are subtracted from the word counts of the user
+        """
+        # consent could have been removed while the messages were queued
+        batch = sorted((m for m in batch if m[0] in self.consenting_users), key=lambda m: m[0])
+        if not batch:
+            return
+        async with self.bot.db.acquire() as con, con.transaction():
+            for user_id, messages in groupby(batch, key=lambda m: m[0]):
+                messages = list(messages)[-MESSAGE_WINDOW:]
+                next_slot = await con.fetchval("""
+                UPDATE wc_consent SET next_slot = (next_slot + $2) % $3 WHERE user_id = $1
+                RETURNING next_slot
+                """, user_id, len(messages), MESSAGE_WINDOW)
+                if next_slot is None:
+                    continue
+                first_slot = (next_slot - len(messages)) % MESSAGE_WINDOW
+                slots = [(first_slot + i) % MESSAGE_WINDOW for i in range(len(messages))]
+                evicted = await con.fetch("""
+                DELETE FROM wc_messages WHERE user_id = $1 AND slot = ANY($2) RETURNING tokens
+                """, user_id, slots)
+                # messages that are already stored are skipped, only count the words of inserted rows
+                inserted = await con.fetch("""
+                INSERT INTO wc_messages (user_id, message_id, message_content, message_time, slot)
+                SELECT $1, m.message_id, m.message_content, m.message_time, m.slot
+                FROM unnest($2::bigint[], $3::text[], $4::timestamptz[], $5::int[]) AS m(message_id, message_content, message_time, slot)
+                ON CONFLICT DO NOTHING
+                RETURNING message_id
+                """, user_id, [m[1] for m in messages], [m[2] for m in messages], [m[3] for m in messages], slots)
+                inserted = {r.get("message_id") for r in inserted}
+                tokens = [(m[1], tokenize(m[2])) for m in messages if m[1] in inserted]
+                if tokens:
+                    await con.executemany("""
+                    UPDATE wc_messages SET tokens = $3 WHERE user_id = $1 AND message_id = $2
+                    """, [(user_id, message_id, t) for message_id, t in tokens])
+                delta = Counter(word for _, t in tokens for word in t)
+                delta.subtract(word for e in evicted for word in (e.get("tokens") or []))
+                await self.update_word_counts(con, user_id, delta)
+
+    async def fetch_word_counts(self, user_id: int) -> Dict[str, int]:
+        rows = await self.bot.db.fetch("""
+        SELECT word, count FROM wc_word_counts WHERE user_id = $1
+        """, user_id)
+        return {r.get("word"): r.get("count") for r in rows}
 
     ##################
     # Commands
@@ -115,7 +242,7 @@ class Wordcloud(commands.Cog):
         generate a word cloud from the last 500 messages of a user or a channel. 
         for users it only applies to messages the bot recorded after getting your consent for recording messages, see `wc consent`
         """
-        text = ""
+        frequencies = {}
         if target is None:
             target = ctx.author
         if isinstance(target, discord.TextChannel) or isinstance(target, discord.Thread):
@@ -125,23 +252,24 @@ class Wordcloud(commands.Cog):
             await ctx.typing()
             text = "\n".join([self.url_regex.sub("", m.clean_content) async for m in target.history(limit=300)])
             text = self.spoiler_regex.sub("", text)
+            if not text.strip():
+                return await ctx.send("Not enough words recorded to create a word cloud")
+            # channels are read from the live history, WordCloud processes the text itself
+            image = await self.bot.renderer.submit(render_wordcloud_text, text)
+            return await self.send_wordcloud(ctx, target, discord.File(io.BytesIO(image), "wc.png"))
         if isinstance(target, discord.Member):
-            consent = await self.bot.db.fetchrow("SELECT user_id FROM wc_consent where user_id = $1", target.id)
-
-            if not consent:
+            if target.id not in self.consenting_users:
                 if not ctx.author == target:
                     return await ctx.send("This user has not consented to recording their messages, I can't create a word cloud")
                 else:
                     return await ctx.send(f"Please first consent to having your messages recorded. using `{ctx.prefix}wc consent`")
-            messages = await self.bot.db.fetch("""
-            SELECT message_content from wc_messages WHERE user_id = $1 LIMIT 500 
-            """, target.id)
-            text = " ".join([m['message_content'] for m in messages])
+            frequencies = await self.fetch_word_counts(target.id)
 
-        gen_file = partial(self.generate_file_from_text, text)
+        if not frequencies:
+            return await ctx.send("Not enough words recorded to create a word cloud")
         await ctx.typing()
-        f = await ctx.bot.loop.run_in_executor(None, gen_file)
-        await self.send_wordcloud(ctx, target, f)
+        image = await self.bot.renderer.submit(render_wordcloud, dict(frequencies))
+        await self.send_wordcloud(ctx, target, discord.File(io.BytesIO(image), "wc.png"))
 
     async def send_wordcloud(self, ctx, target, file):
 
@@ -170,6 +298,8 @@ class Wordcloud(commands.Cog):
             async with con.transaction():
                 await con.execute("DELETE FROM wc_consent WHERE user_id = $1", ctx.author.id)
                 await con.execute("DELETE FROM wc_messages WHERE user_id = $1", ctx.author.id)
+                await con.execute("DELETE FROM wc_word_counts WHERE user_id = $1", ctx.author.id)
+        self.consenting_users.discard(ctx.author.id)
         await ctx.send("Consent removed, all your recorded messages were deleted")
 
     @word_cloud.command(name="avatar", aliases=['pfp'])
@@ -179,44 +309,19 @@ class Wordcloud(commands.Cog):
         usage: `.wc avatar 0xc0ffee` or `.wc avatar @Member` or `.wc avatar @Member 0xc0ffee`
         """
         member = member or ctx.author
-        consent = await self.bot.db.fetchrow("SELECT user_id FROM wc_consent where user_id = $1", member.id)
-        if not consent:
+        if member.id not in self.consenting_users:
             if not ctx.author == member:
                 return await ctx.send("This user has not consented to recording their messages, I can't create a word cloud")
             else:
                 return await ctx.send(f"Please first consent to having your messages recorded. using `{ctx.prefix}wc consent`")
         avatar = member.avatar.replace(size=1024, format='png')
-        bAvatar = io.BytesIO(await avatar.read())
-        bAvatar.seek(0)
-        messages = await self.bot.db.fetch("""
-        SELECT message_content from wc_messages WHERE user_id = $1 LIMIT 500 
-        """, member.id)
-        text = " ".join([m['message_content'] for m in messages])
-        gen_file = partial(self.generate_with_avatar, bAvatar, text, colour)
+        avatar_bytes = await avatar.read()
+        frequencies = await self.fetch_word_counts(member.id)
+        if not frequencies:
+            return await ctx.send("Not enough words recorded to create a word cloud")
         await ctx.typing()
-        f = await ctx.bot.loop.run_in_executor(None, gen_file)
-        await self.send_wordcloud(ctx, member, f)
-
-    def generate_with_avatar(self, avatar: io.BytesIO, text, color):
-        im = np.array(Image.open(avatar))
-        wc = WordCloud(background_color=color.to_rgb(), mask=im)
-        image_colors = ImageColorGenerator(im)
-        wc.generate(text)
-        wc.recolor(color_func=image_colors)
-        im = wc.to_image()
-        img_buf = BytesIO()
-        im.save(img_buf, format='png')
-        img_buf.seek(0)
-        return discord.File(img_buf, "wc.png")
-
-    def generate_file_from_text(self, text):
-        wc = WordCloud(width=800, height=800)
-        wc.generate(text)
-        im = wc.to_image()
-        img_buf = BytesIO()
-        im.save(img_buf, format='png')
-        img_buf.seek(0)
-        return discord.File(img_buf, "wc.png")
+        image = await self.bot.renderer.submit(render_wordcloud_avatar, avatar_bytes, frequencies, colour.to_rgb())
+        await self.send_wordcloud(ctx, member, discord.File(io.BytesIO(image), "wc.png"))
 
 async def setup(bot):
     await bot.add_cog(Wordcloud(bot))